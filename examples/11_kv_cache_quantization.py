@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Example 11: KV Cache Quantization Benchmark
+===========================================
+
+Compare KV cache memory and decode speed of an unquantized cache against
+8-bit and 4-bit quantized caches on long agent-sized contexts.
+
+Requirements:
+    pip install strands-mlx strands-agents
+
+Usage:
+    python examples/11_kv_cache_quantization.py
+    python examples/11_kv_cache_quantization.py --model mlx-community/Qwen3-4B-4bit --contexts 16384 32768
+"""
+
+import argparse
+import asyncio
+
+import mlx.core as mx
+
+from strands_mlx import MLXModel
+
+FILLER = (
+    "Tool result: the deployment finished in 42 seconds, 3 services restarted, "
+    "no errors were reported and the health checks are green. "
+)
+
+
+async def run(model, messages):
+    """Stream one response and return its metadata metrics."""
+    metrics = {}
+    async for event in model.stream(messages):
+        if "metadata" in event:
+            metrics = event["metadata"]["metrics"]
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--model", default="mlx-community/Qwen3-1.7B-4bit")
+    parser.add_argument("--contexts", type=int, nargs="+", default=[4096, 16384])
+    parser.add_argument("--max-tokens", type=int, default=128)
+    parser.add_argument("--group-size", type=int, default=64)
+    args = parser.parse_args()
+
+    print("📏 KV Cache Quantization Benchmark\n")
+    print(f"📦 Loading model: {args.model}...")
+    model = MLXModel(model_id=args.model)
+
+    header = (
+        f"{'context':>8} {'kv_bits':>8} {'KV cache MB':>12} {'peak GB':>8} {'decode tok/s':>13}"
+    )
+    print(f"\n{header}\n{'-' * len(header)}")
+    for context in args.contexts:
+        # Roughly ``context`` tokens of repetitive tool output
+        filler_tokens = len(model.tokenizer.encode(FILLER))
+        text = FILLER * max(context // filler_tokens, 1)
+        messages = [{"role": "user", "content": [{"text": text + "\nSummarize the results."}]}]
+
+        for kv_bits in (None, 8, 4):
+            # Setting prompt_cache_size clears the cache, so every run prefills the whole context
+            model.update_config(
+                kv_bits=kv_bits,
+                kv_group_size=args.group_size,
+                prompt_cache_size=1,
+                params={"temperature": 0, "max_tokens": args.max_tokens},
+            )
+            mx.clear_cache()
+            mx.reset_peak_memory()
+
+            metrics = asyncio.run(run(model, messages))
+            kv_mb = model._prompt_cache.nbytes / 1024**2
+            print(
+                f"{metrics['promptTokens']:>8} {str(kv_bits or 16):>8} {kv_mb:>12.1f} "
+                f"{metrics['peakMemoryGb']:>8.2f} {metrics['generationTokensPerSecond']:>13.1f}"
+            )
+
+    print("\n✅ Benchmark complete!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Example 12: Rotating KV Cache Soak Benchmark
+============================================
+
+Run an endless monitoring-style conversation with a bounded KV cache
+(``max_kv_size``) that keeps the system prompt as attention sinks, and show
+that KV memory, MLX memory and decode speed stay flat as the session grows.
+
+Requirements:
+    pip install strands-mlx strands-agents
+
+Usage:
+    python examples/12_rotating_kv_cache_soak.py
+    python examples/12_rotating_kv_cache_soak.py --turns 10000 --max-kv-size 2048
+"""
+
+import argparse
+import asyncio
+import resource
+import sys
+import time
+
+import mlx.core as mx
+
+from strands_mlx import MLXModel
+
+SYSTEM_PROMPT = "You are a monitoring agent. Reply with one short status line per check."
+
+
+async def run(model, messages):
+    """Stream one response and return its text and metadata."""
+    text, metadata = "", {}
+    async for event in model.stream(messages, system_prompt=SYSTEM_PROMPT):
+        if "contentBlockDelta" in event:
+            text += event["contentBlockDelta"]["delta"].get("text", "")
+        if "metadata" in event:
+            metadata = event["metadata"]
+    return text, metadata
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024**2 if sys.platform == "darwin" else rss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--model", default="mlx-community/Qwen3-1.7B-4bit")
+    parser.add_argument("--turns", type=int, default=10000)
+    parser.add_argument("--max-kv-size", type=int, default=1024)
+    parser.add_argument("--max-tokens", type=int, default=16)
+    parser.add_argument("--report-every", type=int, default=500)
+    args = parser.parse_args()
+
+    print("♾️  Rotating KV Cache Soak Benchmark\n")
+    print(f"📦 Loading model: {args.model}...")
+    model = MLXModel(model_id=args.model)
+
+    # Keep the rendered system prompt as attention sinks
+    system = model.tokenizer.apply_chat_template(
+        [{"role": "system", "content": SYSTEM_PROMPT}], tokenize=False
+    )
+    model.update_config(
+        max_kv_size=args.max_kv_size,
+        kv_sink_tokens=len(model.tokenizer.encode(system)),
+        params={"temperature": 0, "max_tokens": args.max_tokens},
+    )
+
+    header = (
+        f"{'turn':>6} {'context':>8} {'cached':>8} {'KV MB':>7} {'MLX MB':>7} {'peak RSS MB':>12}"
+        f" {'decode tok/s':>13} {'turn ms':>8}"
+    )
+    print(f"\n{header}\n{'-' * len(header)}")
+    messages = []
+    for turn in range(1, args.turns + 1):
+        messages.append({"role": "user", "content": [{"text": f"Check #{turn}: CPU 42%, OK?"}]})
+        start = time.perf_counter()
+        text, metadata = asyncio.run(run(model, messages))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        messages.append({"role": "assistant", "content": [{"text": text or "OK"}]})
+
+        if turn == 1 or turn % args.report_every == 0:
+            metrics = metadata["metrics"]
+            print(
+                f"{turn:>6} {metadata['usage']['inputTokens']:>8}"
+                f" {metadata['usage'].get('cacheReadInputTokens', 0):>8}"
+                f" {model._prompt_cache.nbytes / 1024**2:>7.1f}"
+                f" {mx.get_active_memory() / 1024**2:>7.0f} {peak_rss_mb():>12.0f}"
+                f" {metrics.get('generationTokensPerSecond', 0):>13.1f} {elapsed_ms:>8.0f}"
+            )
+
+    print("\n✅ Soak complete!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Example 13: Chat Template Rendering Benchmark
+=============================================
+
+Compare rendering a growing tool-calling conversation in full on every turn
+with the memoized renderer MLXModel uses, which keeps the rendered prefix of
+the conversation and only renders the newest messages.
+
+Requirements:
+    pip install strands-mlx strands-agents
+
+Usage:
+    python examples/13_chat_template_benchmark.py
+    python examples/13_chat_template_benchmark.py --turns 400 --report-every 50
+"""
+
+import argparse
+import time
+
+from strands_mlx import MLXModel
+
+SYSTEM_PROMPT = "You are an order tracking assistant. Use the lookup tool for every order."
+
+TOOL_SPECS = [
+    {
+        "name": "lookup",
+        "description": "Look up an order by id.",
+        "inputSchema": {
+            "json": {
+                "type": "object",
+                "properties": {"order_id": {"type": "string"}},
+                "required": ["order_id"],
+            }
+        },
+    }
+]
+
+
+def turn_messages(turn):
+    """One user question, tool call, tool result and answer."""
+    tool_use_id = f"call-{turn}"
+    return [
+        {"role": "user", "content": [{"text": f"Where is order {turn}?"}]},
+        {
+            "role": "assistant",
+            "content": [
+                {"toolUse": {"toolUseId": tool_use_id, "name": "lookup", "input": {"id": turn}}}
+            ],
+        },
+        {
+            "role": "user",
+            "content": [
+                {
+                    "toolResult": {
+                        "toolUseId": tool_use_id,
+                        "status": "success",
+                        "content": [{"text": f"Order {turn} left the warehouse today."}],
+                    }
+                }
+            ],
+        },
+        {"role": "assistant", "content": [{"text": f"Order {turn} is on its way."}]},
+    ]
+
+
+def timed_ms(fn, *args):
+    """Run fn and return its result and wall time in milliseconds."""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--model", default="mlx-community/Qwen3-1.7B-4bit")
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--report-every", type=int, default=25)
+    args = parser.parse_args()
+
+    print("🧩 Chat Template Rendering Benchmark\n")
+    print(f"📦 Loading model: {args.model}...")
+    model = MLXModel(model_id=args.model)
+
+    header = f"{'turn':>6} {'messages':>9} {'chars':>9} {'full ms':>9} {'memoized ms':>12} {'speedup':>8}"
+    print(f"\n{header}\n{'-' * len(header)}")
+    messages, full_total, memoized_total = [], 0.0, 0.0
+    for turn in range(1, args.turns + 1):
+        messages += turn_messages(turn)
+        request = model.format_request(messages, TOOL_SPECS, SYSTEM_PROMPT)
+
+        full, full_ms = timed_ms(model._apply_chat_template, request["messages"], request["tools"])
+        memoized, memoized_ms = timed_ms(
+            model._chat_template.render, request["messages"], request["tools"]
+        )
+        assert memoized == full, f"turn {turn}: memoized render differs from full render"
+        full_total += full_ms
+        memoized_total += memoized_ms
+
+        if turn == 1 or turn % args.report_every == 0:
+            print(
+                f"{turn:>6} {len(request['messages']):>9} {len(full):>9} {full_ms:>9.2f}"
+                f" {memoized_ms:>12.2f} {full_ms / max(memoized_ms, 1e-6):>7.1f}x"
+            )
+
+    print(f"\nTotal full render time:     {full_total:>9.1f} ms")
+    print(f"Total memoized render time: {memoized_total:>9.1f} ms")
+    print(f"Memoized renderer enabled:  {model._chat_template.enabled}")
+    print("\n✅ Benchmark complete!")
+
+
+if __name__ == "__main__":
+    main()
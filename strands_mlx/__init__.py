@@ -1,5 +1,7 @@
 """Strands MLX Model Provider for Apple Silicon."""
 
+from strands_mlx.mlx_cancellation import CancellationToken, GenerationCancelledError
+from strands_mlx.mlx_conversation_manager import MLXConversationManager
 from strands_mlx.mlx_model import MLXModel
 from strands_mlx.mlx_session_manager import MLXSessionManager
 from strands_mlx.tools import (
@@ -16,6 +18,9 @@ try:
 
     __all__ = [
         "MLXModel",
+        "MLXConversationManager",
+        "CancellationToken",
+        "GenerationCancelledError",
         "MLXSessionManager",
         "mlx_trainer",
         "mlx_invoke",
@@ -29,6 +34,9 @@ except ImportError:
     # mlx-vlm not installed
     __all__ = [
         "MLXModel",
+        "MLXConversationManager",
+        "CancellationToken",
+        "GenerationCancelledError",
         "MLXSessionManager",
         "mlx_trainer",
         "mlx_invoke",
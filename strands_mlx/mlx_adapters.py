@@ -0,0 +1,287 @@
+"""Hot-swappable LoRA/DoRA adapters on a shared base model.
+
+The base weights stay loaded; switching adapters only replaces the low-rank
+layers. Adapter weights read from disk are kept in an in-memory LRU, so
+switching back to a recently used adapter costs a module swap and no I/O.
+
+A base model is shared by every MLXModel instance using it (see
+``mlx_model_registry``), so each instance activates its own adapter right
+before it runs on the MLX worker thread. All MLX work is serialized on that
+thread, so an adapter never changes in the middle of another instance's
+generation.
+
+For batched decoding, ``set_rows`` gives every row of the batch its own
+adapter instead (S-LoRA/Punica style): the base layers are wrapped once, the
+low-rank matrices of all adapters in use are stacked, and each row gathers its
+adapter's matrices with ``mx.gather_mm``. Only LoRA adapters on linear layers
+can be batched this way.
+
+- S-LoRA: https://arxiv.org/abs/2311.03285
+- Punica: https://arxiv.org/abs/2310.18547
+"""
+
+import json
+import logging
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import mlx.core as mx
+import mlx.nn as nn
+from mlx.utils import tree_unflatten
+from mlx_lm.tuner.dora import DoRAEmbedding, DoRALinear
+from mlx_lm.tuner.lora import LoRAEmbedding, LoRALinear, LoRASwitchLinear
+from mlx_lm.tuner.utils import linear_to_lora_layers
+
+logger = logging.getLogger(__name__)
+
+ADAPTER_CONFIG_FILE = "adapter_config.json"
+ADAPTER_WEIGHTS_FILE = "adapters.safetensors"
+
+_LORA_TYPES = (LoRALinear, LoRASwitchLinear, DoRALinear)
+_LORA_EMBEDDING_TYPES = (LoRAEmbedding, DoRAEmbedding)
+
+AdapterVersion = Tuple[str, int, float]
+
+
+def adapter_version(adapter_path: str) -> Tuple[str, int, float]:
+    """Identify an adapter's contents by path, size and modification time.
+
+    Retraining an adapter in place (e.g. with mlx_trainer) changes its version.
+    """
+    weights = os.stat(Path(adapter_path) / ADAPTER_WEIGHTS_FILE)
+    return adapter_path, weights.st_size, weights.st_mtime
+
+
+def adapter_namespace(adapter_path: Optional[str]) -> str:
+    """Prompt cache namespace for KV states computed with an adapter ("" for none)."""
+    if not adapter_path:
+        return ""
+    return ":".join(str(part) for part in adapter_version(adapter_path))
+
+
+class _Adapter:
+    """Adapter configuration and weights loaded from an adapter directory."""
+
+    def __init__(self, adapter_path: str) -> None:
+        with open(Path(adapter_path) / ADAPTER_CONFIG_FILE) as f:
+            config = json.load(f)
+
+        self.fine_tune_type = config.get("fine_tune_type", "lora")
+        if self.fine_tune_type not in ("lora", "dora"):
+            raise ValueError(
+                f"adapter_path=<{adapter_path}> | {self.fine_tune_type} fine-tunes cannot be hot-swapped"
+            )
+        self.path = adapter_path
+        self.num_layers = config["num_layers"]
+        self.lora_parameters = config["lora_parameters"]
+        self.weights = mx.load(str(Path(adapter_path) / ADAPTER_WEIGHTS_FILE))
+        mx.eval(self.weights)
+
+    def low_rank_layers(self) -> Dict[str, Tuple[mx.array, mx.array]]:
+        """Low-rank matrices keyed by the path of the layer they adapt."""
+        if self.fine_tune_type != "lora":
+            raise ValueError(f"adapter_path=<{self.path}> | only LoRA adapters can be batched")
+        return {
+            name[: -len(".lora_a")]: (value, self.weights[name[: -len("a")] + "b"])
+            for name, value in self.weights.items()
+            if name.endswith(".lora_a")
+        }
+
+
+class _RowAdapters:
+    """Adapter slot of every row in the current batch, shared by all wrapped layers."""
+
+    def __init__(self) -> None:
+        self.slots: Optional[mx.array] = None
+
+
+class MultiLoRALinear(nn.Module):
+    """Linear layer applying a different LoRA adapter to each row of the batch.
+
+    Slot 0 is the base model (all-zero low-rank matrices). Adapters of
+    different ranks are zero-padded to the largest rank.
+    """
+
+    def __init__(
+        self,
+        base: nn.Module,
+        rows: _RowAdapters,
+        lora_a: mx.array,
+        lora_b: mx.array,
+        scales: mx.array,
+    ) -> None:
+        """Initialize multi-adapter layer.
+
+        Args:
+            base: Wrapped Linear or QuantizedLinear layer.
+            rows: Shared per-row adapter slots.
+            lora_a: Stacked down projections, shape (slots, input_dims, rank).
+            lora_b: Stacked up projections, shape (slots, rank, output_dims).
+            scales: Per-slot LoRA scale, shape (slots,).
+        """
+        super().__init__()
+        self.base = base
+        self.lora_a = lora_a
+        self.lora_b = lora_b
+        self.scales = scales
+        self._rows = rows
+
+    def __call__(self, x: mx.array) -> mx.array:
+        y = self.base(x)
+        slots = self._rows.slots
+        if slots is None:
+            return y
+        z = mx.gather_mm(x, self.lora_a, rhs_indices=slots)
+        z = mx.gather_mm(z, self.lora_b, rhs_indices=slots)
+        return y + (self.scales[slots][:, None, None] * z).astype(x.dtype)
+
+
+class MLXAdapterManager:
+    """Attaches, detaches and switches adapters on one base model.
+
+    Example:
+        >>> adapters = MLXAdapterManager(model)
+        >>> adapters.activate("./adapters/code_review")
+        >>> adapters.activate(None)  # back to the base model
+    """
+
+    def __init__(self, model: Any, max_adapters: int = 8) -> None:
+        """Initialize adapter manager.
+
+        Args:
+            model: Loaded MLX language model without adapters.
+            max_adapters: Adapters whose weights are kept in memory.
+        """
+        self.model = model
+        self.max_adapters = max_adapters
+        self.active: Optional[AdapterVersion] = None
+        self._adapters: "OrderedDict[AdapterVersion, _Adapter]" = OrderedDict()
+
+        # Batched (multi-adapter) mode
+        self._rows = _RowAdapters()
+        self._slots: List[Optional[AdapterVersion]] = []
+
+    def activate(self, adapter_path: Optional[str]) -> None:
+        """Make an adapter (or no adapter) active on the base model.
+
+        Must run on the MLX worker thread.
+
+        Args:
+            adapter_path: Resolved local adapter directory, or None for the base model.
+        """
+        version = adapter_version(adapter_path) if adapter_path else None
+        if version == self.active and not self._slots:
+            return
+
+        adapter = self._get(version) if version else None
+        self._detach()
+        if adapter is not None:
+            linear_to_lora_layers(
+                self.model,
+                adapter.num_layers,
+                adapter.lora_parameters,
+                use_dora=adapter.fine_tune_type == "dora",
+            )
+            self.model.load_weights(list(adapter.weights.items()), strict=False)
+        self.model.eval()
+        self.active = version
+        logger.debug("adapter_path=<%s> | adapter activated", adapter_path)
+
+    def set_rows(self, adapter_paths: List[Optional[str]]) -> None:
+        """Give each row of the next forward passes its own adapter.
+
+        Must run on the MLX worker thread. The batch dimension of the model
+        input must match ``len(adapter_paths)``.
+
+        Args:
+            adapter_paths: Resolved adapter directory (or None) for each row.
+        """
+        versions = [adapter_version(path) if path else None for path in adapter_paths]
+        if not self._slots and not any(versions):
+            # Only the base model is needed; skip the gathers entirely
+            if self.active is not None:
+                self._detach()
+                self.active = None
+            return
+
+        missing = [v for v in dict.fromkeys(versions) if v is not None and v not in self._slots]
+        if missing or not self._slots:
+            # Keep idle slots up to max_adapters so rows coming and going don't force rebuilds
+            idle = [v for v in self._slots[1:] if v not in versions]
+            busy = [v for v in self._slots[1:] if v in versions]
+            keep = idle[max(len(idle) + len(busy) + len(missing) - self.max_adapters, 0) :]
+            self._build_slots(keep + busy + missing)
+
+        index = {version: slot for slot, version in enumerate(self._slots)}
+        self._rows.slots = mx.array([index[v] for v in versions], mx.uint32)
+
+    def _build_slots(self, versions: List[AdapterVersion]) -> None:
+        """Wrap every layer targeted by ``versions`` with their stacked low-rank matrices."""
+        adapters = [self._get(version) for version in versions]
+        layers = [adapter.low_rank_layers() for adapter in adapters]
+
+        self._detach()
+        self.active = None
+        modules = dict(self.model.named_modules())
+        wrapped = []
+        for name in sorted(set().union(*layers)):
+            base = modules[name]
+            if not isinstance(base, (nn.Linear, nn.QuantizedLinear)):
+                raise ValueError(f"layer=<{name}> | only linear layers can be batched")
+
+            pairs = [adapter_layers.get(name) for adapter_layers in layers]
+            input_dims, output_dims = next((a.shape[0], b.shape[1]) for a, b in filter(None, pairs))
+            rank = max(a.shape[1] for a, _ in filter(None, pairs))
+
+            # Slot 0 (the base model) and adapters not touching this layer contribute zeros
+            lora_a = [mx.zeros((input_dims, rank))]
+            lora_b = [mx.zeros((rank, output_dims))]
+            scales = [0.0]
+            for adapter, pair in zip(adapters, pairs):
+                a, b = pair or (mx.zeros((input_dims, rank)), mx.zeros((rank, output_dims)))
+                lora_a.append(mx.pad(a, [(0, 0), (0, rank - a.shape[1])]))
+                lora_b.append(mx.pad(b, [(0, rank - b.shape[0]), (0, 0)]))
+                scales.append(float(adapter.lora_parameters["scale"]) if pair else 0.0)
+
+            layer = MultiLoRALinear(
+                base, self._rows, mx.stack(lora_a), mx.stack(lora_b), mx.array(scales)
+            )
+            wrapped.append((name, layer))
+
+        if wrapped:
+            self.model.update_modules(tree_unflatten(wrapped))
+            mx.eval([layer.parameters() for _, layer in wrapped])
+        self._slots = [None, *versions]
+        logger.debug(
+            "adapters=<%d>, layers=<%d> | built batched adapter slots", len(adapters), len(wrapped)
+        )
+
+    def _get(self, version: AdapterVersion) -> _Adapter:
+        """Get adapter weights from the LRU, loading them on a miss."""
+        adapter = self._adapters.get(version)
+        if adapter is not None:
+            self._adapters.move_to_end(version)
+            return adapter
+
+        logger.debug("adapter_path=<%s> | loading adapter weights", version[0])
+        adapter = self._adapters[version] = _Adapter(version[0])
+        while len(self._adapters) > max(self.max_adapters, 1):
+            self._adapters.popitem(last=False)
+        return adapter
+
+    def _detach(self) -> None:
+        """Restore the base layers wrapped by the active adapter(s)."""
+        base_layers: list[Tuple[str, Any]] = []
+        for name, module in self.model.named_modules():
+            if isinstance(module, MultiLoRALinear):
+                base_layers.append((name, module.base))
+            elif isinstance(module, _LORA_TYPES):
+                base_layers.append((name, module.linear))
+            elif isinstance(module, _LORA_EMBEDDING_TYPES):
+                base_layers.append((name, module.embedding))
+        if base_layers:
+            self.model.update_modules(tree_unflatten(base_layers))
+        self._slots = []
+        self._rows.slots = None
@@ -0,0 +1,395 @@
+"""Continuous-batching inference engine for MLX models.
+
+Concurrent ``MLXModel.stream`` calls on the same model are decoded together:
+every decode step runs one forward pass over all active sequences. New
+requests are admitted at step boundaries (their prompt is prefilled on its
+own, then the sequence joins the batch), and finished or abandoned sequences
+are evicted. Decode is memory-bandwidth bound, so a batch of N sequences costs
+little more per step than a single one.
+
+Sequences may use different LoRA adapters on the same base model; each row
+of the batch gathers its own adapter's low-rank matrices (see
+``MLXAdapterManager.set_rows``).
+
+The engine loop runs on the MLX worker thread while any sequence is active.
+It gives the worker up every ``steps_per_turn`` decode steps and queues itself
+again, so other worker jobs (sequential streams, sampling, scoring, prompt
+cache builds) are not starved under steady concurrent load.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, AsyncGenerator, Callable, List, Optional, Tuple
+
+import mlx.core as mx
+from mlx_lm.generate import GenerationResponse, generation_stream
+from mlx_lm.models.cache import BatchKVCache, KVCache, make_prompt_cache
+
+from strands_mlx.mlx_adapters import MLXAdapterManager
+from strands_mlx.mlx_cancellation import CancellationToken
+from strands_mlx.mlx_prompt_cache import prefill_steps
+from strands_mlx.mlx_worker import submit_to_worker
+
+logger = logging.getLogger(__name__)
+
+_ITEM, _DONE, _ERROR = range(3)
+
+PreparePrompt = Callable[[], Tuple[List[int], List[Any], List[int]]]
+FinishCallback = Callable[[List[int], List[Any]], None]
+
+
+def supports_batching(model: Any) -> bool:
+    """Whether every layer of the model uses a plain KV cache.
+
+    Args:
+        model: Loaded MLX language model.
+
+    Returns:
+        True if the model can be decoded by the batch engine.
+    """
+    return all(type(c) is KVCache for c in make_prompt_cache(model))
+
+
+def batch_rows(cache: KVCache, num_rows: int = 1) -> BatchKVCache:
+    """Wrap a single-sequence KV cache as a batch cache of ``num_rows`` identical rows.
+
+    Args:
+        cache: Single-sequence cache of one layer.
+        num_rows: Rows in the batch; more than one copies the cache (which is left unchanged).
+
+    Returns:
+        Batch cache of the layer.
+    """
+    keys, values = cache.state
+    batch = BatchKVCache([0] * num_rows)
+    if num_rows > 1:
+        keys, values = mx.repeat(keys, num_rows, axis=0), mx.repeat(values, num_rows, axis=0)
+    batch.keys, batch.values = keys, values
+    batch.offset = mx.array([cache.offset] * num_rows)
+    batch._idx = cache.offset
+    return batch
+
+
+def _extract_row(cache: BatchKVCache, index: int) -> KVCache:
+    """Copy one row of a batch cache back into a single-sequence KV cache."""
+    padding = cache.left_padding[index].item()
+    single = KVCache()
+    single.state = (
+        cache.keys[index : index + 1, :, padding : cache._idx, :],
+        cache.values[index : index + 1, :, padding : cache._idx, :],
+    )
+    return single
+
+
+class _Sequence:
+    """One request being decoded by the engine."""
+
+    def __init__(
+        self,
+        prepare: PreparePrompt,
+        max_tokens: int,
+        sampler: Callable[[mx.array], mx.array],
+        deliver: Callable[[Tuple[int, Any]], None],
+        on_finish: Optional[FinishCallback],
+        detokenizer: Any,
+        adapter_path: Optional[str] = None,
+        cancellation: Optional[CancellationToken] = None,
+    ) -> None:
+        self.prepare = prepare
+        self.max_tokens = max_tokens
+        self.sampler = sampler
+        self.deliver = deliver
+        self.on_finish = on_finish
+        self.detokenizer = detokenizer
+        self.adapter_path = adapter_path
+        self.cancellation = cancellation
+        self.cancelled = False
+
+        self.prompt_tokens: List[int] = []
+        self.tokens: List[int] = []
+        self.next_token = 0
+        self.prompt_size = 0
+        self.prompt_tps = 0.0
+        self.decode_start = 0.0
+        self.peak_memory = 0
+
+    def send(self, kind: int, value: Any = None) -> None:
+        """Hand an item to the consumer; a closed event loop cancels the sequence."""
+        try:
+            self.deliver((kind, value))
+        except RuntimeError:
+            self.cancelled = True
+
+
+class MLXBatchEngine:
+    """Continuous-batching decoder shared by concurrent callers of one model.
+
+    Example:
+        >>> engine = MLXBatchEngine(model, tokenizer, max_batch_size=8)
+        >>> async for response in engine.generate(prepare, max_tokens=256, sampler=sampler):
+        ...     print(response.text, end="")
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        tokenizer: Any,
+        max_batch_size: int = 8,
+        prefill_step_size: int = 2048,
+        adapters: Optional[MLXAdapterManager] = None,
+        steps_per_turn: int = 16,
+    ) -> None:
+        """Initialize batch engine.
+
+        Args:
+            model: Loaded MLX language model.
+            tokenizer: mlx-lm TokenizerWrapper.
+            max_batch_size: Maximum sequences decoded together.
+            prefill_step_size: Maximum prompt tokens per prefill forward pass.
+            adapters: Adapter manager of the base model, for per-sequence adapters.
+            steps_per_turn: Decode steps after which the engine lets other queued worker
+                jobs run before continuing.
+        """
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        self.prefill_step_size = prefill_step_size
+        self.adapters = adapters
+        self.steps_per_turn = steps_per_turn
+
+        self._lock = threading.Lock()
+        self._pending: List[_Sequence] = []
+        self._running = False
+
+        # Worker-thread state
+        self._rows: List[_Sequence] = []
+        self._cache: Optional[List[BatchKVCache]] = None
+
+    async def generate(
+        self,
+        prepare: PreparePrompt,
+        max_tokens: int,
+        sampler: Callable[[mx.array], mx.array],
+        on_finish: Optional[FinishCallback] = None,
+        adapter_path: Optional[str] = None,
+        cancellation: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[GenerationResponse, None]:
+        """Decode one request as part of the shared batch.
+
+        Args:
+            prepare: Called on the worker thread at admission. Returns
+                (full prompt tokens, prompt cache, tokens still to prefill).
+            max_tokens: Maximum tokens to generate.
+            sampler: Token sampler applied to this sequence's logprobs.
+            on_finish: Called on the worker thread with the processed tokens and
+                a single-sequence cache once the sequence leaves the batch.
+            adapter_path: Resolved LoRA adapter for this sequence (None for the base model).
+            cancellation: Token checked after every prefill chunk and decode step; a
+                cancelled sequence leaves the batch and its cache is dropped.
+
+        Yields:
+            Generation responses, in the format of mlx_lm.stream_generate.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        sequence = _Sequence(
+            prepare,
+            max_tokens,
+            sampler,
+            lambda item: loop.call_soon_threadsafe(queue.put_nowait, item),
+            on_finish,
+            self.tokenizer.detokenizer,
+            adapter_path,
+            cancellation,
+        )
+
+        with self._lock:
+            self._pending.append(sequence)
+            if not self._running:
+                self._running = True
+                submit_to_worker(self._run)
+
+        try:
+            while True:
+                kind, value = await queue.get()
+                if kind == _DONE:
+                    break
+                if kind == _ERROR:
+                    raise value
+                yield value
+        finally:
+            sequence.cancelled = True
+
+    def _run(self) -> None:
+        """Engine loop. Runs on the MLX worker thread until no work is left.
+
+        After ``steps_per_turn`` steps it queues itself behind the jobs already
+        submitted to the worker and returns; the batch state stays as it is.
+        """
+        try:
+            with mx.stream(generation_stream):
+                for _ in range(max(self.steps_per_turn, 1)):
+                    with self._lock:
+                        room = self.max_batch_size - len(self._rows)
+                        admitted, self._pending = self._pending[:room], self._pending[room:]
+                        if not admitted and not self._rows:
+                            self._running = False
+                            return
+
+                    for sequence in admitted:
+                        if not sequence.cancelled:
+                            self._try_admit(sequence)
+
+                    if self._rows:
+                        self._step()
+            submit_to_worker(self._run)
+        except Exception as e:
+            logger.error("batch engine failed: %s", e, exc_info=True)
+            with self._lock:
+                failed, self._pending = self._rows + self._pending, []
+                self._rows, self._cache = [], None
+                self._running = False
+            for sequence in failed:
+                sequence.send(_ERROR, e)
+
+    def _try_admit(self, sequence: _Sequence) -> None:
+        """Admit a sequence, failing only that sequence if its prompt cannot be processed."""
+        try:
+            self._admit(sequence)
+        except Exception as e:
+            if sequence in self._rows:
+                raise
+            logger.warning("failed to admit sequence: %s", e)
+            sequence.send(_ERROR, e)
+
+    def _set_adapters(self, sequences: List[_Sequence]) -> None:
+        """Select the adapter of each row for the next forward pass."""
+        if self.adapters is not None:
+            self.adapters.set_rows([sequence.adapter_path for sequence in sequences])
+
+    def _admit(self, sequence: _Sequence) -> None:
+        """Prefill a new sequence on its own and add it to the batch."""
+        if sequence.cancellation is not None:
+            sequence.cancellation.raise_if_cancelled()
+        tic = time.perf_counter()
+        # Rows already in the batch have recorded the peak up to now (see _emit)
+        mx.reset_peak_memory()
+        self._set_adapters([sequence])
+        sequence.prompt_tokens, cache, suffix = sequence.prepare()
+        sequence.prompt_size = len(suffix)
+
+        for _ in prefill_steps(self.model, cache, suffix[:-1], self.prefill_step_size):
+            if sequence.cancellation is not None:
+                sequence.cancellation.raise_if_cancelled()
+        logits = self.model(mx.array(suffix[-1:])[None], cache=cache)[:, -1, :]
+        logprobs = logits - mx.logsumexp(logits, axis=-1, keepdims=True)
+        token = sequence.sampler(logprobs)
+        mx.eval(token, logprobs)
+
+        sequence.prompt_tps = len(suffix) / (time.perf_counter() - tic)
+        sequence.decode_start = time.perf_counter()
+
+        rows = [batch_rows(c) for c in cache]
+        if self._cache is None:
+            self._cache = rows
+        else:
+            for batch_cache, row in zip(self._cache, rows):
+                batch_cache.extend(row)
+        self._rows.append(sequence)
+
+        if not self._emit(sequence, token.item(), logprobs[0]):
+            self._evict([len(self._rows) - 1])
+
+    def _step(self) -> None:
+        """Run one decode step over all active sequences."""
+        inputs = mx.array([[sequence.next_token] for sequence in self._rows])
+        self._set_adapters(self._rows)
+        logits = self.model(inputs, cache=self._cache)[:, -1, :]
+        logprobs = logits - mx.logsumexp(logits, axis=-1, keepdims=True)
+        tokens = mx.concatenate(
+            [sequence.sampler(logprobs[i : i + 1]) for i, sequence in enumerate(self._rows)]
+        )
+        mx.eval(tokens, logprobs)
+
+        finished = [
+            index
+            for index, (sequence, token) in enumerate(zip(self._rows, tokens.tolist()))
+            if not self._emit(sequence, token, logprobs[index])
+        ]
+        if finished:
+            self._evict(finished)
+
+    def _emit(self, sequence: _Sequence, token: int, logprobs: mx.array) -> bool:
+        """Deliver a sampled token. Returns False when the sequence is finished."""
+        if sequence.cancelled:
+            return False
+        if sequence.cancellation is not None and sequence.cancellation.cancelled:
+            try:
+                sequence.cancellation.raise_if_cancelled()
+            except Exception as e:
+                sequence.send(_ERROR, e)
+            sequence.cancelled = True
+            return False
+
+        finish_reason = None
+        if token in self.tokenizer.eos_token_ids:
+            finish_reason = "stop"
+        else:
+            sequence.detokenizer.add_token(token)
+            if len(sequence.tokens) + 1 >= sequence.max_tokens:
+                finish_reason = "length"
+        if finish_reason:
+            sequence.detokenizer.finalize()
+
+        sequence.tokens.append(token)
+        sequence.next_token = token
+        num_tokens = len(sequence.tokens)
+        elapsed = max(time.perf_counter() - sequence.decode_start, 1e-9)
+        sequence.peak_memory = max(sequence.peak_memory, mx.get_peak_memory())
+        sequence.send(
+            _ITEM,
+            GenerationResponse(
+                text=sequence.detokenizer.last_segment,
+                token=token,
+                logprobs=logprobs,
+                from_draft=False,
+                prompt_tokens=sequence.prompt_size,
+                prompt_tps=sequence.prompt_tps,
+                generation_tokens=num_tokens,
+                generation_tps=num_tokens / elapsed,
+                peak_memory=sequence.peak_memory / 1e9,
+                finish_reason=finish_reason,
+            ),
+        )
+        if finish_reason:
+            sequence.send(_DONE)
+            return False
+        return not sequence.cancelled
+
+    def _evict(self, indices: List[int]) -> None:
+        """Remove finished sequences, handing their caches back for reuse."""
+        assert self._cache is not None
+        for index in indices:
+            sequence = self._rows[index]
+            # Cancelled requests drop their cache so its memory goes back to the live ones
+            if sequence.cancellation is not None and sequence.cancellation.cancelled:
+                continue
+            if sequence.on_finish is not None:
+                try:
+                    # The last sampled token was never fed to the model
+                    processed = sequence.prompt_tokens + sequence.tokens[:-1]
+                    sequence.on_finish(processed, [_extract_row(c, index) for c in self._cache])
+                except Exception as e:
+                    logger.warning("failed to store finished sequence cache: %s", e)
+
+        keep = [index for index in range(len(self._rows)) if index not in indices]
+        self._rows = [self._rows[index] for index in keep]
+        if not keep:
+            self._cache = None
+        else:
+            keep_indices = mx.array(keep, mx.int32)
+            for batch_cache in self._cache:
+                batch_cache.filter(keep_indices)
+        mx.clear_cache()
@@ -0,0 +1,74 @@
+"""Cancellation and deadlines for in-flight MLX generations.
+
+Generation runs synchronously on the MLX worker thread, so it cannot be
+interrupted from the event loop directly. A ``CancellationToken`` is a
+thread-safe flag (optionally with a deadline) that the worker checks after
+every prefill chunk and decode step; once it trips, the request stops, its
+KV cache is dropped instead of being kept for reuse, and the consumer gets
+``GenerationCancelledError`` (or ``TimeoutError`` for an expired deadline).
+"""
+
+import threading
+import time
+from typing import Optional
+
+
+class GenerationCancelledError(Exception):
+    """Raised to the consumer of a generation cancelled through its token."""
+
+
+class CancellationToken:
+    """Stops in-flight generations; safe to use from any thread or coroutine.
+
+    Example:
+        >>> token = CancellationToken()
+        >>> task = asyncio.create_task(consume(model.stream(messages, cancellation_token=token)))
+        >>> token.cancel()  # stops at the next prefill chunk or decode step
+    """
+
+    def __init__(
+        self, deadline: Optional[float] = None, parent: Optional["CancellationToken"] = None
+    ) -> None:
+        """Initialize cancellation token.
+
+        Args:
+            deadline: ``time.monotonic()`` timestamp after which the token trips.
+            parent: Token whose cancellation (or deadline) also trips this one.
+        """
+        self.deadline = deadline
+        self.parent = parent
+        self._event = threading.Event()
+
+    @classmethod
+    def with_timeout(
+        cls, timeout: float, parent: Optional["CancellationToken"] = None
+    ) -> "CancellationToken":
+        """Token that trips ``timeout`` seconds from now."""
+        return cls(deadline=time.monotonic() + timeout, parent=parent)
+
+    def cancel(self) -> None:
+        """Request cancellation."""
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the token was cancelled or its deadline passed."""
+        return (
+            self._event.is_set()
+            or (self.deadline is not None and time.monotonic() >= self.deadline)
+            or (self.parent is not None and self.parent.cancelled)
+        )
+
+    def raise_if_cancelled(self) -> None:
+        """Raise if the token tripped.
+
+        Raises:
+            GenerationCancelledError: If the token (or its parent) was cancelled.
+            TimeoutError: If a deadline passed.
+        """
+        if self.parent is not None:
+            self.parent.raise_if_cancelled()
+        if self._event.is_set():
+            raise GenerationCancelledError("generation cancelled")
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise TimeoutError(f"deadline=<{self.deadline:.3f}> | generation deadline exceeded")
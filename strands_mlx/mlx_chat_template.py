@@ -0,0 +1,418 @@
+"""Incremental chat-template rendering and tokenization for growing conversations.
+
+Jinja chat templates loop over the whole message history, so rendering a
+long conversation on every turn costs time proportional to its length. Most
+templates render each turn independently of the ones before it, so the
+rendered text of a stable prefix (system prompt + tools + older messages) can
+be kept and only the messages after it rendered on the next turn.
+
+Messages are rendered after the same head (system message and tools) and
+the head's rendering is cut off, so templates that emit headers, default
+system prompts or tool blocks still produce the same text. Prefixes end right
+before a user message and are rendered followed by a placeholder user turn,
+so templates that render a turn differently once a newer query follows (e.g.
+dropping its reasoning) match the full render too. The first incremental
+renders are compared against a full render; a template whose output still
+differs (or fails to render partial conversations) is rendered in full from
+then on.
+
+The rendered prompt is tokenized the same way: the token ids of the previous
+prompt are kept and only the text after the shared prefix is tokenized. The
+split is placed right before a special token (e.g. ``<|im_start|>``) inside
+the shared prefix. Tokenizers split special tokens out before applying BPE,
+so the text on either side is merged the same way whether it is tokenized
+alone or in the full prompt.
+"""
+
+import bisect
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Placeholder user turn that follows a rendered prefix chunk
+_SENTINEL = {"role": "user", "content": "\u2063"}
+
+RenderFn = Callable[[List[Dict[str, Any]], Optional[List[Dict[str, Any]]], bool], str]
+
+
+class _PrefixEntry:
+    """Rendered text of a conversation prefix."""
+
+    def __init__(
+        self,
+        head: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]],
+        messages: List[Dict[str, Any]],
+        text: str,
+    ) -> None:
+        self.head = head
+        self.tools = tools
+        self.messages = messages
+        self.text = text
+
+
+class ChatTemplateRenderer:
+    """Renders conversations, re-rendering only the messages after a cached prefix.
+
+    Example:
+        >>> renderer = ChatTemplateRenderer(model._apply_chat_template)
+        >>> prompt = renderer.render(request["messages"], request["tools"])
+    """
+
+    def __init__(
+        self,
+        render: RenderFn,
+        tail_messages: int = 4,
+        max_entries: int = 8,
+        verify_renders: int = 2,
+    ) -> None:
+        """Initialize renderer.
+
+        Args:
+            render: Full render function taking (messages, tools, add_generation_prompt).
+            tail_messages: Recent messages always re-rendered; older ones may be cached.
+            max_entries: Conversations whose rendered prefix is kept.
+            verify_renders: Incremental renders checked against a full render first.
+        """
+        self._render = render
+        self.tail_messages = tail_messages
+        self.max_entries = max_entries
+        self.verify_renders = verify_renders
+        self.enabled = True
+        self._entries: List[_PrefixEntry] = []
+        self._head_text: Dict[str, Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def render(
+        self,
+        messages: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]],
+        add_generation_prompt: bool = True,
+    ) -> str:
+        """Render a conversation with the chat template.
+
+        Args:
+            messages: Formatted messages.
+            tools: Formatted tool specs.
+            add_generation_prompt: Whether to append the assistant turn header.
+
+        Returns:
+            Rendered prompt, identical to a full render.
+        """
+        if not self.enabled:
+            return self._render(messages, tools, add_generation_prompt)
+
+        head = messages[:1] if messages and messages[0]["role"] == "system" else []
+        boundary = self._prefix_boundary(messages, len(head))
+        with self._lock:
+            entry = self._lookup(head, tools, messages)
+
+        start, prefix_text = len(head), None
+        if entry is not None:
+            start, prefix_text = len(entry.messages), entry.text
+        elif boundary <= len(head):
+            return self._render(messages, tools, add_generation_prompt)
+
+        try:
+            if boundary > start:
+                # Move the cached prefix up to the newest boundary for the next turn
+                prefix_text = (prefix_text or self._head(head, tools)[0]) + self._render_chunk(
+                    head, tools, messages[start:boundary]
+                )
+                entry = _PrefixEntry(head, tools, messages[:boundary], prefix_text)
+                start = boundary
+                with self._lock:
+                    self._store(entry)
+            text = (prefix_text or "") + self._render_tail(
+                head, tools, messages[start:], add_generation_prompt
+            )
+        except Exception as e:
+            logger.debug("incremental render failed, rendering in full from now on: %s", e)
+            self.enabled = False
+            self.clear()
+            return self._render(messages, tools, add_generation_prompt)
+
+        if self.verify_renders > 0:
+            self.verify_renders -= 1
+            full = self._render(messages, tools, add_generation_prompt)
+            if full != text:
+                logger.debug("chat template is not prefix-stable, rendering in full")
+                self.enabled = False
+                self.clear()
+            return full
+        return text
+
+    def clear(self) -> None:
+        """Drop all cached prefixes."""
+        with self._lock:
+            self._entries.clear()
+            self._head_text.clear()
+
+    def _prefix_boundary(self, messages: List[Dict[str, Any]], head_length: int) -> int:
+        """Index of the newest user message at least ``tail_messages`` from the end."""
+        for index in range(len(messages) - self.tail_messages, head_length, -1):
+            if messages[index]["role"] == "user":
+                return index
+        return head_length
+
+    def _lookup(
+        self,
+        head: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]],
+        messages: List[Dict[str, Any]],
+    ) -> Optional[_PrefixEntry]:
+        """Cached entry whose messages are the longest prefix of ``messages``."""
+        best = None
+        for entry in self._entries:
+            length = len(entry.messages)
+            if (
+                length <= len(messages)
+                and (best is None or length > len(best.messages))
+                and entry.head == head
+                and entry.tools == tools
+                and entry.messages == messages[:length]
+            ):
+                best = entry
+        if best is not None:
+            self._entries.remove(best)
+            self._entries.append(best)
+        return best
+
+    def _store(self, entry: _PrefixEntry) -> None:
+        """Keep an entry, replacing the ones it extends."""
+        self._entries = [
+            other
+            for other in self._entries
+            if not (
+                other.head == entry.head
+                and other.tools == entry.tools
+                and entry.messages[: len(other.messages)] == other.messages
+            )
+        ]
+        self._entries.append(entry)
+        while len(self._entries) > self.max_entries:
+            self._entries.pop(0)
+
+    def _head(
+        self, head: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]]
+    ) -> Tuple[str, str]:
+        """Rendered head (system message and tools) and the text of a sentinel turn after it.
+
+        Templates may reject a conversation without user messages, so the head
+        is never rendered alone: it is what remains of ``head + [sentinel]``
+        once the sentinel turn, measured by rendering a second one, is cut off.
+        """
+        key = repr((head, tools))
+        with self._lock:
+            cached = self._head_text.get(key)
+        if cached is not None:
+            return cached
+
+        one = self._render(head + [_SENTINEL], tools, False)
+        two = self._render(head + [_SENTINEL, _SENTINEL], tools, False)
+        sentinel_text = two[len(one) :]
+        if not two.startswith(one) or not one.endswith(sentinel_text):
+            raise ValueError("sentinel turns do not render independently")
+        cached = (one[: len(one) - len(sentinel_text)], sentinel_text)
+        with self._lock:
+            if len(self._head_text) >= 2 * self.max_entries:
+                self._head_text.clear()
+            self._head_text[key] = cached
+        return cached
+
+    def _render_chunk(
+        self,
+        head: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]],
+        chunk: List[Dict[str, Any]],
+    ) -> str:
+        """Text the template adds for ``chunk`` when a user message follows it.
+
+        Templates may render a turn differently depending on what comes after it
+        (e.g. dropping reasoning from turns before the latest user message), so the
+        chunk is rendered followed by a sentinel user message that is then cut off.
+        """
+        head_text, sentinel_text = self._head(head, tools)
+        text = self._render(head + chunk + [_SENTINEL], tools, False)
+        if not text.startswith(head_text) or not text.endswith(sentinel_text):
+            raise ValueError(
+                "rendered messages do not start with the head or end with the sentinel"
+            )
+        return text[len(head_text) : len(text) - len(sentinel_text)]
+
+    def _render_tail(
+        self,
+        head: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]],
+        tail: List[Dict[str, Any]],
+        add_generation_prompt: bool,
+    ) -> str:
+        """Text the template adds for ``tail`` after the head."""
+        head_text, _ = self._head(head, tools)
+        text = self._render(head + tail, tools, add_generation_prompt)
+        if not text.startswith(head_text):
+            raise ValueError("rendered messages do not start with the rendered head")
+        return text[len(head_text) :]
+
+
+def _common_prefix_chars(a: str, b: str) -> int:
+    """Length of the common prefix of two strings, by binary search over slices."""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[:mid] == b[:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+class _EncodedPrompt:
+    """Token ids of a rendered prompt and where its special tokens are."""
+
+    def __init__(self, text: str, tokens: List[int], anchors: List[Tuple[int, int, int]]) -> None:
+        self.text = text
+        self.tokens = tokens
+        # (start char, end char, token index) of each special token in the text
+        self.anchors = anchors
+        self.anchor_ends = [end for _, end, _ in anchors]
+
+
+class PromptEncoder:
+    """Tokenizes prompts, re-tokenizing only the text after a previous prompt's prefix.
+
+    Example:
+        >>> encoder = PromptEncoder(model.tokenizer)
+        >>> prompt_tokens = encoder.encode(prompt)
+    """
+
+    def __init__(self, tokenizer: Any, max_entries: int = 8, verify_encodes: int = 2) -> None:
+        """Initialize encoder.
+
+        Args:
+            tokenizer: mlx-lm tokenizer wrapper (or a Hugging Face tokenizer).
+            max_entries: Conversations whose prompt tokens are kept.
+            verify_encodes: Incremental encodes checked against a full encode first.
+        """
+        self.tokenizer = tokenizer
+        self.max_entries = max_entries
+        self.verify_encodes = verify_encodes
+        self._entries: List[_EncodedPrompt] = []
+        self._lock = threading.Lock()
+
+        # Token offsets are needed to split a prompt, and only fast tokenizers report them
+        hf_tokenizer = getattr(tokenizer, "_tokenizer", tokenizer)
+        self._hf_tokenizer = hf_tokenizer
+        added_tokens = getattr(hf_tokenizer, "added_tokens_decoder", None) or {}
+        self._special_ids = {
+            token_id for token_id, token in added_tokens.items() if getattr(token, "special", False)
+        }
+        self.enabled = bool(getattr(hf_tokenizer, "is_fast", False) and self._special_ids)
+
+    def encode(self, prompt: str, incremental: bool = True, remember: bool = True) -> List[int]:
+        """Tokenize a rendered prompt the same way mlx_lm.stream_generate does.
+
+        Args:
+            prompt: Prompt rendered by the chat template.
+            incremental: Reuse (and remember) the token ids of previous prompts.
+            remember: Keep this prompt for later ones; off for one-off extensions of a prompt.
+
+        Returns:
+            Prompt token ids, identical to a full tokenization.
+        """
+        if not incremental or not self.enabled:
+            return self._encode_full(prompt)
+
+        with self._lock:
+            entry, anchor = self._lookup(prompt)
+
+        try:
+            if anchor is None:
+                encoded = self._encode_offsets(prompt, 0, 0, self._add_special_tokens(prompt))
+            else:
+                start, _, token_index = anchor
+                suffix = self._encode_offsets(prompt[start:], start, token_index, False)
+                encoded = _EncodedPrompt(
+                    prompt,
+                    entry.tokens[:token_index] + suffix.tokens,
+                    [a for a in entry.anchors if a[2] < token_index] + suffix.anchors,
+                )
+        except Exception as e:
+            logger.debug("incremental encode failed, encoding in full from now on: %s", e)
+            self.enabled = False
+            self.clear()
+            return self._encode_full(prompt)
+
+        if anchor is not None and self.verify_encodes > 0:
+            self.verify_encodes -= 1
+            full = self._encode_full(prompt)
+            if full != encoded.tokens:
+                logger.debug("tokenizer is not split-stable at special tokens, encoding in full")
+                self.enabled = False
+                self.clear()
+                return full
+
+        if remember:
+            with self._lock:
+                self._store(encoded, entry)
+        return list(encoded.tokens)
+
+    def clear(self) -> None:
+        """Drop all remembered prompts."""
+        with self._lock:
+            self._entries.clear()
+
+    def _add_special_tokens(self, prompt: str) -> bool:
+        """Whether to add special tokens; templates that emit the BOS token already did."""
+        bos_token = getattr(self.tokenizer, "bos_token", None)
+        return bos_token is None or not prompt.startswith(bos_token)
+
+    def _encode_full(self, prompt: str) -> List[int]:
+        """Tokenize a whole prompt."""
+        return list(
+            self.tokenizer.encode(prompt, add_special_tokens=self._add_special_tokens(prompt))
+        )
+
+    def _encode_offsets(
+        self, text: str, char_offset: int, token_offset: int, add_special_tokens: bool
+    ) -> _EncodedPrompt:
+        """Tokenize text, recording its special tokens shifted by the given offsets."""
+        encoding = self._hf_tokenizer(
+            text, add_special_tokens=add_special_tokens, return_offsets_mapping=True
+        )
+        tokens = list(encoding["input_ids"])
+        anchors = [
+            (start + char_offset, end + char_offset, index + token_offset)
+            for index, (token, (start, end)) in enumerate(zip(tokens, encoding["offset_mapping"]))
+            # Special tokens added by the tokenizer have no text to split at
+            if token in self._special_ids and end > start
+        ]
+        return _EncodedPrompt(text, tokens, anchors)
+
+    def _lookup(
+        self, prompt: str
+    ) -> Tuple[Optional[_EncodedPrompt], Optional[Tuple[int, int, int]]]:
+        """Remembered prompt sharing the longest prefix, and the special token to split at."""
+        best, best_shared = None, 0
+        for entry in self._entries:
+            shared = _common_prefix_chars(entry.text, prompt)
+            if shared > best_shared:
+                best, best_shared = entry, shared
+        if best is None:
+            return None, None
+
+        # Split before the last special token that lies entirely in the shared prefix
+        index = bisect.bisect_right(best.anchor_ends, best_shared) - 1
+        if index < 0:
+            return None, None
+        return best, best.anchors[index]
+
+    def _store(self, encoded: _EncodedPrompt, base: Optional[_EncodedPrompt]) -> None:
+        """Remember a prompt in place of the one it was derived from."""
+        if base is not None and base in self._entries:
+            self._entries.remove(base)
+        self._entries.append(encoded)
+        while len(self._entries) > self.max_entries:
+            self._entries.pop(0)
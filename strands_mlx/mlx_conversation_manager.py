@@ -0,0 +1,225 @@
+"""Token-budget conversation management for MLX models.
+
+Strands' built-in managers trim history by message count. This manager
+measures the history in real tokens with the model's chat template and
+tokenizer, and trims (or summarizes) the oldest messages in one large block
+once the history nears the context window. Every trim changes the prompt
+prefix and invalidates the prompt KV cache from that point on, so removing a
+big block at once means the cache is rebuilt rarely instead of every turn.
+
+Per-message token counts are memoized, so measuring a long history costs one
+tokenization per new message.
+"""
+
+import json
+import logging
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, List, Optional, Tuple
+
+from strands.agent.conversation_manager import SummarizingConversationManager
+from strands.hooks import BeforeModelCallEvent, HookRegistry
+from strands.types.exceptions import ContextWindowOverflowException
+from strands.types.tools import ToolSpec
+
+if TYPE_CHECKING:
+    from strands.agent.agent import Agent
+
+logger = logging.getLogger(__name__)
+
+MAX_CACHED_COUNTS = 4096
+
+
+class MLXConversationManager(SummarizingConversationManager):
+    """Keeps the conversation within a token budget, trimming in large blocks.
+
+    Once the history (system prompt and tool schemas included) grows past
+    ``trigger_ratio`` of the budget, the oldest messages are removed, or
+    summarized with ``summarize=True``, until it is back under
+    ``target_ratio`` of the budget. Tool use/result pairs are never split, and
+    the remaining history always starts with a user message.
+
+    ``apply_management`` runs after every agent invocation. Also passing the
+    manager as a hook checks the budget before every model call, so a large
+    new message or tool result is trimmed before ``MLXModel.stream`` would
+    exceed the context window. If the model still overflows, it raises
+    ``ContextWindowOverflowException`` before prefilling and the agent calls
+    ``reduce_context``.
+
+    Example:
+        >>> manager = MLXConversationManager(max_context_tokens=16384)
+        >>> agent = Agent(model=model, conversation_manager=manager, hooks=[manager])
+    """
+
+    def __init__(
+        self,
+        max_context_tokens: Optional[int] = None,
+        trigger_ratio: float = 0.9,
+        target_ratio: float = 0.5,
+        preserve_recent_messages: int = 2,
+        summarize: bool = False,
+        summarization_agent: Optional["Agent"] = None,
+        summarization_system_prompt: Optional[str] = None,
+    ) -> None:
+        """Initialize token-budget conversation manager.
+
+        Args:
+            max_context_tokens: Token budget for the prompt. Defaults to the model's
+                context window minus its ``max_tokens`` generation budget.
+            trigger_ratio: Fraction of the budget at which history is reduced.
+            target_ratio: Fraction of the budget history is reduced to.
+            preserve_recent_messages: Minimum number of recent messages always kept.
+            summarize: Replace removed messages with a summary instead of dropping them.
+            summarization_agent: Optional agent used for summaries (see
+                ``SummarizingConversationManager``).
+            summarization_system_prompt: Optional system prompt used for summaries.
+        """
+        super().__init__(
+            preserve_recent_messages=preserve_recent_messages,
+            summarization_agent=summarization_agent,
+            summarization_system_prompt=summarization_system_prompt,
+        )
+        if not 0 < target_ratio <= trigger_ratio <= 1:
+            raise ValueError(
+                f"target_ratio=<{target_ratio}>, trigger_ratio=<{trigger_ratio}>"
+                " | ratios must satisfy 0 < target_ratio <= trigger_ratio <= 1"
+            )
+
+        self.max_context_tokens = max_context_tokens
+        self.trigger_ratio = trigger_ratio
+        self.target_ratio = target_ratio
+        self.summarize = summarize
+        self._counts: "OrderedDict[Tuple[int, str], int]" = OrderedDict()
+
+    def register_hooks(self, registry: HookRegistry, **kwargs: Any) -> None:
+        """Check the token budget before every model call."""
+        registry.add_callback(BeforeModelCallEvent, self._on_before_model_call)
+
+    def _on_before_model_call(self, event: BeforeModelCallEvent) -> None:
+        """Reduce the history if the next model call is over budget."""
+        self.apply_management(event.agent)
+
+    def apply_management(self, agent: "Agent", **kwargs: Any) -> None:
+        """Reduce the history once it grows past ``trigger_ratio`` of the budget.
+
+        Args:
+            agent: The agent whose messages will be managed.
+                This list is modified in-place.
+            **kwargs: Additional keyword arguments for future extensibility.
+        """
+        budget = self._budget(agent)
+        total = sum(self._token_counts(agent))
+        if total <= budget * self.trigger_ratio:
+            logger.debug("tokens=<%d>, budget=<%d> | skipping context reduction", total, budget)
+            return
+        self.reduce_context(agent)
+
+    def reduce_context(self, agent: "Agent", e: Optional[Exception] = None, **kwargs: Any) -> None:
+        """Remove or summarize the oldest messages down to ``target_ratio`` of the budget.
+
+        Args:
+            agent: The agent whose messages will be reduced.
+                This list is modified in-place.
+            e: The exception that triggered the context reduction, if any.
+            **kwargs: Additional keyword arguments for future extensibility.
+
+        Raises:
+            ContextWindowOverflowException: If no messages can be removed.
+        """
+        messages = agent.messages
+        counts = self._token_counts(agent)
+        target = self._budget(agent) * self.target_ratio
+
+        # counts[0] is the system prompt and tool schemas, which are always sent
+        remaining = sum(counts)
+        split_point = 0
+        while split_point < len(messages) and remaining > target:
+            remaining -= counts[split_point + 1]
+            split_point += 1
+        if e is not None:
+            # The model overflowed although the estimate fit, so remove at least one message
+            split_point = max(split_point, 1)
+        split_point = min(split_point, len(messages) - self.preserve_recent_messages)
+        if split_point <= 0:
+            raise ContextWindowOverflowException("Unable to trim conversation context!") from e
+
+        # Keep tool use/result pairs together and start the history with a user turn
+        split_point = self._adjust_split_point_for_tool_pairs(messages, split_point)
+        while split_point < len(messages) and messages[split_point]["role"] != "user":
+            split_point = self._adjust_split_point_for_tool_pairs(messages, split_point + 1)
+        if split_point > len(messages) - max(self.preserve_recent_messages, 1):
+            raise ContextWindowOverflowException("Unable to trim conversation context!") from e
+
+        logger.debug(
+            "messages=<%d>, tokens=<%d>, remaining_tokens=<%d> | reducing context",
+            split_point,
+            sum(counts),
+            remaining,
+        )
+        # A previous summary was added by the manager, not by the user or the model
+        self.removed_message_count += split_point - (1 if self._summary_message else 0)
+        if not self.summarize:
+            self._summary_message = None
+            messages[:] = messages[split_point:]
+            return
+
+        try:
+            self._summary_message = self._generate_summary(messages[:split_point], agent)
+        except Exception as summarization_error:
+            logger.error("Summarization failed: %s", summarization_error)
+            raise summarization_error from e
+        messages[:] = [self._summary_message] + messages[split_point:]
+
+    def _budget(self, agent: "Agent") -> int:
+        """Token budget for the agent's prompt."""
+        if self.max_context_tokens:
+            return self.max_context_tokens
+
+        context_window = getattr(agent.model, "context_window", None)
+        if not context_window:
+            raise ValueError(
+                "max_context_tokens is required when the model does not report a context window"
+            )
+        max_tokens = (agent.model.get_config().get("params") or {}).get("max_tokens", 3000)
+        # Small windows still leave half of the context for the prompt
+        return max(context_window - max_tokens, context_window // 2)
+
+    def _token_counts(self, agent: "Agent") -> List[int]:
+        """Tokens of the system prompt and tool schemas, followed by those of each message."""
+        model = agent.model
+        if not hasattr(model, "count_tokens"):
+            raise TypeError(
+                f"model=<{type(model).__name__}> | MLXConversationManager requires an MLX model"
+            )
+
+        tool_specs: List[ToolSpec] = agent.tool_registry.get_all_tool_specs()
+        counts = [
+            self._count(
+                model,
+                {"system_prompt": agent.system_prompt, "tools": tool_specs},
+                lambda: model.count_tokens([], tool_specs, agent.system_prompt),
+            )
+        ]
+        for message in agent.messages:
+            counts.append(
+                self._count(model, message, lambda message=message: model.count_tokens([message]))
+            )
+        return counts
+
+    def _count(self, model: Any, key_data: Any, count: Callable[[], int]) -> int:
+        """Memoized token count, keyed by the model and the content it renders."""
+        key = (id(model.tokenizer), json.dumps(key_data, sort_keys=True, default=repr))
+        if key in self._counts:
+            self._counts.move_to_end(key)
+            return self._counts[key]
+
+        try:
+            tokens = count()
+        except Exception as e:
+            # Some chat templates reject partial conversations; count the raw content instead
+            logger.debug("failed to render message for counting: %s", e)
+            tokens = len(model.tokenizer.encode(json.dumps(key_data, default=repr)))
+
+        self._counts[key] = tokens
+        while len(self._counts) > MAX_CACHED_COUNTS:
+            self._counts.popitem(last=False)
+        return tokens
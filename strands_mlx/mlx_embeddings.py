@@ -0,0 +1,107 @@
+"""Text embeddings from a loaded MLX language model.
+
+Retrieval tools often load a separate embedding model next to the chat
+model. ``embed_tokens`` instead pools the final hidden states of the language
+model that is already resident, so both share one copy of the weights.
+
+Texts are sorted by length and run in batches, so each batch pads to the
+length of similar texts. Padding is appended after every real token, and
+causal attention keeps it from changing their hidden states; pooling only
+reads the real positions.
+"""
+
+import logging
+from typing import Any, Callable, List, Optional
+
+import mlx.core as mx
+from mlx_lm.generate import generation_stream
+
+logger = logging.getLogger(__name__)
+
+POOLING_MODES = ("mean", "last")
+
+
+def hidden_state_model(model: Any) -> Any:
+    """Transformer body of a language model, returning hidden states instead of logits.
+
+    Args:
+        model: Loaded MLX language model.
+
+    Returns:
+        The module mapping token ids to final (normed) hidden states.
+
+    Raises:
+        ValueError: If the model has no recognizable transformer body.
+    """
+    body = model
+    while True:
+        inner = getattr(body, "language_model", None)
+        if inner is None:
+            inner = getattr(body, "model", None)
+        if inner is None or not callable(inner):
+            break
+        body = inner
+    if body is model:
+        raise ValueError(f"model=<{type(model).__name__}> | cannot find the hidden state model")
+    return body
+
+
+def embed_tokens(
+    model: Any,
+    token_lists: List[List[int]],
+    pooling: str = "mean",
+    batch_size: int = 16,
+    check_cancelled: Optional[Callable[[], None]] = None,
+) -> List[mx.array]:
+    """Pool the final hidden states of token sequences.
+
+    Args:
+        model: Loaded MLX language model.
+        token_lists: Token ids of each text.
+        pooling: ``mean`` over all tokens, or the ``last`` token's hidden state.
+        batch_size: Sequences per forward pass.
+        check_cancelled: Raises once the request is cancelled; checked after every batch.
+
+    Returns:
+        One float32 vector per sequence; empty sequences get a zero vector.
+
+    Raises:
+        ValueError: If the pooling mode is unknown.
+    """
+    if pooling not in POOLING_MODES:
+        raise ValueError(f"pooling=<{pooling}> | pooling must be one of {POOLING_MODES}")
+    body = hidden_state_model(model)
+    check_cancelled = check_cancelled or (lambda: None)
+
+    order = sorted(
+        (index for index, tokens in enumerate(token_lists) if tokens),
+        key=lambda index: len(token_lists[index]),
+    )
+    vectors: List[Optional[mx.array]] = [None] * len(token_lists)
+    with mx.stream(generation_stream):
+        for start in range(0, len(order), batch_size):
+            batch = order[start : start + batch_size]
+            lengths = [len(token_lists[index]) for index in batch]
+            width = max(lengths)
+            inputs = mx.array(
+                [token_lists[index] + [0] * (width - len(token_lists[index])) for index in batch]
+            )
+            hidden = body(inputs).astype(mx.float32)
+            length_array = mx.array(lengths)
+            if pooling == "mean":
+                real = (mx.arange(width)[None, :] < length_array[:, None])[..., None]
+                pooled = (hidden * real).sum(axis=1) / length_array[:, None]
+            else:
+                pooled = hidden[mx.arange(len(batch)), length_array - 1]
+            mx.eval(pooled)
+            for row, index in enumerate(batch):
+                vectors[index] = pooled[row]
+            del hidden
+            mx.clear_cache()
+            check_cancelled()
+
+    logger.debug("texts=<%d>, batches=<%d> | embedded", len(order), -(-len(order) // batch_size))
+    dims = getattr(getattr(model, "args", None), "hidden_size", None)
+    if dims is None:
+        dims = next((vector.shape[0] for vector in vectors if vector is not None), 0)
+    return [vector if vector is not None else mx.zeros((dims,)) for vector in vectors]
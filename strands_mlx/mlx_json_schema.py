@@ -0,0 +1,619 @@
+"""JSON-schema constrained decoding for MLX models.
+
+Compiles a JSON schema (e.g. ``output_model.model_json_schema()``) into a
+character-level automaton and masks, at every decode step, the tokens whose
+text would take the output outside the schema. The model can only produce
+JSON matching the schema, with no surrounding prose or markdown fences, and
+may only emit EOS once the root value is complete.
+
+Supported keywords: type (including type lists), properties, required,
+additionalProperties (for property-less objects), items, prefixItems,
+minItems, maxItems, enum, const, anyOf, oneOf, single-entry allOf, $ref and
+$defs. String formats, patterns and numeric bounds are not enforced.
+Properties are generated in schema order and whitespace is compact (at most
+one space after ``:`` and ``,``).
+
+Token texts are indexed once per tokenizer and the allowed-token mask of
+every automaton state is cached per (tokenizer, schema), so repeated
+structured output calls for the same model reuse the work.
+
+- Outlines: https://arxiv.org/abs/2307.09702
+"""
+
+import json
+import logging
+import threading
+import weakref
+from bisect import bisect_left
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import mlx.core as mx
+import numpy as np
+from mlx_lm.tokenizer_utils import BPEStreamingDetokenizer, SPMStreamingDetokenizer
+
+from strands_mlx.mlx_prompt_cache import common_prefix_length
+
+logger = logging.getLogger(__name__)
+
+# Automaton state: alternative parser stacks, each a tuple of frames (innermost last).
+# The empty stack means the root value is complete.
+Stack = Tuple[Tuple[Any, ...], ...]
+State = FrozenSet[Stack]
+
+_STRING_BODY = ("s", 0)
+_HEX_DIGITS = frozenset("0123456789abcdefABCDEF")
+_DIGITS = frozenset("0123456789")
+_NUMBER_END_PHASES = frozenset(("0", "int", "frac", "exp"))
+_MAX_CHAR = chr(0x10FFFF)
+
+
+def _json_literal(value: Any) -> str:
+    """Compact JSON text of an enum or const value."""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+class _SchemaCompiler:
+    """Turns a JSON schema into a table of nodes referenced by index.
+
+    Node forms:
+        ("object", ((key_json, node, required), ...), additional_node or None)
+        ("array", prefix_nodes, items_node or None, min_items, max_items or None)
+        ("string",), ("integer",), ("number",)
+        ("literal", (json_text, ...))
+        ("union", (node, ...))
+    """
+
+    def __init__(self, schema: Dict[str, Any]) -> None:
+        self.root_schema = schema
+        self.nodes: List[Tuple[Any, ...]] = []
+        self._refs: Dict[str, int] = {}
+        self._any: Optional[int] = None
+        self.root = self.compile(schema)
+
+    def _add(self, node: Tuple[Any, ...]) -> int:
+        self.nodes.append(node)
+        return len(self.nodes) - 1
+
+    def _resolve(self, ref: str) -> Dict[str, Any]:
+        if not ref.startswith("#"):
+            raise ValueError(f"ref=<{ref}> | only local schema references are supported")
+        target: Any = self.root_schema
+        for part in ref.lstrip("#").strip("/").split("/"):
+            if part:
+                target = target[part.replace("~1", "/").replace("~0", "~")]
+        return target
+
+    def _any_value(self) -> int:
+        """Node accepting any JSON value."""
+        if self._any is None:
+            self._any = self._add(("union", ()))
+            obj = self._add(("object", (), self._any))
+            arr = self._add(("array", (), self._any, 0, None))
+            alternatives = (
+                self._add(("string",)),
+                self._add(("number",)),
+                self._add(("literal", ("true", "false", "null"))),
+                obj,
+                arr,
+            )
+            self.nodes[self._any] = ("union", alternatives)
+        return self._any
+
+    def compile(self, schema: Any) -> int:
+        """Compile a (sub)schema and return its node index."""
+        if schema is True or schema == {}:
+            return self._any_value()
+        if not isinstance(schema, dict):
+            raise ValueError(f"schema=<{schema}> | unsupported schema")
+
+        if "$ref" in schema:
+            ref = schema["$ref"]
+            if ref not in self._refs:
+                # Placeholder first so recursive models terminate
+                self._refs[ref] = self._add(("union", ()))
+                self.nodes[self._refs[ref]] = ("union", (self.compile(self._resolve(ref)),))
+            return self._refs[ref]
+
+        if "const" in schema:
+            return self._add(("literal", (_json_literal(schema["const"]),)))
+        if "enum" in schema:
+            return self._add(("literal", tuple(_json_literal(v) for v in schema["enum"])))
+
+        for keyword in ("anyOf", "oneOf"):
+            if keyword in schema:
+                return self._add(("union", tuple(self.compile(s) for s in schema[keyword])))
+        if "allOf" in schema:
+            if len(schema["allOf"]) != 1:
+                logger.debug("allOf with several schemas is not enforced")
+                return self._any_value()
+            return self.compile(schema["allOf"][0])
+
+        schema_type = schema.get("type")
+        if isinstance(schema_type, list):
+            return self._add(
+                ("union", tuple(self.compile({**schema, "type": t}) for t in schema_type))
+            )
+        if schema_type is None:
+            if "properties" in schema:
+                schema_type = "object"
+            elif "items" in schema or "prefixItems" in schema:
+                schema_type = "array"
+            else:
+                return self._any_value()
+
+        if schema_type == "object":
+            return self._compile_object(schema)
+        if schema_type == "array":
+            return self._compile_array(schema)
+        if schema_type in ("string", "integer", "number"):
+            return self._add((schema_type,))
+        if schema_type == "boolean":
+            return self._add(("literal", ("true", "false")))
+        if schema_type == "null":
+            return self._add(("literal", ("null",)))
+        raise ValueError(f"type=<{schema_type}> | unsupported schema type")
+
+    def _compile_object(self, schema: Dict[str, Any]) -> int:
+        index = self._add(("object", (), None))
+        required = set(schema.get("required", []))
+        properties = tuple(
+            (_json_literal(key), self.compile(value), key in required)
+            for key, value in schema.get("properties", {}).items()
+        )
+        additional = None
+        if not properties:
+            extra = schema.get("additionalProperties", True)
+            if extra is not False:
+                additional = self.compile(extra)
+        self.nodes[index] = ("object", properties, additional)
+        return index
+
+    def _compile_array(self, schema: Dict[str, Any]) -> int:
+        index = self._add(("array", (), None, 0, None))
+        prefix = tuple(self.compile(s) for s in schema.get("prefixItems", []))
+        items = schema.get("items", True if not prefix else False)
+        items_node = None if items is False else self.compile(items)
+        self.nodes[index] = (
+            "array",
+            prefix,
+            items_node,
+            schema.get("minItems", 0),
+            schema.get("maxItems"),
+        )
+        return index
+
+
+class JSONSchemaAutomaton:
+    """Character-level recognizer for compact JSON matching a schema.
+
+    States are sets of parser stacks, so unions and optional properties are
+    explored in parallel without backtracking.
+    """
+
+    def __init__(self, schema: Dict[str, Any]) -> None:
+        """Initialize automaton.
+
+        Args:
+            schema: JSON schema of the root value.
+        """
+        compiled = _SchemaCompiler(schema)
+        self.nodes = compiled.nodes
+        self.initial: State = frozenset([(("v", compiled.root, False),)])
+        self.step = lru_cache(maxsize=1 << 16)(self._step)
+
+    @staticmethod
+    def is_complete(state: State) -> bool:
+        """Whether the root value can end in this state."""
+        return any(
+            not stack
+            or (len(stack) == 1 and stack[0][0] == "n" and stack[0][2] in _NUMBER_END_PHASES)
+            for stack in state
+        )
+
+    def advance(self, state: State, text: str) -> State:
+        """State after consuming ``text``; empty when the text is not allowed."""
+        for char in text:
+            state = self.step(state, char)
+            if not state:
+                break
+        return state
+
+    def _step(self, state: State, char: str) -> State:
+        stacks: set = set()
+        for stack in state:
+            stacks.update(self._advance(stack, char))
+        return frozenset(stacks)
+
+    def _complete(self, stack: Stack) -> Stack:
+        """Pop a finished value and tell its parent frame."""
+        if not stack:
+            return ()
+        parent = stack[-1]
+        if parent[0] == "o":
+            _, node, index, phase, value = parent
+            next_phase = "colon" if phase == "key" else "after"
+            return stack[:-1] + (("o", node, index, next_phase, value),)
+        if parent[0] == "a":
+            _, node, count, _ = parent
+            return stack[:-1] + (("a", node, count + 1, "after"),)
+        return stack
+
+    def _advance(self, stack: Stack, char: str) -> List[Stack]:
+        if not stack:
+            return []
+        top, rest = stack[-1], stack[:-1]
+        kind = top[0]
+
+        if kind == "v":
+            if char == " " and top[2]:
+                return [rest + (("v", top[1], False),)]
+            return self._start_value(rest, top[1], char)
+
+        if kind == "l":
+            _, text, pos = top
+            if text[pos] != char:
+                return []
+            if pos + 1 == len(text):
+                return [self._complete(rest)]
+            return [rest + (("l", text, pos + 1),)]
+
+        if kind == "s":
+            phase = top[1]
+            if phase == 0:
+                if char == '"':
+                    return [self._complete(rest)]
+                if char == "\\":
+                    return [rest + (("s", -1),)]
+                return [stack] if char >= " " else []
+            if phase == -1:
+                if char in '"\\/bfnrt':
+                    return [rest + (_STRING_BODY,)]
+                return [rest + (("s", 4),)] if char == "u" else []
+            return [rest + (("s", phase - 1),)] if char in _HEX_DIGITS else []
+
+        if kind == "n":
+            _, integer, phase = top
+            results = []
+            next_phase = self._number_step(integer, phase, char)
+            if next_phase:
+                results.append(rest + (("n", integer, next_phase),))
+            if phase in _NUMBER_END_PHASES:
+                results.extend(self._advance(self._complete(rest), char))
+            return results
+
+        if kind == "o":
+            return self._object_step(rest, top, char)
+        return self._array_step(rest, top, char)
+
+    def _start_value(self, rest: Stack, node_index: int, char: str) -> List[Stack]:
+        node = self.nodes[node_index]
+        kind = node[0]
+        if kind == "union":
+            return [s for alt in node[1] for s in self._start_value(rest, alt, char)]
+        if kind == "object":
+            return [rest + (("o", node_index, 0, "start", -1),)] if char == "{" else []
+        if kind == "array":
+            return [rest + (("a", node_index, 0, "start"),)] if char == "[" else []
+        if kind == "string":
+            return [rest + (_STRING_BODY,)] if char == '"' else []
+        if kind == "literal":
+            return [
+                rest + (("l", text, 1),) if len(text) > 1 else self._complete(rest)
+                for text in node[1]
+                if text[0] == char
+            ]
+        # integer / number
+        phase = "-" if char == "-" else "0" if char == "0" else "int" if char in _DIGITS else None
+        return [rest + (("n", kind == "integer", phase),)] if phase else []
+
+    @staticmethod
+    def _number_step(integer: bool, phase: str, char: str) -> Optional[str]:
+        digit = char in _DIGITS
+        if phase == "-":
+            return "0" if char == "0" else "int" if digit else None
+        if phase in ("0", "int"):
+            if digit and phase == "int":
+                return "int"
+            if integer:
+                return None
+            return "." if char == "." else "e" if char in "eE" else None
+        if phase == ".":
+            return "frac" if digit else None
+        if phase == "frac":
+            return "frac" if digit else "e" if char in "eE" else None
+        if phase == "e":
+            return "e-" if char in "+-" else "exp" if digit else None
+        if phase in ("e-", "exp"):
+            return "exp" if digit else None
+        return None
+
+    def _object_step(self, rest: Stack, frame: Tuple[Any, ...], char: str) -> List[Stack]:
+        _, node_index, index, phase, value = frame
+        _, properties, additional = self.nodes[node_index]
+
+        if phase in ("start", "after") and char == "}":
+            if not any(required for _, _, required in properties[index:]):
+                return [self._complete(rest)]
+            return []
+        if phase == "after" and char == ",":
+            if index < len(properties) or additional is not None:
+                return [rest + (("o", node_index, index, "next", -1),)]
+            return []
+        if phase == "next" and char == " ":
+            return [rest + (("o", node_index, index, "next!", -1),)]
+        if phase in ("start", "next", "next!") and char == '"':
+            results = []
+            # Properties come in schema order; optional ones may be skipped
+            for position in range(index, len(properties)):
+                key, value_node, required = properties[position]
+                frame = ("o", node_index, position + 1, "key", value_node)
+                results.append(rest + (frame, ("l", key, 1)))
+                if required:
+                    break
+            if additional is not None:
+                results.append(rest + (("o", node_index, index, "key", additional), _STRING_BODY))
+            return results
+        if phase == "colon" and char == ":":
+            return [rest + (("o", node_index, index, "value", value), ("v", value, True))]
+        return []
+
+    def _array_step(self, rest: Stack, frame: Tuple[Any, ...], char: str) -> List[Stack]:
+        _, node_index, count, phase = frame
+        _, prefix, items, min_items, max_items = self.nodes[node_index]
+
+        if phase in ("start", "after") and char == "]":
+            return [self._complete(rest)] if count >= min_items else []
+        item = prefix[count] if count < len(prefix) else items
+        if item is None or (max_items is not None and count >= max_items):
+            return []
+        if phase == "after" and char == ",":
+            return [rest + (("a", node_index, count, "next"),)]
+        if phase in ("start", "next"):
+            stack = rest + (("a", node_index, count, "value"), ("v", item, phase == "next"))
+            return self._advance(stack, char)
+        return []
+
+
+class _TokenIndex:
+    """Decoded text of every token of a tokenizer, sorted for prefix search."""
+
+    def __init__(self, tokenizer: Any) -> None:
+        self.eos_token_ids = sorted(tokenizer.eos_token_ids)
+        texts = self._token_texts(tokenizer)
+        self.text_by_id = texts
+
+        entries = sorted((text, token) for token, text in texts.items() if text)
+        self.texts = [text for text, _ in entries]
+        self.tokens = [token for _, token in entries]
+
+        # Tokens that can appear anywhere inside a JSON string
+        plain = [(text, token) for text, token in entries if not _has_string_specials(text)]
+        self.plain_tokens = np.array([token for _, token in plain], dtype=np.int64)
+        special = [(text, token) for text, token in entries if _has_string_specials(text)]
+        self.special_texts = [text for text, _ in special]
+        self.special_tokens = [token for _, token in special]
+
+    @staticmethod
+    def _token_texts(tokenizer: Any) -> Dict[int, Optional[str]]:
+        """Text of each token id, None for special tokens and partial UTF-8 sequences."""
+        vocab = tokenizer.get_vocab()
+        special_ids = set(getattr(tokenizer, "all_special_ids", []) or [])
+        special_ids.update(tokenizer.eos_token_ids)
+        try:
+            added = dict(tokenizer._tokenizer.get_added_vocab())
+        except Exception:
+            added = {}
+
+        detokenizer_class = getattr(tokenizer, "_detokenizer_class", None)
+        byte_decoder = None
+        if detokenizer_class is BPEStreamingDetokenizer:
+            BPEStreamingDetokenizer.make_byte_decoder()
+            byte_decoder = BPEStreamingDetokenizer._byte_decoder
+
+        texts: Dict[int, Optional[str]] = {}
+        for piece, token in vocab.items():
+            if token in special_ids:
+                texts[token] = None
+            elif piece in added:
+                texts[token] = piece
+            elif byte_decoder is not None:
+                try:
+                    texts[token] = bytes(byte_decoder[c] for c in piece).decode("utf-8")
+                except (KeyError, UnicodeDecodeError):
+                    texts[token] = None
+            elif detokenizer_class is SPMStreamingDetokenizer:
+                if len(piece) == 6 and piece.startswith("<0x") and piece.endswith(">"):
+                    byte = int(piece[3:5], 16)
+                    texts[token] = chr(byte) if byte < 0x80 else None
+                else:
+                    texts[token] = piece.replace("▁", " ")
+            else:
+                texts[token] = tokenizer.decode([token])
+        return texts
+
+
+def _has_string_specials(text: str) -> bool:
+    """Whether text contains characters with a special meaning inside a JSON string."""
+    return any(c == '"' or c == "\\" or c < " " for c in text)
+
+
+class JSONSchemaConstraint:
+    """A compiled schema bound to a tokenizer, with an LRU of token masks per state."""
+
+    def __init__(
+        self, schema: Dict[str, Any], tokenizer: Any, max_cached_masks: int = 4096
+    ) -> None:
+        """Initialize constraint.
+
+        Args:
+            schema: JSON schema the output must match.
+            tokenizer: mlx-lm TokenizerWrapper.
+            max_cached_masks: Token masks kept in memory.
+        """
+        self.automaton = JSONSchemaAutomaton(schema)
+        self.index = token_index(tokenizer)
+        self.max_cached_masks = max_cached_masks
+        self._masks: "OrderedDict[Tuple[State, int], mx.array]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def token_text(self, token: int) -> Optional[str]:
+        """Decoded text of a token, as seen by the automaton."""
+        return self.index.text_by_id.get(token)
+
+    def allowed_tokens(self, state: State) -> List[int]:
+        """Token ids whose text keeps the output inside the schema."""
+        automaton, index = self.automaton, self.index
+        allowed: List[int] = []
+        if automaton.is_complete(state):
+            allowed.extend(index.eos_token_ids)
+
+        if all(stack and stack[-1] == _STRING_BODY for stack in state):
+            # Inside a string only quotes, escapes and control characters need checking
+            allowed.extend(index.plain_tokens.tolist())
+            allowed.extend(self._search(state, index.special_texts, index.special_tokens))
+        else:
+            allowed.extend(self._search(state, index.texts, index.tokens))
+        return allowed
+
+    def _search(self, state: State, texts: List[str], tokens: List[int]) -> List[int]:
+        """Walk the sorted token texts as a trie, pruning prefixes the automaton rejects."""
+        allowed: List[int] = []
+        pending = [(0, len(texts), 0, state)]
+        while pending:
+            lo, hi, depth, prefix_state = pending.pop()
+            # Tokens ending exactly at this depth sort first
+            while lo < hi and len(texts[lo]) == depth:
+                allowed.append(tokens[lo])
+                lo += 1
+            while lo < hi:
+                prefix = texts[lo][: depth + 1]
+                end = bisect_left(texts, prefix + _MAX_CHAR, lo, hi)
+                next_state = self.automaton.step(prefix_state, prefix[-1])
+                if next_state:
+                    pending.append((lo, end, depth + 1, next_state))
+                lo = end
+        return allowed
+
+    def mask(self, state: State, vocab_size: int) -> mx.array:
+        """Boolean mask over the model's vocabulary of the tokens allowed in a state."""
+        key = (state, vocab_size)
+        with self._lock:
+            mask = self._masks.get(key)
+            if mask is not None:
+                self._masks.move_to_end(key)
+                return mask
+
+        tokens = np.array(self.allowed_tokens(state), dtype=np.int64)
+        if tokens.size == 0:
+            # A dead end (e.g. an empty enum) ends the generation instead of sampling garbage
+            logger.warning("no token can continue the JSON schema, stopping")
+            tokens = np.array(self.index.eos_token_ids, dtype=np.int64)
+        allowed = np.zeros(vocab_size, dtype=np.bool_)
+        allowed[tokens[tokens < vocab_size]] = True
+        mask = mx.array(allowed)
+
+        with self._lock:
+            self._masks[key] = mask
+            while len(self._masks) > self.max_cached_masks:
+                self._masks.popitem(last=False)
+        return mask
+
+
+class JSONSchemaLogitsProcessor:
+    """mlx-lm logits processor restricting one generation to a JSON schema.
+
+    Create one per generation. The automaton state after every generated
+    token is kept, so speculative decoding can roll back rejected draft
+    tokens by passing a shorter token history.
+    """
+
+    def __init__(self, constraint: JSONSchemaConstraint) -> None:
+        """Initialize logits processor.
+
+        Args:
+            constraint: Compiled schema for the generating model's tokenizer.
+        """
+        self.constraint = constraint
+        self._offset: Optional[int] = None
+        self._tokens: List[int] = []
+        self._states: List[State] = [constraint.automaton.initial]
+
+    @property
+    def state(self) -> State:
+        """Automaton state after the generated tokens."""
+        return self._states[-1]
+
+    @property
+    def is_complete(self) -> bool:
+        """Whether the generated text is a complete value of the schema."""
+        return self.constraint.automaton.is_complete(self.state)
+
+    def __call__(self, tokens: mx.array, logits: mx.array) -> mx.array:
+        # The first call sees only prompt tokens; later calls append generated ones
+        if self._offset is None:
+            self._offset = tokens.shape[-1]
+        generated = tokens[self._offset :].tolist()
+
+        keep = common_prefix_length(self._tokens, generated)
+        del self._tokens[keep:]
+        del self._states[keep + 1 :]
+        for token in generated[keep:]:
+            state = self.state
+            text = self.constraint.token_text(token)
+            if text is not None:
+                state = self.constraint.automaton.advance(state, text)
+            self._tokens.append(token)
+            self._states.append(state)
+
+        state = self.state
+        if not state:
+            # Cannot happen with masked sampling; end the generation rather than loop
+            logger.warning("generated tokens left the JSON schema, stopping")
+            state = frozenset([()])
+        mask = self.constraint.mask(state, logits.shape[-1])
+        return mx.where(mask, logits, -mx.inf)
+
+
+_token_indexes: "weakref.WeakKeyDictionary[Any, _TokenIndex]" = weakref.WeakKeyDictionary()
+_constraints: "OrderedDict[Tuple[int, str], JSONSchemaConstraint]" = OrderedDict()
+_cache_lock = threading.Lock()
+MAX_CACHED_SCHEMAS = 32
+
+
+def token_index(tokenizer: Any) -> _TokenIndex:
+    """Token text index of a tokenizer, built once per tokenizer."""
+    with _cache_lock:
+        index = _token_indexes.get(tokenizer)
+    if index is None:
+        index = _TokenIndex(tokenizer)
+        with _cache_lock:
+            _token_indexes[tokenizer] = index
+    return index
+
+
+def json_schema_constraint(schema: Dict[str, Any], tokenizer: Any) -> JSONSchemaConstraint:
+    """Compiled constraint for a schema and tokenizer, reused across calls.
+
+    Args:
+        schema: JSON schema the output must match.
+        tokenizer: mlx-lm TokenizerWrapper.
+
+    Returns:
+        Shared constraint whose token masks persist between generations.
+    """
+    key = (id(token_index(tokenizer)), json.dumps(schema, sort_keys=True))
+    with _cache_lock:
+        constraint = _constraints.get(key)
+        if constraint is not None:
+            _constraints.move_to_end(key)
+            return constraint
+
+    constraint = JSONSchemaConstraint(schema, tokenizer)
+    with _cache_lock:
+        _constraints[key] = constraint
+        while len(_constraints) > MAX_CACHED_SCHEMAS:
+            _constraints.popitem(last=False)
+    logger.debug("nodes=<%d> | compiled JSON schema constraint", len(constraint.automaton.nodes))
+    return constraint
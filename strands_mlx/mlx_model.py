@@ -8,13 +8,22 @@ with unified memory and Metal acceleration.
 - Models: https://huggingface.co/mlx-community
 """
 
+import asyncio
+import functools
+import hashlib
 import json
 import logging
+import os
+import time
+import weakref
+from collections import OrderedDict
 from pathlib import Path
 from typing import (
     Any,
     AsyncGenerator,
+    Callable,
     Dict,
+    Iterator,
     Optional,
     Type,
     TypeVar,
@@ -22,7 +31,10 @@ from typing import (
     cast,
 )
 
-from mlx_lm import load, stream_generate
+import mlx.core as mx
+from mlx_lm import stream_generate
+from mlx_lm.generate import GenerationResponse, maybe_quantize_kv_cache
+from mlx_lm.models.cache import can_trim_prompt_cache
 from mlx_lm.sample_utils import make_sampler
 from pydantic import BaseModel
 from strands.models._validation import (
@@ -31,10 +43,39 @@ from strands.models._validation import (
 )
 from strands.models.model import Model
 from strands.types.content import ContentBlock, Messages
+from strands.types.exceptions import ContextWindowOverflowException
 from strands.types.streaming import StreamEvent
 from strands.types.tools import ToolChoice, ToolResult, ToolSpec, ToolUse
 from typing_extensions import TypedDict, Unpack, override
 
+from strands_mlx.mlx_adapters import adapter_namespace
+from strands_mlx.mlx_batch_engine import MLXBatchEngine, supports_batching
+from strands_mlx.mlx_cancellation import CancellationToken
+from strands_mlx.mlx_chat_template import ChatTemplateRenderer, PromptEncoder
+from strands_mlx.mlx_embeddings import POOLING_MODES, embed_tokens
+from strands_mlx.mlx_json_schema import JSONSchemaLogitsProcessor, json_schema_constraint
+from strands_mlx.mlx_model_registry import ModelHandle, model_registry
+from strands_mlx.mlx_prompt_cache import (
+    MLXPromptCache,
+    PrefillProgress,
+    cache_offset,
+    common_prefix_length,
+    copy_cache,
+    prefill_steps,
+    tokenizer_fingerprint,
+)
+from strands_mlx.mlx_prompt_lookup import stream_prompt_lookup
+from strands_mlx.mlx_reasoning import ThinkingBudgetProcessor, reasoning_open, think_token_ids
+from strands_mlx.mlx_response_cache import MLXResponseCache, response_cache_key
+from strands_mlx.mlx_sampling import (
+    CandidateScore,
+    Completion,
+    sample_n,
+    score_continuations,
+)
+from strands_mlx.mlx_stop import StopSequenceMatcher
+from strands_mlx.mlx_worker import DEFAULT_MAX_BUFFERED, iterate_in_worker, submit_to_worker
+
 try:
     from huggingface_hub import snapshot_download
 
@@ -45,6 +86,13 @@ except ImportError:
 logger = logging.getLogger(__name__)
 
 T = TypeVar("T", bound=BaseModel)
+R = TypeVar("R")
+
+
+def _release_handles(handles: list[ModelHandle]) -> None:
+    """Release registry handles held by a model instance."""
+    for handle in handles:
+        handle.release()
 
 
 class MLXModel(Model):
@@ -63,6 +111,29 @@ class MLXModel(Model):
         tokenizer_config: Optional[Dict[str, Any]]
         params: Optional[Dict[str, Any]]
         lazy: bool
+        prompt_cache_size: int
+        prompt_cache_dir: Optional[str]
+        stream_buffer_size: int
+        max_batch_size: int
+        adapter_cache_size: int
+        draft_model_id: Optional[str]
+        num_draft_tokens: int
+        prompt_lookup_num_tokens: int
+        prompt_lookup_max_ngram: int
+        stop_after_tool_calls: bool
+        parallel_tool_calls: bool
+        kv_bits: Optional[int]
+        kv_group_size: int
+        quantized_kv_start: int
+        max_kv_size: Optional[int]
+        kv_sink_tokens: int
+        context_window: Optional[int]
+        prefill_step_size: int
+        prefill_progress: bool
+        request_timeout: Optional[float]
+        response_cache_size: int
+        response_cache_path: Optional[str]
+        embedding_cache_size: int
 
     def __init__(
         self,
@@ -84,6 +155,7 @@ class MLXModel(Model):
             "adapter_path": adapter_path,
             "lazy": False,
             "tokenizer_config": {"trust_remote_code": True},
+            "prompt_cache_size": 1,
             **model_config,
         }
 
@@ -125,32 +197,258 @@ class MLXModel(Model):
             )
 
     def _load_model(self) -> None:
-        """Load model using mlx_lm.load()."""
+        """Get the model (and draft model) from the process-wide model registry."""
         model_id = self.config["model_id"]
         logger.debug("model_id=<%s> | loading", model_id)
 
         # Resolve adapter path (download if needed)
         adapter_path = self._resolve_adapter_path(self.config.get("adapter_path"))
 
-        self.model, self.tokenizer = load(
+        # Release the weights of a previous configuration
+        if getattr(self, "_release_models", None) is not None:
+            self._release_models()
+
+        handles = []
+        self._release_models = weakref.finalize(self, _release_handles, handles)
+
+        # Adapters are attached to the shared base model on demand
+        handle = model_registry.acquire(
             model_id,
             tokenizer_config=self.config.get("tokenizer_config", {}),
-            adapter_path=adapter_path,
             lazy=self.config.get("lazy", False),
         )
+        handles.append(handle)
+        self.model, self.tokenizer = handle.model, handle.tokenizer
+        self._template_supports_tools: Optional[bool] = None
+        self._chat_template = ChatTemplateRenderer(self._apply_chat_template)
+        self._prompt_encoder = PromptEncoder(self.tokenizer)
+        self._think_ids = think_token_ids(self.tokenizer)
+        # Pooled embeddings by adapter, pooling mode and text hash (worker thread only)
+        self._embedding_cache: OrderedDict[str, mx.array] = OrderedDict()
+        self._adapters = handle.adapters
+        if "adapter_cache_size" in self.config:
+            self._adapters.max_adapters = self.config["adapter_cache_size"]
+        self._adapter_path = adapter_path
+
+        self.draft_model = None
+        draft_model_id = self.config.get("draft_model_id")
+        if draft_model_id:
+            logger.debug("draft_model_id=<%s> | loading", draft_model_id)
+            draft_handle = model_registry.acquire(
+                draft_model_id,
+                tokenizer_config=self.config.get("tokenizer_config", {}),
+                lazy=self.config.get("lazy", False),
+            )
+            handles.append(draft_handle)
+            self.draft_model, draft_tokenizer = draft_handle.model, draft_handle.tokenizer
+            if draft_tokenizer.vocab_size != self.tokenizer.vocab_size:
+                logger.warning(
+                    "draft_model_id=<%s> | draft tokenizer does not match model tokenizer",
+                    draft_model_id,
+                )
+
+        # Prompt KV caches are only valid for the weights they were built with
+        self._prompt_cache = MLXPromptCache(
+            self.model,
+            max_entries=self.config.get("prompt_cache_size", 1),
+            draft_model=self.draft_model,
+            prefill_step_size=self.config.get("prefill_step_size", 2048),
+        )
+        self._configure_kv_cache()
+        self._configure_prompt_cache_dir()
+        self._configure_batch_engine()
+        self._configure_response_cache()
 
         logger.debug("model loaded")
 
+    def _configure_batch_engine(self) -> None:
+        """Create the continuous-batching engine when max_batch_size > 1."""
+        self._batch_engine: Optional[MLXBatchEngine] = None
+        max_batch_size = self.config.get("max_batch_size", 1)
+        if max_batch_size <= 1:
+            return
+
+        if self.draft_model is not None:
+            logger.warning("speculative decoding does not support batching, decoding sequentially")
+            return
+
+        if self.config.get("prompt_lookup_num_tokens"):
+            logger.warning(
+                "prompt lookup decoding does not support batching, decoding sequentially"
+            )
+            return
+
+        if self.config.get("kv_bits"):
+            logger.warning("quantized KV caches do not support batching, decoding sequentially")
+            return
+
+        if self._prompt_cache.max_kv_size is not None:
+            logger.warning("rotating KV caches do not support batching, decoding sequentially")
+            return
+
+        if not supports_batching(self.model):
+            logger.warning(
+                "model_id=<%s> | model cache does not support batching, decoding sequentially",
+                self.config["model_id"],
+            )
+            return
+
+        self._batch_engine = MLXBatchEngine(
+            self.model,
+            self.tokenizer,
+            max_batch_size=max_batch_size,
+            prefill_step_size=self.config.get("prefill_step_size", 2048),
+            adapters=self._adapters,
+        )
+
+    def _configure_kv_cache(self) -> None:
+        """Bound new prompt caches to max_kv_size tokens, keeping kv_sink_tokens sinks."""
+        max_kv_size = self.config.get("max_kv_size")
+        sink_tokens = self.config.get("kv_sink_tokens", 4)
+        if max_kv_size is not None:
+            if sink_tokens >= max_kv_size:
+                raise ValueError(
+                    f"kv_sink_tokens=<{sink_tokens}>, max_kv_size=<{max_kv_size}>"
+                    " | sink tokens must fit in the cache"
+                )
+            if self.draft_model is not None:
+                logger.warning("speculative decoding needs trimmable caches, ignoring max_kv_size")
+                max_kv_size = None
+            elif self.config.get("kv_bits"):
+                logger.warning("rotating KV caches cannot be quantized, ignoring kv_bits")
+
+        if (max_kv_size, sink_tokens) != (
+            self._prompt_cache.max_kv_size,
+            self._prompt_cache.sink_tokens,
+        ):
+            self._prompt_cache.max_kv_size = max_kv_size
+            self._prompt_cache.sink_tokens = sink_tokens
+            self._prompt_cache.clear()
+
+    def _configure_prompt_cache_dir(self) -> None:
+        """Point the prompt cache at the configured on-disk prefix cache.
+
+        Persisted prefixes are keyed by model id and tokenizer (and by adapter,
+        through the prompt cache namespace) so a cache built for other weights
+        is never loaded.
+        """
+        prompt_cache_dir = self.config.get("prompt_cache_dir")
+        self._prompt_cache.disk_dir = (
+            os.path.expanduser(prompt_cache_dir) if prompt_cache_dir else None
+        )
+        if not prompt_cache_dir:
+            return
+
+        self._prompt_cache.model_key = "|".join(
+            [
+                self.config["model_id"],
+                self.config.get("draft_model_id") or "",
+                tokenizer_fingerprint(self.tokenizer),
+                f"{self._prompt_cache.max_kv_size}:{self._prompt_cache.sink_tokens}",
+            ]
+        )
+
+    def _configure_response_cache(self) -> None:
+        """Create the response cache when response_cache_size or response_cache_path is set."""
+        if getattr(self, "_response_cache", None) is not None:
+            self._response_cache.close()
+        self._response_cache: Optional[MLXResponseCache] = None
+        max_entries = self.config.get("response_cache_size", 0)
+        path = self.config.get("response_cache_path")
+        if max_entries <= 0 and not path:
+            return
+
+        self._response_cache = MLXResponseCache(
+            max_entries=max_entries, path=os.path.expanduser(path) if path else None
+        )
+        self._response_cache_model_key = "|".join(
+            [
+                self.config["model_id"],
+                self.config.get("draft_model_id") or "",
+                tokenizer_fingerprint(self.tokenizer),
+            ]
+        )
+
+    def _encode_prompt(self, prompt: str, incremental: bool = False) -> list[int]:
+        """Tokenize a rendered prompt the same way mlx_lm.stream_generate does.
+
+        Args:
+            prompt: Prompt rendered by the chat template.
+            incremental: Only tokenize the text after the prefix shared with a previous
+                prompt, and remember this one for the next turn.
+
+        Returns:
+            Prompt token ids.
+        """
+        return self._prompt_encoder.encode(prompt, incremental=incremental)
+
+    @property
+    def context_window(self) -> Optional[int]:
+        """Maximum prompt length in tokens, from the config or the model's position embeddings."""
+        if self.config.get("context_window"):
+            return self.config["context_window"]
+        return getattr(getattr(self.model, "args", None), "max_position_embeddings", None)
+
+    def count_tokens(
+        self,
+        messages: Messages,
+        tool_specs: Optional[list[ToolSpec]] = None,
+        system_prompt: Optional[str] = None,
+    ) -> int:
+        """Number of tokens the chat template renders a conversation to.
+
+        Args:
+            messages: List of message objects.
+            tool_specs: List of tool specifications.
+            system_prompt: System prompt.
+
+        Returns:
+            Token count, without the assistant turn header.
+        """
+        request = self.format_request(messages, tool_specs, system_prompt)
+        if not request["messages"] and not request["tools"]:
+            return 0
+        prompt = self._apply_chat_template(
+            request["messages"], request["tools"], add_generation_prompt=False
+        )
+        return len(self._encode_prompt(prompt))
+
     @override
     def update_config(self, **model_config: Unpack[MLXConfig]) -> None:  # type: ignore[override]
         """Update configuration."""
         validate_config_keys(model_config, self.MLXConfig)
 
-        if "model_id" in model_config and model_config["model_id"] != self.config.get("model_id"):
+        reload_keys = ("model_id", "draft_model_id")
+        if any(k in model_config and model_config[k] != self.config.get(k) for k in reload_keys):
             self.config.update(model_config)
             self._load_model()
         else:
             self.config.update(model_config)
+            if "prompt_cache_size" in model_config:
+                self._prompt_cache.max_entries = model_config["prompt_cache_size"]
+                self._prompt_cache.clear()
+            kv_keys = ("max_kv_size", "kv_sink_tokens", "kv_bits")
+            if any(k in model_config for k in kv_keys):
+                self._configure_kv_cache()
+            batch_keys = (
+                "max_batch_size",
+                "prompt_lookup_num_tokens",
+                "prefill_step_size",
+                *kv_keys,
+            )
+            if any(k in model_config for k in batch_keys):
+                self._configure_batch_engine()
+            if "prefill_step_size" in model_config:
+                self._prompt_cache.prefill_step_size = model_config["prefill_step_size"]
+            if "adapter_cache_size" in model_config:
+                self._adapters.max_adapters = model_config["adapter_cache_size"]
+            if "adapter_path" in model_config:
+                # Attached to the base model on the worker thread before the next generation
+                self._adapter_path = self._resolve_adapter_path(model_config["adapter_path"])
+            if any(k in model_config for k in ("prompt_cache_dir", *kv_keys)):
+                self._configure_prompt_cache_dir()
+            if any(k in model_config for k in ("response_cache_size", "response_cache_path")):
+                self._configure_response_cache()
 
     @override
     def get_config(self) -> MLXConfig:
@@ -240,11 +538,12 @@ class MLXModel(Model):
         for message in messages:
             contents = message["content"]
 
-            # Check for reasoningContent and warn user
-            if any("reasoningContent" in content for content in contents):
-                logger.warning(
-                    "reasoningContent in multi-turn conversations requires model support"
-                )
+            # Templates that know reasoning (e.g. Qwen3) decide which turns keep it
+            reasoning = "".join(
+                content["reasoningContent"].get("reasoningText", {}).get("text", "")
+                for content in contents
+                if "reasoningContent" in content
+            )
 
             formatted_contents = [
                 cls.format_request_message_content(content)
@@ -272,6 +571,7 @@ class MLXModel(Model):
                 "role": message["role"],
                 "content": text_content if text_content else "",
                 **({"tool_calls": formatted_tool_calls} if formatted_tool_calls else {}),
+                **({"reasoning_content": reasoning} if reasoning else {}),
             }
             formatted_messages.append(formatted_message)
             formatted_messages.extend(formatted_tool_messages)
@@ -370,15 +670,19 @@ class MLXModel(Model):
             return {"messageStop": {"stopReason": "end_turn"}}
 
         if chunk_type == "metadata":
+            usage = {
+                "inputTokens": event["data"]["input_tokens"],
+                "outputTokens": event["data"]["output_tokens"],
+                "totalTokens": event["data"]["input_tokens"] + event["data"]["output_tokens"],
+            }
+            if event["data"].get("cache_read_input_tokens"):
+                usage["cacheReadInputTokens"] = event["data"]["cache_read_input_tokens"]
+            if event["data"].get("cache_write_input_tokens"):
+                usage["cacheWriteInputTokens"] = event["data"]["cache_write_input_tokens"]
             return {
                 "metadata": {
-                    "usage": {
-                        "inputTokens": event["data"]["input_tokens"],
-                        "outputTokens": event["data"]["output_tokens"],
-                        "totalTokens": event["data"]["input_tokens"]
-                        + event["data"]["output_tokens"],
-                    },
-                    "metrics": {"latencyMs": 0},
+                    "usage": usage,
+                    "metrics": event["data"].get("metrics", {"latencyMs": 0}),
                 },
             }
 
@@ -408,6 +712,379 @@ class MLXModel(Model):
 
         return chunks, data_type
 
+    def _text_chunks(
+        self, text: str, data_type: Optional[str], content_type: str = "text"
+    ) -> tuple[list[StreamEvent], Optional[str]]:
+        """Format streamed text, opening a text content block if needed.
+
+        Args:
+            text: Text to stream (nothing is emitted when empty).
+            data_type: Current content data type.
+            content_type: ``text`` for the answer, ``reasoning_content`` for reasoning.
+
+        Returns:
+            Tuple of (chunks to yield, new data_type).
+        """
+        if not text:
+            return [], data_type
+
+        chunks, data_type = self._stream_switch_content(content_type, data_type)
+        chunks.append(
+            self.format_chunk(
+                {"chunk_type": "content_delta", "data_type": content_type, "data": text}
+            )
+        )
+        return chunks, data_type
+
+    def _format_tool_call_chunks(
+        self, tool_call: Dict[str, Any], tool_id: str
+    ) -> list[StreamEvent]:
+        """Format a parsed tool call as a complete toolUse content block.
+
+        Args:
+            tool_call: Parsed tool call with ``name`` and ``arguments``.
+            tool_id: Tool use id.
+
+        Returns:
+            Content start, delta and stop chunks.
+        """
+        return [
+            self.format_chunk(
+                {
+                    "chunk_type": "content_start",
+                    "data_type": "tool",
+                    "data": {"name": tool_call.get("name", "unknown"), "id": tool_id},
+                }
+            ),
+            self.format_chunk(
+                {
+                    "chunk_type": "content_delta",
+                    "data_type": "tool",
+                    "data": json.dumps(tool_call.get("arguments", {})),
+                }
+            ),
+            self.format_chunk({"chunk_type": "content_stop", "data_type": "tool"}),
+        ]
+
+    def _apply_chat_template(
+        self,
+        messages: list[Dict[str, Any]],
+        tools: Optional[list[Dict[str, Any]]],
+        add_generation_prompt: bool = True,
+    ) -> str:
+        """Render messages with the tokenizer's chat template.
+
+        Falls back to describing tools in the system prompt when the template
+        does not accept a tools argument. Whether it does is learned on the
+        first render with tools, so later renders skip the failing attempt.
+
+        Args:
+            messages: Formatted messages.
+            tools: Formatted tool specs.
+            add_generation_prompt: Whether to append the assistant turn header.
+
+        Returns:
+            Rendered prompt.
+        """
+        tools_error = None
+        if tools and self._template_supports_tools is not False:
+            try:
+                prompt = self.tokenizer.apply_chat_template(
+                    messages,
+                    tools=tools,
+                    add_generation_prompt=add_generation_prompt,
+                    tokenize=False,
+                )
+                self._template_supports_tools = True
+                return prompt
+            except Exception as e:
+                logger.warning(f"tools parameter not supported by tokenizer, falling back: {e}")
+                tools_error = e
+
+        if tools and messages:
+            # Fallback: add tools to system prompt
+            messages = list(messages)
+            tools_desc = "\n\n# Available Tools:\n"
+            for tool in tools:
+                func = tool["function"]
+                tools_desc += f"\n## {func['name']}\n{func['description']}\n"
+                tools_desc += f"Parameters: {json.dumps(func['parameters'], indent=2)}\n"
+
+            if messages[0]["role"] == "system":
+                messages[0] = {**messages[0], "content": messages[0]["content"] + tools_desc}
+            else:
+                messages.insert(0, {"role": "system", "content": tools_desc})
+
+        prompt = self.tokenizer.apply_chat_template(
+            messages,
+            add_generation_prompt=add_generation_prompt,
+            tokenize=False,
+        )
+        # Only a template that renders without tools= is known not to support it
+        if tools_error is not None and self._template_supports_tools is None:
+            self._template_supports_tools = False
+        return prompt
+
+    def _shared_prefix_length(self, request: Dict[str, Any], prompt_tokens: list[int]) -> int:
+        """Number of prompt tokens covered by the system prompt and tool schemas.
+
+        Args:
+            request: Formatted request.
+            prompt_tokens: Full prompt token ids.
+
+        Returns:
+            Length of the shared prefix, or 0 if there is none.
+        """
+        messages = request["messages"]
+        prefix_messages = messages[:1] if messages and messages[0]["role"] == "system" else []
+        if not prefix_messages and not request["tools"]:
+            return 0
+
+        try:
+            prefix = self._apply_chat_template(
+                prefix_messages, request["tools"], add_generation_prompt=False
+            )
+        except Exception as e:
+            logger.debug("failed to render shared prefix: %s", e)
+            return 0
+
+        # Tokens at the boundary may merge differently, so only count exact matches
+        prefix_length = common_prefix_length(self._encode_prompt(prefix), prompt_tokens)
+        return min(prefix_length, len(prompt_tokens) - 1)
+
+    def _prepare_prompt(
+        self,
+        request: Dict[str, Any],
+        usage: Dict[str, int],
+        adapter_path: Optional[str],
+        prompt: Optional[str] = None,
+    ) -> tuple[list[int], list[Any], list[int]]:
+        """Render and tokenize a request and find its cached prefix.
+
+        Runs on the MLX worker thread, with the request's adapter already active.
+
+        Args:
+            request: Formatted request.
+            usage: Filled with prompt token counts.
+            adapter_path: Resolved adapter path the prompt is processed with.
+            prompt: The request's prompt, if already rendered.
+
+        Returns:
+            Tuple of (prompt tokens, prompt cache, tokens still to be prefilled).
+        """
+        if prompt is None:
+            prompt = self._chat_template.render(request["messages"], request["tools"])
+        namespace = adapter_namespace(adapter_path)
+
+        # Reuse the KV cache of the longest matching previous prompt
+        prompt_tokens = self._encode_prompt(prompt, incremental=True)
+        context_window = self.context_window
+        if (
+            context_window
+            and self._prompt_cache.max_kv_size is None
+            and len(prompt_tokens) >= context_window
+        ):
+            raise ContextWindowOverflowException(
+                f"prompt_tokens=<{len(prompt_tokens)}>, context_window=<{context_window}>"
+                " | prompt exceeds the model context window"
+            )
+
+        prompt_cache, prompt_suffix = self._prompt_cache.fetch(prompt_tokens, namespace)
+        cached_tokens = len(prompt_tokens) - len(prompt_suffix)
+        cache_write_tokens = 0
+        if cached_tokens == 0 and self._prompt_cache.disk_dir:
+            prefix_length = self._shared_prefix_length(request, prompt_tokens)
+            if prefix_length > 0:
+                prompt_cache, loaded = self._prompt_cache.fetch_prefix(
+                    prompt_tokens[:prefix_length], namespace
+                )
+                prompt_suffix = prompt_tokens[prefix_length:]
+                if loaded:
+                    cached_tokens = prefix_length
+                else:
+                    cache_write_tokens = prefix_length
+
+        usage.update(
+            input_tokens=len(prompt_tokens),
+            cache_read_input_tokens=cached_tokens,
+            cache_write_input_tokens=cache_write_tokens,
+        )
+        if self._think_ids is not None:
+            # Templates may open the think block for the model
+            usage["reasoning_open"] = int(reasoning_open(prompt_tokens, self._think_ids))
+        logger.debug(
+            "prompt_tokens=<%d>, cached_tokens=<%d> | invoking model",
+            len(prompt_tokens),
+            cached_tokens,
+        )
+        return prompt_tokens, prompt_cache, prompt_suffix
+
+    def _kv_cache_options(self) -> Dict[str, Any]:
+        """KV cache quantization options passed to generation."""
+        rotating = self._prompt_cache.max_kv_size is not None
+        return {
+            "kv_bits": None if rotating else self.config.get("kv_bits"),
+            "kv_group_size": self.config.get("kv_group_size", 64),
+            "quantized_kv_start": self.config.get("quantized_kv_start", 0),
+        }
+
+    def _use_prompt_lookup(self, prompt_cache: list[Any]) -> bool:
+        """Whether to decode with prompt lookup instead of plain or draft-model decoding."""
+        if not self.config.get("prompt_lookup_num_tokens"):
+            return False
+        if self.draft_model is not None:
+            logger.debug("draft model configured, ignoring prompt_lookup_num_tokens")
+            return False
+        if self._prompt_cache.max_kv_size is not None:
+            logger.debug("rotating prompt cache, prompt lookup disabled")
+            return False
+        if not can_trim_prompt_cache(prompt_cache):
+            logger.debug("prompt cache cannot be trimmed, prompt lookup disabled")
+            return False
+        return True
+
+    def _generate(
+        self,
+        request: Dict[str, Any],
+        max_tokens: int,
+        sampler: Any,
+        usage: Dict[str, int],
+        adapter_path: Optional[str],
+        json_schema: Optional[Dict[str, Any]] = None,
+        cancellation: Optional[CancellationToken] = None,
+        thinking_budget: Optional[int] = None,
+    ) -> Iterator[Union[PrefillProgress, GenerationResponse]]:
+        """Prefill and decode a single request. Runs on the MLX worker thread.
+
+        Args:
+            request: Formatted request.
+            max_tokens: Maximum tokens to generate.
+            sampler: Token sampler.
+            usage: Filled with prompt token counts once the prompt is prepared.
+            adapter_path: Resolved adapter path to generate with.
+            json_schema: JSON schema the output is constrained to.
+            cancellation: Token checked after every prefill chunk and decode step.
+            thinking_budget: Reasoning tokens after which the think block is closed.
+
+        Yields:
+            Prefill progress after each prefill chunk, then generation responses from mlx-lm.
+        """
+        check_cancelled = cancellation.raise_if_cancelled if cancellation else lambda: None
+        check_cancelled()
+        # Peak memory is reported per request rather than for the whole process
+        mx.reset_peak_memory()
+        self._adapters.activate(adapter_path)
+        prompt_tokens, prompt_cache, prompt_suffix = self._prepare_prompt(
+            request, usage, adapter_path
+        )
+
+        logits_processors = None
+        if json_schema is not None:
+            constraint = json_schema_constraint(json_schema, self.tokenizer)
+            logits_processors = [JSONSchemaLogitsProcessor(constraint)]
+        if thinking_budget is not None and self._think_ids is not None:
+            logits_processors = (logits_processors or []) + [
+                ThinkingBudgetProcessor(
+                    self._think_ids, thinking_budget, bool(usage.get("reasoning_open"))
+                )
+            ]
+
+        # Quantize reused layers up front: speculative decoding quantizes copies of the cache list
+        kv_options = self._kv_cache_options()
+        quantize = functools.partial(
+            maybe_quantize_kv_cache,
+            prompt_cache,
+            kv_options["quantized_kv_start"],
+            kv_options["kv_group_size"],
+            kv_options["kv_bits"],
+        )
+        quantize()
+
+        generated_tokens: list[int] = []
+        snapshot: list[Any] = []
+        failed = False
+        try:
+            # Prefill all but the last prompt token in chunks, so a stopped consumer ends the
+            # request between chunks and callers can show progress
+            prefill_size = len(prompt_suffix) - 1
+            cached_size = len(prompt_tokens) - len(prompt_suffix)
+            tic = time.perf_counter()
+            for processed in prefill_steps(
+                self.model,
+                prompt_cache,
+                prompt_suffix[:-1],
+                self.config.get("prefill_step_size", 2048),
+                self.draft_model,
+            ):
+                check_cancelled()
+                quantize()
+                yield PrefillProgress(cached_size + processed, len(prompt_tokens))
+
+            # A rotated cache cannot be trimmed back to the next turn's prompt, so keep a copy
+            # of the prefilled prompt: the next turn extends it with the re-rendered reply
+            if self._prompt_cache.max_kv_size is not None and cache_offset(prompt_cache):
+                snapshot = copy_cache(prompt_cache)
+
+            if logits_processors is None and self._use_prompt_lookup(prompt_cache):
+                generator = stream_prompt_lookup(
+                    self.model,
+                    self.tokenizer,
+                    prompt_suffix[-1:],
+                    context=prompt_tokens,
+                    max_tokens=max_tokens,
+                    sampler=sampler,
+                    prompt_cache=prompt_cache,
+                    num_draft_tokens=self.config["prompt_lookup_num_tokens"],
+                    max_ngram_size=self.config.get("prompt_lookup_max_ngram", 3),
+                    stats=usage,
+                    **kv_options,
+                )
+            else:
+                generator = stream_generate(
+                    self.model,
+                    self.tokenizer,
+                    prompt_suffix[-1:],
+                    max_tokens=max_tokens,
+                    draft_model=self.draft_model,
+                    sampler=sampler,
+                    prompt_cache=prompt_cache,
+                    logits_processors=logits_processors,
+                    num_draft_tokens=self.config.get("num_draft_tokens", 3),
+                    **kv_options,
+                )
+
+            prompt_tps = None
+            try:
+                for gen_response in generator:
+                    check_cancelled()
+                    # Report the chunked prefill rather than the single token mlx-lm processed
+                    if prompt_tps is None:
+                        prompt_tps = (prefill_size + 1) / (time.perf_counter() - tic)
+                    gen_response.prompt_tokens = prefill_size + 1
+                    gen_response.prompt_tps = prompt_tps
+                    generated_tokens.append(gen_response.token)
+                    yield gen_response
+            finally:
+                generator.close()
+        except Exception:
+            failed = True
+            raise
+        finally:
+            # A cache left mid-update by a failed generation cannot be trusted, and a cancelled
+            # request frees its memory right away for the requests still running
+            if failed or (cancellation is not None and cancellation.cancelled):
+                prompt_cache.clear()
+                snapshot.clear()
+                mx.clear_cache()
+            else:
+                namespace = adapter_namespace(adapter_path)
+                if snapshot and not can_trim_prompt_cache(prompt_cache):
+                    self._prompt_cache.store(prompt_tokens[:-1], snapshot, namespace)
+                else:
+                    self._prompt_cache.store(
+                        prompt_tokens + generated_tokens, prompt_cache, namespace
+                    )
+
     @override
     async def stream(
         self,
@@ -425,13 +1102,22 @@ class MLXModel(Model):
             tool_specs: List of tool specifications.
             system_prompt: System prompt.
             tool_choice: Tool choice selection.
-            **kwargs: Additional arguments.
+            **kwargs: Additional arguments. ``adapter_path`` selects the LoRA
+                adapter for this call only (None for the base model).
+                ``json_schema`` constrains the output to JSON matching the schema.
+                ``cancellation_token`` (a ``CancellationToken``) stops the request when
+                cancelled, raising ``GenerationCancelledError``. ``timeout`` (seconds,
+                default ``request_timeout``) raises ``TimeoutError`` once it expires.
 
         Yields:
             Formatted message chunks.
         """
         warn_on_tool_choice_not_supported(tool_choice)
 
+        adapter_path = self._adapter_path
+        if "adapter_path" in kwargs:
+            adapter_path = self._resolve_adapter_path(kwargs["adapter_path"])
+
         logger.debug("formatting request")
         request = self.format_request(messages, tool_specs, system_prompt)
         logger.debug(
@@ -439,148 +1125,561 @@ class MLXModel(Model):
             {**request, "messages": f"{len(request['messages'])} messages"},
         )
 
-        # Apply chat template
-        try:
-            if request["tools"]:
-                prompt = self.tokenizer.apply_chat_template(
-                    request["messages"],
-                    tools=request["tools"],
-                    add_generation_prompt=True,
-                    tokenize=False,
-                )
-            else:
-                prompt = self.tokenizer.apply_chat_template(
-                    request["messages"],
-                    add_generation_prompt=True,
-                    tokenize=False,
-                )
-        except Exception as e:
-            logger.warning(f"tools parameter not supported by tokenizer, falling back: {e}")
-            # Fallback: add tools to system prompt
-            if request["tools"] and request["messages"]:
-                tools_desc = "\n\n# Available Tools:\n"
-                for tool in request["tools"]:
-                    func = tool["function"]
-                    tools_desc += f"\n## {func['name']}\n{func['description']}\n"
-                    tools_desc += f"Parameters: {json.dumps(func['parameters'], indent=2)}\n"
-
-                if request["messages"][0]["role"] == "system":
-                    request["messages"][0]["content"] += tools_desc
-                else:
-                    request["messages"].insert(0, {"role": "system", "content": tools_desc})
+        def _generate() -> AsyncGenerator[StreamEvent, None]:
+            return self._stream_request(request, adapter_path, kwargs)
 
-            prompt = self.tokenizer.apply_chat_template(
-                request["messages"],
-                add_generation_prompt=True,
-                tokenize=False,
+        if self._response_cache is None:
+            events = _generate()
+        else:
+            key = await self._response_cache_key(request, adapter_path, kwargs.get("json_schema"))
+            events = cast(
+                AsyncGenerator[StreamEvent, None],
+                self._response_cache.stream(key, _generate, self._check_cancelled(kwargs)),
             )
 
+        try:
+            async for event in events:
+                yield event
+        finally:
+            await events.aclose()
+
+    async def _response_cache_key(
+        self, request: Dict[str, Any], adapter_path: Optional[str], json_schema: Optional[Any]
+    ) -> str:
+        """Response cache key of a request: model, adapter, prompt tokens and sampling settings."""
+
+        def _prompt_tokens() -> list[int]:
+            prompt = self._chat_template.render(request["messages"], request["tools"])
+            return self._encode_prompt(prompt, incremental=True)
+
+        # Rendered off the MLX worker thread, which may be busy decoding a batch
+        prompt_tokens = await asyncio.to_thread(_prompt_tokens)
+        settings = {
+            "params": self.config.get("params") or {},
+            "json_schema": json_schema,
+            "stop_after_tool_calls": self.config.get("stop_after_tool_calls", True),
+            "parallel_tool_calls": self.config.get("parallel_tool_calls", True),
+            "max_kv_size": self._prompt_cache.max_kv_size,
+            **self._kv_cache_options(),
+        }
+        return response_cache_key(
+            self._response_cache_model_key,
+            adapter_namespace(adapter_path),
+            prompt_tokens,
+            settings,
+        )
+
+    async def _stream_request(
+        self, request: Dict[str, Any], adapter_path: Optional[str], kwargs: Dict[str, Any]
+    ) -> AsyncGenerator[StreamEvent, None]:
+        """Generate the response to a formatted request and stream its events."""
+        json_schema = kwargs.get("json_schema")
+        cancellation: Optional[CancellationToken] = kwargs.get("cancellation_token")
+        timeout = kwargs.get("timeout", self.config.get("request_timeout"))
+        if timeout is not None:
+            cancellation = CancellationToken.with_timeout(timeout, parent=cancellation)
+        stop_after_tool_calls = self.config.get("stop_after_tool_calls", True)
+        parallel_tool_calls = self.config.get("parallel_tool_calls", True)
+        prefill_progress = self.config.get("prefill_progress", False)
+
         # Get params
         params = self.config.get("params", {})
         max_tokens = params.get("max_tokens", 3000)
         temp = params.get("temperature", params.get("temp", 1))
         top_p = params.get("top_p", 1.0)
+        thinking_budget = params.get("thinking_budget")
+        think_ids = self._think_ids
 
         sampler = make_sampler(temp=temp, top_p=top_p)
-
-        logger.debug("invoking model")
+        stop_matcher = StopSequenceMatcher(params["stop"]) if params.get("stop") else None
+        usage: Dict[str, int] = {}
 
         # Start streaming
+        start_time = time.perf_counter()
         yield self.format_chunk({"chunk_type": "message_start"})
 
         # Tracking variables (mlx-lm server.py pattern)
-        tool_calls: list[Dict[str, Any]] = []
+        num_tool_calls = 0
         tool_text = ""
         in_tool_call = False
         data_type: Optional[str] = None
-        token_count = 0
+        first_token_time: Optional[float] = None
+        last_response: Optional[GenerationResponse] = None
+        draft_accepted = 0
+        verify_steps = 0
         finish_reason = "end_turn"
+        stopped = False
+        in_reasoning = False
+        reasoning_tokens = 0
+        strip_answer = False
+
+        # Generate on the MLX worker thread so the event loop stays responsive
+        # Constrained decoding and thinking budgets need a logits processor per sequence, so
+        # they run sequentially
+        if self._batch_engine is not None and json_schema is None and thinking_budget is None:
+            namespace = adapter_namespace(adapter_path)
+            responses = self._batch_engine.generate(
+                lambda: self._prepare_prompt(request, usage, adapter_path),
+                max_tokens=max_tokens,
+                sampler=sampler,
+                on_finish=lambda tokens, cache: self._prompt_cache.store(tokens, cache, namespace),
+                adapter_path=adapter_path,
+                cancellation=cancellation,
+            )
+        else:
+            responses = iterate_in_worker(
+                lambda: self._generate(
+                    request,
+                    max_tokens,
+                    sampler,
+                    usage,
+                    adapter_path,
+                    json_schema,
+                    cancellation,
+                    thinking_budget,
+                ),
+                max_buffered=self.config.get("stream_buffer_size", DEFAULT_MAX_BUFFERED),
+                check_cancelled=cancellation.raise_if_cancelled if cancellation else None,
+            )
 
-        # Generate
-        for gen_response in stream_generate(
-            self.model, self.tokenizer, prompt, max_tokens=max_tokens, sampler=sampler
-        ):
-            # Check for tool call markers (mlx-lm server.py pattern lines 678-724)
-            if getattr(self.tokenizer, "has_tool_calling", False) and gen_response.text == getattr(
-                self.tokenizer, "tool_call_start", None
-            ):
-                in_tool_call = True
-                continue
+        try:
+            async for gen_response in responses:
+                if isinstance(gen_response, PrefillProgress):
+                    if prefill_progress:
+                        yield cast(
+                            StreamEvent,
+                            {
+                                "prefillProgress": {
+                                    "processedTokens": gen_response.processed,
+                                    "totalTokens": gen_response.total,
+                                }
+                            },
+                        )
+                    continue
+                if first_token_time is None:
+                    first_token_time = time.perf_counter()
+                    in_reasoning = bool(usage.get("reasoning_open"))
+                last_response = gen_response
+
+                # Each verify step yields its accepted draft tokens plus one model token
+                if gen_response.from_draft:
+                    draft_accepted += 1
+                else:
+                    verify_steps += 1
+
+                # Reasoning is split from the answer by the think token ids
+                if (
+                    think_ids is not None
+                    and not in_tool_call
+                    and not (stop_after_tool_calls and num_tool_calls)
+                ):
+                    if gen_response.token == think_ids[0]:
+                        in_reasoning = True
+                        if stop_matcher is not None:
+                            chunks, data_type = self._text_chunks(stop_matcher.flush(), data_type)
+                            for chunk in chunks:
+                                yield chunk
+                        continue
+
+                    if in_reasoning:
+                        text = gen_response.text
+                        if gen_response.token == think_ids[1]:
+                            # The detokenizer may release held-back text with the marker
+                            in_reasoning = False
+                            strip_answer = True
+                            text = text.rpartition(self.tokenizer.think_end)[0]
+                        else:
+                            reasoning_tokens += 1
+                        chunks, data_type = self._text_chunks(text, data_type, "reasoning_content")
+                        for chunk in chunks:
+                            yield chunk
+                        continue
+
+                # Check for tool call markers (mlx-lm server.py pattern lines 678-724)
+                if getattr(
+                    self.tokenizer, "has_tool_calling", False
+                ) and gen_response.text == getattr(self.tokenizer, "tool_call_start", None):
+                    in_tool_call = True
+                    if stop_matcher is not None:
+                        chunks, data_type = self._text_chunks(stop_matcher.flush(), data_type)
+                        for chunk in chunks:
+                            yield chunk
+                    continue
+
+                if in_tool_call:
+                    if gen_response.text != getattr(self.tokenizer, "tool_call_end", None):
+                        tool_text += gen_response.text
+                        continue
 
-            if in_tool_call:
-                if gen_response.text == getattr(self.tokenizer, "tool_call_end", None):
-                    # Parse and store tool call
+                    # Parse the tool call and emit it right away
+                    in_tool_call = False
+                    finish_reason = "tool_calls"
                     try:
-                        tool_data = json.loads(tool_text.strip())
-                        tool_calls.append(tool_data)
+                        tool_call = json.loads(tool_text.strip())
                     except json.JSONDecodeError as e:
                         logger.warning(f"failed to parse tool call: {e} | text={tool_text}")
+                        tool_call = None
                     tool_text = ""
-                    in_tool_call = False
-                    finish_reason = "tool_calls"
+
+                    if tool_call is not None:
+                        num_tool_calls += 1
+                        if data_type:
+                            yield self.format_chunk(
+                                {"chunk_type": "content_stop", "data_type": data_type}
+                            )
+                            data_type = None
+                        tool_id = (
+                            f"{tool_call.get('name', 'unknown')}_{gen_response.generation_tokens}"
+                        )
+                        for chunk in self._format_tool_call_chunks(tool_call, tool_id):
+                            yield chunk
+
+                    if stop_after_tool_calls and not parallel_tool_calls and num_tool_calls:
+                        logger.debug("parallel tool calls disabled, stopping generation")
+                        break
                     continue
-                else:
-                    tool_text += gen_response.text
+
+                # Once the model has called tools, anything but another call is not needed
+                if stop_after_tool_calls and num_tool_calls:
+                    if gen_response.text.strip():
+                        logger.debug("tool calls complete, stopping generation")
+                        break
                     continue
 
-            # Regular text content
-            if gen_response.text:
-                chunks, data_type = self._stream_switch_content("text", data_type)
+                # Regular text content, holding back possible stop sequence prefixes
+                text = gen_response.text
+                if strip_answer:
+                    # Templates separate the answer from the think block with blank lines
+                    text = text.lstrip()
+                    strip_answer = not text
+                if stop_matcher is not None:
+                    text, stopped = stop_matcher.feed(gen_response.token, text)
+                chunks, data_type = self._text_chunks(text, data_type)
                 for chunk in chunks:
                     yield chunk
-
-                yield self.format_chunk(
-                    {
-                        "chunk_type": "content_delta",
-                        "data_type": "text",
-                        "data": gen_response.text,
-                    }
-                )
-                token_count += 1
+                if stopped:
+                    logger.debug("stop sequence matched, stopping generation")
+                    finish_reason = "end_turn"
+                    break
+        finally:
+            # Stops decoding on the worker when the loop exits early
+            await responses.aclose()
+
+        if stop_matcher is not None and not stopped:
+            chunks, data_type = self._text_chunks(stop_matcher.flush(), data_type)
+            for chunk in chunks:
+                yield chunk
+
+        token_count = last_response.generation_tokens if last_response else 0
+        if (
+            finish_reason == "end_turn"
+            and not stopped
+            and last_response is not None
+            and last_response.finish_reason == "length"
+        ):
+            finish_reason = "length"
 
         # Close any open content block
         if data_type:
             yield self.format_chunk({"chunk_type": "content_stop", "data_type": data_type})
 
-        # Emit tool calls
-        for tool_call in tool_calls:
-            tool_id = f"{tool_call.get('name', 'unknown')}_{token_count}"
-
-            yield self.format_chunk(
-                {
-                    "chunk_type": "content_start",
-                    "data_type": "tool",
-                    "data": {"name": tool_call.get("name", "unknown"), "id": tool_id},
-                }
-            )
-
-            yield self.format_chunk(
-                {
-                    "chunk_type": "content_delta",
-                    "data_type": "tool",
-                    "data": json.dumps(tool_call.get("arguments", {})),
-                }
-            )
-
-            yield self.format_chunk({"chunk_type": "content_stop", "data_type": "tool"})
-
         # Message stop
         yield self.format_chunk({"chunk_type": "message_stop", "data": finish_reason})
 
         # Metadata
-        input_tokens = len(self.tokenizer.encode(prompt))
+        end_time = time.perf_counter()
+        metrics: Dict[str, Any] = {"latencyMs": int((end_time - start_time) * 1000)}
+        if first_token_time is not None:
+            metrics["timeToFirstByteMs"] = int((first_token_time - start_time) * 1000)
+        if last_response is not None:
+            metrics.update(
+                promptTokens=last_response.prompt_tokens,
+                promptTokensPerSecond=last_response.prompt_tps,
+                generationTokens=last_response.generation_tokens,
+                generationTokensPerSecond=last_response.generation_tps,
+                peakMemoryGb=last_response.peak_memory,
+            )
+        if think_ids is not None:
+            metrics["reasoningTokens"] = reasoning_tokens
+        if self.draft_model is not None or "draft_tokens_proposed" in usage:
+            draft_proposed = usage.get(
+                "draft_tokens_proposed", verify_steps * self.config.get("num_draft_tokens", 3)
+            )
+            metrics.update(
+                draftTokensAccepted=draft_accepted,
+                draftTokensProposed=draft_proposed,
+                draftAcceptanceRate=draft_accepted / draft_proposed if draft_proposed else 0.0,
+            )
+
         yield self.format_chunk(
             {
                 "chunk_type": "metadata",
                 "data": {
-                    "input_tokens": input_tokens,
+                    "input_tokens": usage["input_tokens"],
                     "output_tokens": token_count,
+                    "cache_read_input_tokens": usage["cache_read_input_tokens"],
+                    "cache_write_input_tokens": usage["cache_write_input_tokens"],
+                    "metrics": metrics,
                 },
             }
         )
 
         logger.debug("finished streaming response from model")
 
+    async def sample(
+        self,
+        messages: Messages,
+        n: int,
+        tool_specs: Optional[list[ToolSpec]] = None,
+        system_prompt: Optional[str] = None,
+        **kwargs: Any,
+    ) -> list[Completion]:
+        """Sample ``n`` completions of a conversation from one shared prefill.
+
+        The prompt is prefilled once (reusing the prompt cache like ``stream``) and
+        the samples are decoded together as one batch, for self-consistency voting
+        or best-of-n planning. Sampling uses the configured ``params``; with
+        ``temperature`` 0 every sample is the greedy completion.
+
+        Args:
+            messages: List of message objects.
+            n: Number of completions.
+            tool_specs: List of tool specifications.
+            system_prompt: System prompt.
+            **kwargs: ``adapter_path``, ``cancellation_token`` and ``timeout``, as for ``stream``.
+
+        Returns:
+            Completions with their raw text, token ids, summed token log-probabilities
+            and finish reason (``stop`` or ``length``).
+
+        Raises:
+            ValueError: If n is less than 1.
+        """
+        if n < 1:
+            raise ValueError(f"n=<{n}> | n must be at least 1")
+
+        params = self.config.get("params", {})
+        sampler = make_sampler(
+            temp=params.get("temperature", params.get("temp", 1)), top_p=params.get("top_p", 1.0)
+        )
+
+        def _sample(
+            prompt: str, prompt_tokens: list[int], prompt_cache: list[Any], prompt_suffix: list[int]
+        ) -> list[Completion]:
+            return sample_n(
+                self.model,
+                self.tokenizer,
+                prompt_cache,
+                prompt_suffix,
+                n,
+                params.get("max_tokens", 3000),
+                sampler,
+                self.config.get("prefill_step_size", 2048),
+                check_cancelled,
+                self._kv_cache_options(),
+            )
+
+        logger.debug("n=<%d> | sampling completions", n)
+        check_cancelled = self._check_cancelled(kwargs)
+        return await self._run_on_prompt(
+            messages, tool_specs, system_prompt, kwargs, check_cancelled, _sample
+        )
+
+    async def score(
+        self,
+        messages: Messages,
+        candidates: list[str],
+        tool_specs: Optional[list[ToolSpec]] = None,
+        system_prompt: Optional[str] = None,
+        **kwargs: Any,
+    ) -> list[CandidateScore]:
+        """Score how likely each candidate is as the model's reply to a conversation.
+
+        The prompt is prefilled once (reusing the prompt cache like ``stream``) and
+        all candidates are scored by one padded, batched forward pass over the
+        shared prompt KV cache, e.g. to rerank answers, pick among multiple-choice
+        options or route a request without decoding.
+
+        Args:
+            messages: List of message objects.
+            candidates: Candidate continuations of the assistant turn.
+            tool_specs: List of tool specifications.
+            system_prompt: System prompt.
+            **kwargs: ``adapter_path``, ``cancellation_token`` and ``timeout``, as for ``stream``.
+
+        Returns:
+            One score per candidate, with its token ids, per-token log-probabilities and
+            their sum.
+        """
+        if not candidates:
+            return []
+
+        def _score(
+            prompt: str, prompt_tokens: list[int], prompt_cache: list[Any], prompt_suffix: list[int]
+        ) -> list[CandidateScore]:
+            candidate_tokens = [
+                self._continuation_tokens(prompt, prompt_tokens, candidate)
+                for candidate in candidates
+            ]
+            token_logprobs = score_continuations(
+                self.model,
+                prompt_cache,
+                prompt_suffix,
+                candidate_tokens,
+                self.config.get("prefill_step_size", 2048),
+                check_cancelled,
+            )
+            return [
+                CandidateScore(text, tokens, logprobs, sum(logprobs))
+                for text, tokens, logprobs in zip(candidates, candidate_tokens, token_logprobs)
+            ]
+
+        logger.debug("candidates=<%d> | scoring candidates", len(candidates))
+        check_cancelled = self._check_cancelled(kwargs)
+        return await self._run_on_prompt(
+            messages, tool_specs, system_prompt, kwargs, check_cancelled, _score
+        )
+
+    async def embed(
+        self,
+        texts: list[str],
+        pooling: str = "mean",
+        normalize: bool = True,
+        batch_size: int = 16,
+        **kwargs: Any,
+    ) -> mx.array:
+        """Embed texts with the hidden states of the loaded model.
+
+        Retrieval tools can share the weights that are already resident instead of
+        loading a separate embedding model. Texts run through the model's transformer
+        body in batches of similar length, and the final hidden states are pooled.
+        Results are cached by text hash (see ``embedding_cache_size``).
+
+        Args:
+            texts: Texts to embed.
+            pooling: ``mean`` over all tokens, or the ``last`` token's hidden state.
+            normalize: Scale every embedding to unit length.
+            batch_size: Texts per forward pass.
+            **kwargs: ``adapter_path``, ``cancellation_token`` and ``timeout``, as for ``stream``.
+
+        Returns:
+            Float32 array of shape ``(len(texts), hidden_size)``; ``numpy.array(...)``
+            converts it.
+
+        Raises:
+            ValueError: If the pooling mode is unknown.
+        """
+        if pooling not in POOLING_MODES:
+            raise ValueError(f"pooling=<{pooling}> | pooling must be one of {POOLING_MODES}")
+
+        adapter_path = self._adapter_path
+        if "adapter_path" in kwargs:
+            adapter_path = self._resolve_adapter_path(kwargs["adapter_path"])
+        namespace = adapter_namespace(adapter_path)
+        check_cancelled = self._check_cancelled(kwargs)
+
+        def _embed() -> mx.array:
+            check_cancelled()
+            keys = [
+                f"{namespace}|{pooling}|{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+                for text in texts
+            ]
+            found = {
+                key: self._embedding_cache[key] for key in keys if key in self._embedding_cache
+            }
+            missing = {key: text for key, text in zip(keys, texts) if key not in found}
+            logger.debug("texts=<%d>, cached=<%d> | embedding texts", len(texts), len(found))
+
+            if missing:
+                self._adapters.activate(adapter_path)
+                context_window = self.context_window
+                token_lists = [
+                    list(self.tokenizer.encode(text))[:context_window] for text in missing.values()
+                ]
+                vectors = embed_tokens(
+                    self.model, token_lists, pooling, batch_size, check_cancelled
+                )
+                found.update(zip(missing, vectors))
+
+            max_entries = self.config.get("embedding_cache_size", 1024)
+            for key in keys:
+                self._embedding_cache[key] = found[key]
+                self._embedding_cache.move_to_end(key)
+            while len(self._embedding_cache) > max(max_entries, 0):
+                self._embedding_cache.popitem(last=False)
+
+            if not keys:
+                hidden_size = getattr(getattr(self.model, "args", None), "hidden_size", 0)
+                return mx.zeros((0, hidden_size))
+            embeddings = mx.stack([found[key] for key in keys])
+            if normalize:
+                norms = mx.linalg.norm(embeddings, axis=-1, keepdims=True)
+                embeddings = embeddings / mx.maximum(norms, 1e-12)
+            mx.eval(embeddings)
+            return embeddings
+
+        return await asyncio.wrap_future(submit_to_worker(_embed))
+
+    def _check_cancelled(self, kwargs: Dict[str, Any]) -> Callable[[], None]:
+        """Cancellation check for a request's ``cancellation_token`` and ``timeout`` kwargs."""
+        cancellation: Optional[CancellationToken] = kwargs.get("cancellation_token")
+        timeout = kwargs.get("timeout", self.config.get("request_timeout"))
+        if timeout is not None:
+            cancellation = CancellationToken.with_timeout(timeout, parent=cancellation)
+        return cancellation.raise_if_cancelled if cancellation else lambda: None
+
+    def _continuation_tokens(self, prompt: str, prompt_tokens: list[int], text: str) -> list[int]:
+        """Token ids of text appended to a prompt, as they are tokenized in the full text."""
+        tokens = self._prompt_encoder.encode(prompt + text, remember=False)
+        if tokens[: len(prompt_tokens)] == prompt_tokens:
+            return tokens[len(prompt_tokens) :]
+        logger.debug("continuation merges with the end of the prompt, tokenizing it alone")
+        return list(self.tokenizer.encode(text, add_special_tokens=False))
+
+    async def _run_on_prompt(
+        self,
+        messages: Messages,
+        tool_specs: Optional[list[ToolSpec]],
+        system_prompt: Optional[str],
+        kwargs: Dict[str, Any],
+        check_cancelled: Callable[[], None],
+        run: Callable[[str, list[int], list[Any], list[int]], R],
+    ) -> R:
+        """Prepare a request's prompt on the MLX worker thread and run a function on it.
+
+        ``run`` gets the rendered prompt, its tokens, the prompt cache and the tokens
+        still to be processed. It prefills all but the last of them into the cache and
+        leaves the cache alone otherwise, so it is kept for later requests.
+        """
+        adapter_path = self._adapter_path
+        if "adapter_path" in kwargs:
+            adapter_path = self._resolve_adapter_path(kwargs["adapter_path"])
+        request = self.format_request(messages, tool_specs, system_prompt)
+
+        def _run() -> R:
+            check_cancelled()
+            self._adapters.activate(adapter_path)
+            prompt = self._chat_template.render(request["messages"], request["tools"])
+            prompt_tokens, prompt_cache, prompt_suffix = self._prepare_prompt(
+                request, {}, adapter_path, prompt
+            )
+            failed = False
+            try:
+                return run(prompt, prompt_tokens, prompt_cache, prompt_suffix)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                if failed:
+                    prompt_cache.clear()
+                    mx.clear_cache()
+                else:
+                    self._prompt_cache.store(
+                        prompt_tokens[:-1], prompt_cache, adapter_namespace(adapter_path)
+                    )
+
+        return await asyncio.wrap_future(submit_to_worker(_run))
+
     @override
     async def structured_output(
         self,
@@ -591,6 +1690,10 @@ class MLXModel(Model):
     ) -> AsyncGenerator[Dict[str, Union[T, Any]], None]:
         """Get structured output with JSON schema.
 
+        Decoding is constrained to the schema, so the response is always a
+        JSON value of the schema's shape with nothing around it (unless
+        max_tokens cuts it short).
+
         Args:
             output_model: Pydantic model for output.
             prompt: Prompt messages.
@@ -605,7 +1708,9 @@ class MLXModel(Model):
         augmented_system_prompt = (system_prompt or "") + json_instruction
 
         response_text = ""
-        async for event in self.stream(prompt, system_prompt=augmented_system_prompt, **kwargs):
+        async for event in self.stream(
+            prompt, system_prompt=augmented_system_prompt, json_schema=schema, **kwargs
+        ):
             if "contentBlockDelta" in event:
                 delta = event["contentBlockDelta"]["delta"]
                 if "text" in delta:
@@ -613,13 +1718,7 @@ class MLXModel(Model):
             yield cast(Dict[str, Union[T, Any]], event)
 
         try:
-            # Extract JSON from markdown if present
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
-
-            data = json.loads(response_text.strip())
+            data = json.loads(response_text)
             yield {"output": output_model(**data)}
         except Exception as e:
             raise ValueError(
@@ -0,0 +1,232 @@
+"""Process-wide registry of loaded MLX models.
+
+Every ``MLXModel`` (including the ones ``mlx_invoke`` builds per tool call)
+gets its weights from this registry instead of calling ``mlx_lm.load``
+directly. Models are keyed by (model_id, adapter path, tokenizer config, lazy),
+so instances with the same configuration share one copy of the weights.
+
+MLXModel always acquires the base model and attaches its adapter in place
+(see ``mlx_adapters``), so instances with different adapters share weights too.
+
+Handles are reference counted. A model nobody references stays loaded, so
+the next instance can reuse it in milliseconds, until the total size of
+loaded models exceeds the memory budget. At that point the least recently
+used unreferenced models are evicted.
+
+Models are loaded outside the registry lock, so a multi-GB load never blocks
+acquires of resident models or releases. Concurrent acquires of a model that
+is still loading wait for that one load.
+
+Example:
+    >>> from strands_mlx.mlx_model_registry import model_registry
+    >>> model_registry.max_memory_bytes = 8 * 1024**3
+"""
+
+import json
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import mlx.core as mx
+from mlx.utils import tree_flatten
+from mlx_lm import load
+
+from strands_mlx.mlx_adapters import MLXAdapterManager
+
+logger = logging.getLogger(__name__)
+
+RegistryKey = Tuple[str, Optional[str], str, bool]
+
+
+def model_size_bytes(model: Any) -> int:
+    """Total size of a model's parameters in bytes."""
+    return sum(v.nbytes for _, v in tree_flatten(model.parameters()))
+
+
+def _default_memory_budget() -> Optional[int]:
+    """Recommended working set of the Metal device, or None when unknown."""
+    try:
+        if mx.metal.is_available():
+            return int(mx.metal.device_info()["max_recommended_working_set_size"])
+    except Exception as e:
+        logger.debug("failed to read device info: %s", e)
+    return None
+
+
+class _RegistryEntry:
+    """One loaded model and the number of handles referencing it."""
+
+    def __init__(self, model: Any, tokenizer: Any) -> None:
+        self.model = model
+        self.tokenizer = tokenizer
+        self.size_bytes = model_size_bytes(model)
+        self.adapters = MLXAdapterManager(model)
+        self.refcount = 0
+
+
+class ModelHandle:
+    """Shared reference to a model held by the registry.
+
+    Call :meth:`release` when done; releasing twice is a no-op.
+    """
+
+    def __init__(self, registry: "MLXModelRegistry", key: Hashable, entry: _RegistryEntry) -> None:
+        self.key = key
+        self.model = entry.model
+        self.tokenizer = entry.tokenizer
+        self.adapters = entry.adapters
+        self._registry = registry
+        self._released = False
+
+    def release(self) -> None:
+        """Drop this reference to the model."""
+        if not self._released:
+            self._released = True
+            self._registry._release(self.key)
+
+
+class MLXModelRegistry:
+    """Loads MLX models once and shares them between MLXModel instances."""
+
+    def __init__(self, max_memory_bytes: Optional[int] = None) -> None:
+        """Initialize model registry.
+
+        Args:
+            max_memory_bytes: Budget for the total size of loaded models.
+                Unreferenced models are evicted, least recently used first,
+                while the budget is exceeded. None keeps them until cleared.
+        """
+        self.max_memory_bytes = max_memory_bytes
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[Hashable, _RegistryEntry]" = OrderedDict()
+        # Loads in progress, completed (or failed) once the entry is registered
+        self._loading: Dict[Hashable, "Future[None]"] = {}
+
+    @staticmethod
+    def make_key(
+        model_id: str,
+        adapter_path: Optional[str] = None,
+        tokenizer_config: Optional[Dict[str, Any]] = None,
+        lazy: bool = False,
+    ) -> RegistryKey:
+        """Build the registry key for a model configuration."""
+        return (
+            model_id,
+            adapter_path,
+            json.dumps(tokenizer_config or {}, sort_keys=True, default=str),
+            lazy,
+        )
+
+    def acquire(
+        self,
+        model_id: str,
+        adapter_path: Optional[str] = None,
+        tokenizer_config: Optional[Dict[str, Any]] = None,
+        lazy: bool = False,
+    ) -> ModelHandle:
+        """Get a handle to a model, loading it on first use.
+
+        Args:
+            model_id: Model identifier (HF Hub ID or local path).
+            adapter_path: Resolved local LoRA adapter path.
+            tokenizer_config: Tokenizer configuration passed to mlx_lm.load.
+            lazy: Whether to load weights lazily.
+
+        Returns:
+            Handle to the shared model and tokenizer.
+        """
+        key = self.make_key(model_id, adapter_path, tokenizer_config, lazy)
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    logger.debug(
+                        "model_id=<%s>, adapter_path=<%s> | reusing", model_id, adapter_path
+                    )
+                    self._entries.move_to_end(key)
+                    return self._handle(key, entry)
+
+                loading = self._loading.get(key)
+                if loading is None:
+                    loading = self._loading[key] = Future()
+                    break
+
+            # Another thread is loading this model; its load error is ours too
+            logger.debug(
+                "model_id=<%s>, adapter_path=<%s> | waiting for load", model_id, adapter_path
+            )
+            loading.result()
+
+        try:
+            logger.debug("model_id=<%s>, adapter_path=<%s> | loading", model_id, adapter_path)
+            model, tokenizer = load(
+                model_id,
+                tokenizer_config=tokenizer_config or {},
+                adapter_path=adapter_path,
+                lazy=lazy,
+            )
+            entry = _RegistryEntry(model, tokenizer)
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            loading.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._loading[key]
+            self._entries[key] = entry
+            handle = self._handle(key, entry)
+        loading.set_result(None)
+        return handle
+
+    def _handle(self, key: Hashable, entry: _RegistryEntry) -> ModelHandle:
+        """Reference a registered entry. Called with the lock held."""
+        entry.refcount += 1
+        self._evict()
+        return ModelHandle(self, key, entry)
+
+    def _release(self, key: Hashable) -> None:
+        """Decrement the reference count of a model."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.refcount = max(entry.refcount - 1, 0)
+                self._evict()
+
+    def _evict(self) -> None:
+        """Evict unreferenced models, least recently used first, until within budget."""
+        if self.max_memory_bytes is None:
+            return
+        evicted = False
+        for key in list(self._entries):
+            if self.memory_bytes <= self.max_memory_bytes:
+                break
+            if self._entries[key].refcount == 0:
+                logger.debug("key=<%s> | evicting model", key)
+                del self._entries[key]
+                evicted = True
+        if evicted:
+            mx.clear_cache()
+
+    @property
+    def memory_bytes(self) -> int:
+        """Total size of all loaded models in bytes."""
+        with self._lock:
+            return sum(entry.size_bytes for entry in self._entries.values())
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Whether a model with this key is loaded."""
+        with self._lock:
+            return key in self._entries
+
+    def clear(self) -> None:
+        """Drop every model that is not currently referenced."""
+        with self._lock:
+            for key in [k for k, entry in self._entries.items() if entry.refcount == 0]:
+                del self._entries[key]
+            mx.clear_cache()
+
+
+model_registry = MLXModelRegistry(max_memory_bytes=_default_memory_budget())
@@ -0,0 +1,402 @@
+"""Prompt KV-cache reuse for MLX models.
+
+Keeps the KV caches of recent requests together with the token ids they hold,
+so the next turn of a conversation only needs to prefill the tokens that were
+not already processed. Shared prefixes (system prompt + tool schemas) can also
+be persisted to disk as safetensors so new processes skip their prefill.
+Built on mlx-lm's prompt cache utilities.
+
+- Prompt caching: https://github.com/ml-explore/mlx-lm#long-prompts-and-generations
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Iterator, List, NamedTuple, Optional, Tuple
+
+import mlx.core as mx
+from mlx.utils import tree_flatten, tree_map
+from mlx_lm.models.cache import (
+    RotatingKVCache,
+    can_trim_prompt_cache,
+    load_prompt_cache,
+    make_prompt_cache,
+    save_prompt_cache,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def common_prefix_length(a: List[int], b: List[int]) -> int:
+    """Length of the longest common prefix of two token sequences.
+
+    Args:
+        a: First token sequence.
+        b: Second token sequence.
+
+    Returns:
+        Number of leading tokens shared by both sequences.
+    """
+    n = min(len(a), len(b))
+    for i in range(n):
+        if a[i] != b[i]:
+            return i
+    return n
+
+
+def cache_offset(cache: List[Any]) -> Optional[int]:
+    """Number of tokens processed into every layer of a prompt cache.
+
+    Args:
+        cache: Per-layer prompt cache.
+
+    Returns:
+        Smallest layer token count, or None if no layer tracks an offset.
+    """
+    offsets = [
+        layer_cache.offset
+        for layer_cache in cache
+        if isinstance(getattr(layer_cache, "offset", None), int)
+    ]
+    return min(offsets) if offsets else None
+
+
+def cache_nbytes(cache: List[Any]) -> int:
+    """Memory allocated for the KV states of a prompt cache, in bytes."""
+    return sum(
+        value.nbytes
+        for layer_cache in cache
+        for _, value in tree_flatten(vars(layer_cache))
+        if isinstance(value, mx.array)
+    )
+
+
+def copy_cache(cache: List[Any]) -> List[Any]:
+    """Independent copy of a prompt cache.
+
+    Caches update their KV arrays in place, so a copy taken before generation
+    keeps the state it had at that point. Rotating caches are copied with at
+    most ``max_size`` tokens.
+
+    Args:
+        cache: Per-layer prompt cache holding at least one token.
+
+    Returns:
+        Per-layer prompt cache with the same tokens and its own arrays.
+    """
+    copied = []
+    for layer_cache in cache:
+        layer_copy = type(layer_cache).from_state(
+            tree_map(mx.array, layer_cache.state), layer_cache.meta_state
+        )
+        # Prefill chunks concatenate past max_size; the next update drops the excess anyway
+        if (
+            isinstance(layer_copy, RotatingKVCache)
+            and layer_copy.keys.shape[2] > layer_copy.max_size
+        ):
+            excess = layer_copy.keys.shape[2] - layer_copy.max_size
+            layer_copy.keys = layer_copy._trim(excess, layer_copy.keys)
+            layer_copy.values = layer_copy._trim(excess, layer_copy.values)
+            layer_copy._idx = layer_copy.max_size
+        copied.append(layer_copy)
+    mx.eval([layer_cache.state for layer_cache in copied])
+    return copied
+
+
+def tokenizer_fingerprint(tokenizer: Any) -> str:
+    """Stable hash of a tokenizer's vocabulary and chat template.
+
+    Args:
+        tokenizer: Loaded tokenizer (mlx-lm TokenizerWrapper or HF tokenizer).
+
+    Returns:
+        Hex digest identifying the tokenizer.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(sorted(tokenizer.get_vocab().items())).encode("utf-8"))
+    digest.update(str(getattr(tokenizer, "chat_template", "") or "").encode("utf-8"))
+    return digest.hexdigest()
+
+
+def prefill_steps(
+    model: Any,
+    cache: List[Any],
+    tokens: List[int],
+    step_size: int = 2048,
+    draft_model: Optional[Any] = None,
+) -> Iterator[int]:
+    """Process tokens into a prompt cache in chunks, yielding after each chunk.
+
+    Only one chunk of activations is alive at a time, which bounds peak memory
+    on long prompts. Callers can report progress or stop between chunks; the
+    cache then holds exactly the tokens processed so far.
+
+    Args:
+        model: Loaded MLX language model.
+        cache: Prompt cache to update in place.
+        tokens: Token ids to process.
+        step_size: Maximum tokens per forward pass.
+        draft_model: Draft model whose layers follow the model's in ``cache``.
+
+    Yields:
+        Number of tokens processed so far.
+    """
+    caches = [(model, cache)]
+    if draft_model is not None:
+        num_layers = len(model.layers)
+        caches = [(model, cache[:num_layers]), (draft_model, cache[num_layers:])]
+
+    for start in range(0, len(tokens), step_size):
+        for layer_model, layer_cache in caches:
+            layer_model(mx.array(tokens[start : start + step_size])[None], cache=layer_cache)
+            mx.eval([c.state for c in layer_cache])
+        mx.clear_cache()
+        yield min(start + step_size, len(tokens))
+
+
+def prefill(
+    model: Any,
+    cache: List[Any],
+    tokens: List[int],
+    step_size: int = 2048,
+    draft_model: Optional[Any] = None,
+) -> None:
+    """Process tokens into a prompt cache without sampling.
+
+    Args:
+        model: Loaded MLX language model.
+        cache: Prompt cache to update in place.
+        tokens: Token ids to process.
+        step_size: Maximum tokens per forward pass.
+        draft_model: Draft model whose layers follow the model's in ``cache``.
+    """
+    for _ in prefill_steps(model, cache, tokens, step_size, draft_model):
+        pass
+
+
+class PrefillProgress(NamedTuple):
+    """Prompt tokens in the cache after a prefill chunk, out of the whole prompt."""
+
+    processed: int
+    total: int
+
+
+class _CacheEntry:
+    """A prompt cache together with the tokens it has processed."""
+
+    def __init__(self, tokens: List[int], cache: List[Any], namespace: str = "") -> None:
+        self.tokens = tokens
+        self.cache = cache
+        self.namespace = namespace
+
+
+class MLXPromptCache:
+    """Pool of reusable prompt caches for one model.
+
+    Each entry holds a KV cache and the token ids it contains. ``fetch`` checks
+    out the entry sharing the longest prefix with the new prompt, trims it back
+    to that prefix and returns the tokens still to be prefilled. ``store`` puts
+    the cache back once generation is done, so concurrent requests never share
+    a cache that is being written to.
+
+    Entries are only reused within the same ``namespace``; callers put caches
+    computed with different weights (e.g. different LoRA adapters) in
+    different namespaces.
+
+    With a ``draft_model``, each cache holds the model's layers followed by the
+    draft model's layers, as expected by mlx-lm speculative decoding.
+
+    With ``max_kv_size`` set, new caches are rotating caches that keep the
+    first ``sink_tokens`` tokens (attention sinks, e.g. the system prompt) and
+    a window of the most recent tokens, so their memory never grows past
+    ``max_kv_size`` tokens. A cache that has rotated can still be extended but
+    no longer trimmed, so callers store a copy taken before generation (see
+    ``copy_cache``): the next turn re-renders the reply anyway.
+
+    With ``disk_dir`` set, ``fetch_prefix`` persists the KV state of shared
+    prefixes as ``.safetensors`` files keyed by ``model_key`` and the prefix
+    token hash (and namespace), and loads them back on later misses.
+
+    Example:
+        >>> pool = MLXPromptCache(model, max_entries=1)
+        >>> cache, suffix = pool.fetch(tokens)
+        >>> # ... generate with prompt=suffix, prompt_cache=cache ...
+        >>> pool.store(tokens + generated, cache)
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        max_entries: int = 1,
+        disk_dir: Optional[str] = None,
+        model_key: str = "",
+        draft_model: Optional[Any] = None,
+        max_kv_size: Optional[int] = None,
+        sink_tokens: int = 4,
+        prefill_step_size: int = 2048,
+    ) -> None:
+        """Initialize prompt cache pool.
+
+        Args:
+            model: Loaded MLX language model.
+            max_entries: Maximum number of caches (conversations) kept.
+            disk_dir: Directory for persisted prefix caches (None disables).
+            model_key: Identity of model weights and tokenizer.
+            draft_model: Optional draft model for speculative decoding.
+            max_kv_size: Maximum tokens per layer cache (None for unbounded caches).
+            sink_tokens: Leading tokens a bounded cache never evicts.
+            prefill_step_size: Maximum tokens per forward pass when prefilling prefixes.
+        """
+        self.model = model
+        self.draft_model = draft_model
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.model_key = model_key
+        self.max_kv_size = max_kv_size
+        self.sink_tokens = sink_tokens
+        self.prefill_step_size = prefill_step_size
+        self._entries: List[_CacheEntry] = []
+        self._lock = threading.Lock()
+
+    def _make_cache(self) -> List[Any]:
+        """Create an empty cache for the model (and draft model)."""
+        if self.max_kv_size is not None and not hasattr(self.model, "make_cache"):
+            cache = [
+                RotatingKVCache(max_size=self.max_kv_size, keep=self.sink_tokens)
+                for _ in self.model.layers
+            ]
+        else:
+            cache = make_prompt_cache(self.model)
+        if self.draft_model is not None:
+            cache += make_prompt_cache(self.draft_model)
+        return cache
+
+    def fetch(self, tokens: List[int], namespace: str = "") -> Tuple[List[Any], List[int]]:
+        """Check out the cache that best matches a prompt.
+
+        At least one prompt token is always left unprocessed, since generation
+        needs the logits of the last prompt token.
+
+        Args:
+            tokens: Full prompt token ids.
+            namespace: Only entries stored under this namespace are reused.
+
+        Returns:
+            Tuple of (prompt cache, prompt tokens still to be processed).
+        """
+        with self._lock:
+            best_index, best_prefix = -1, 0
+            for index, entry in enumerate(self._entries):
+                if entry.namespace != namespace:
+                    continue
+                prefix = common_prefix_length(entry.tokens, tokens)
+                if prefix > best_prefix:
+                    best_index, best_prefix = index, prefix
+
+            if best_index < 0:
+                return self._make_cache(), tokens
+
+            entry = self._entries.pop(best_index)
+
+        # Layers can hold different token counts (e.g. draft model layers)
+        prefix = min(best_prefix, len(tokens) - 1)
+        excess = [getattr(layer_cache, "offset", prefix) - prefix for layer_cache in entry.cache]
+        if any(excess):
+            if not can_trim_prompt_cache(entry.cache):
+                logger.debug("prefix=<%d> | prompt cache not trimmable, rebuilding", prefix)
+                return self._make_cache(), tokens
+            for layer_cache, num_trim in zip(entry.cache, excess):
+                if num_trim > 0:
+                    layer_cache.trim(num_trim)
+
+        logger.debug("reused=<%d>, total=<%d> | prompt cache hit", prefix, len(tokens))
+        return entry.cache, tokens[prefix:]
+
+    def store(self, tokens: List[int], cache: List[Any], namespace: str = "") -> None:
+        """Return a cache to the pool.
+
+        Only the tokens actually processed into the cache are recorded, so
+        callers can pass the full prompt plus generated tokens.
+
+        Args:
+            tokens: Tokens fed to the model, in order.
+            cache: Prompt cache previously returned by ``fetch``.
+            namespace: Namespace the cache was fetched from.
+        """
+        if self.max_entries <= 0:
+            return
+
+        offset = cache_offset(cache)
+        if offset is None or offset > len(tokens):
+            return
+
+        entry = _CacheEntry(list(tokens[:offset]), cache, namespace)
+        with self._lock:
+            self._entries.append(entry)
+            while len(self._entries) > self.max_entries:
+                self._entries.pop(0)
+
+    def _prefix_path(self, tokens: List[int], namespace: str = "") -> Path:
+        """File holding the persisted cache for a token prefix."""
+        digest = hashlib.sha256(self.model_key.encode("utf-8"))
+        if namespace:
+            digest.update(namespace.encode("utf-8"))
+        digest.update(json.dumps(tokens).encode("utf-8"))
+        return Path(self.disk_dir or ".") / f"{digest.hexdigest()[:32]}.safetensors"
+
+    def fetch_prefix(self, tokens: List[int], namespace: str = "") -> Tuple[List[Any], bool]:
+        """Get a cache holding exactly ``tokens``, using the disk tier.
+
+        Loads the persisted cache for this prefix if present, otherwise
+        prefills a fresh cache and saves it for the next process.
+
+        Args:
+            tokens: Shared prefix token ids (e.g. system prompt + tools).
+            namespace: Namespace of the weights the prefix is computed with.
+
+        Returns:
+            Tuple of (prompt cache containing the prefix, whether it was loaded from disk).
+        """
+        path = self._prefix_path(tokens, namespace)
+
+        if path.exists():
+            try:
+                cache, metadata = load_prompt_cache(str(path), return_metadata=True)
+                if int(metadata.get("num_tokens", -1)) == len(tokens):
+                    logger.debug("path=<%s>, tokens=<%d> | loaded prefix cache", path, len(tokens))
+                    return cache, True
+                logger.warning("path=<%s> | prefix cache does not match, rebuilding", path)
+            except Exception as e:
+                logger.warning("path=<%s> | failed to load prefix cache: %s", path, e)
+
+        cache = self._make_cache()
+        prefill(self.model, cache, tokens, self.prefill_step_size, self.draft_model)
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp.safetensors")
+            save_prompt_cache(
+                str(tmp_path),
+                cache,
+                metadata={"model_key": self.model_key, "num_tokens": str(len(tokens))},
+            )
+            os.replace(tmp_path, path)
+            logger.debug("path=<%s>, tokens=<%d> | saved prefix cache", path, len(tokens))
+        except Exception as e:
+            logger.warning("path=<%s> | failed to save prefix cache: %s", path, e)
+
+        return cache, False
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the pooled KV caches, in bytes."""
+        with self._lock:
+            return sum(cache_nbytes(entry.cache) for entry in self._entries)
+
+    def clear(self) -> None:
+        """Drop all cached entries."""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,228 @@
+"""Prompt-lookup speculative decoding for MLX models.
+
+Agents copy a lot of text out of their context: tool arguments echoing earlier
+tool results, file paths, JSON keys, quoted user text. Prompt lookup proposes
+a continuation by matching the last few generated tokens against earlier
+occurrences in the prompt and prior output, then verifies the whole proposal
+with a single forward pass of the model. Unlike draft-model speculative
+decoding it needs no second model and no extra memory.
+
+Greedy output is identical to plain decoding; proposals only change how many
+tokens each forward pass produces.
+"""
+
+import logging
+import time
+from typing import Any, Callable, Dict, Generator, List, Optional, Tuple
+
+import mlx.core as mx
+from mlx_lm.generate import (
+    GenerationResponse,
+    generation_stream,
+    maybe_quantize_kv_cache,
+    wired_limit,
+)
+from mlx_lm.models.cache import make_prompt_cache, trim_prompt_cache
+
+from strands_mlx.mlx_prompt_cache import prefill
+
+logger = logging.getLogger(__name__)
+
+
+class NGramIndex:
+    """Index from recent n-grams of a token sequence to where they were last continued.
+
+    Each n-gram (up to ``max_ngram_size`` tokens) is registered once the token
+    following it is known, so a lookup of the current tail never matches itself.
+    Lookups prefer the longest matching n-gram and its most recent occurrence.
+    """
+
+    def __init__(self, tokens: List[int], max_ngram_size: int = 3) -> None:
+        """Initialize n-gram index.
+
+        Args:
+            tokens: Initial token sequence (usually the full prompt).
+            max_ngram_size: Longest n-gram matched against the sequence tail.
+        """
+        self.max_ngram_size = max_ngram_size
+        self.tokens: List[int] = []
+        self._continuations: Dict[Tuple[int, ...], int] = {}
+        self.extend(tokens)
+
+    def extend(self, tokens: List[int]) -> None:
+        """Append tokens to the indexed sequence."""
+        for token in tokens:
+            position = len(self.tokens)
+            for n in range(1, min(self.max_ngram_size, position) + 1):
+                self._continuations[tuple(self.tokens[position - n :])] = position
+            self.tokens.append(token)
+
+    def propose(self, num_tokens: int) -> List[int]:
+        """Propose up to ``num_tokens`` tokens continuing the current sequence.
+
+        Args:
+            num_tokens: Maximum number of tokens to propose.
+
+        Returns:
+            Proposed tokens, empty when the tail was never seen before.
+        """
+        if num_tokens <= 0:
+            return []
+        for n in range(min(self.max_ngram_size, len(self.tokens)), 0, -1):
+            position = self._continuations.get(tuple(self.tokens[-n:]))
+            if position is not None:
+                return self.tokens[position : position + num_tokens]
+        return []
+
+
+def prompt_lookup_generate_step(
+    prompt: List[int],
+    model: Any,
+    *,
+    context: List[int],
+    num_draft_tokens: int = 10,
+    max_ngram_size: int = 3,
+    max_tokens: int = 256,
+    sampler: Optional[Callable[[mx.array], mx.array]] = None,
+    prompt_cache: Optional[List[Any]] = None,
+    prefill_step_size: int = 2048,
+    kv_bits: Optional[int] = None,
+    kv_group_size: int = 64,
+    quantized_kv_start: int = 0,
+    stats: Optional[Dict[str, int]] = None,
+) -> Generator[Tuple[int, mx.array, bool], None, None]:
+    """Generate tokens, verifying n-gram proposals from the context in one forward pass.
+
+    Mirrors ``mlx_lm.generate.speculative_generate_step`` with the draft model
+    replaced by an :class:`NGramIndex` lookup.
+
+    Args:
+        prompt: Prompt tokens not yet in ``prompt_cache``.
+        model: Loaded MLX language model.
+        context: Full prompt tokens, searched for proposals.
+        num_draft_tokens: Maximum tokens proposed per forward pass.
+        max_ngram_size: Longest n-gram matched against the generated tail.
+        max_tokens: Maximum tokens to generate.
+        sampler: Token sampler. Defaults to greedy.
+        prompt_cache: Trimmable prompt cache, updated in place.
+        prefill_step_size: Maximum prompt tokens per prefill forward pass.
+        kv_bits: Bits to quantize the KV cache to (None keeps it unquantized).
+        kv_group_size: Group size for KV cache quantization.
+        quantized_kv_start: Cache length at which quantization starts.
+        stats: Updated with the number of proposed tokens under ``draft_tokens_proposed``.
+
+    Yields:
+        One token, its log probabilities, and whether it came from a proposal.
+    """
+    sampler = sampler or (lambda x: mx.argmax(x, axis=-1))
+    cache = prompt_cache if prompt_cache is not None else make_prompt_cache(model)
+    index = NGramIndex(context, max_ngram_size)
+    if stats is not None:
+        stats.setdefault("draft_tokens_proposed", 0)
+
+    def _quantize() -> None:
+        maybe_quantize_kv_cache(cache, quantized_kv_start, kv_group_size, kv_bits)
+
+    with mx.stream(generation_stream):
+        prefill(model, cache, prompt[:-1], prefill_step_size)
+        _quantize()
+    y = prompt[-1:]
+
+    ntoks = 0
+    num_draft = 0
+    num_accept = 0
+    try:
+        while True:
+            draft = index.propose(min(max_tokens - ntoks - 1, num_draft_tokens))
+            num_draft = len(draft)
+            if stats is not None:
+                stats["draft_tokens_proposed"] += num_draft
+
+            with mx.stream(generation_stream):
+                logits = model(mx.array(y + draft, mx.uint32)[None], cache=cache)[0]
+                _quantize()
+                logprobs = logits - mx.logsumexp(logits, axis=-1, keepdims=True)
+                tokens = sampler(logprobs)
+            mx.eval(tokens, logprobs)
+            tokens = tokens.tolist()
+
+            num_accept = 0
+            while num_accept < num_draft and tokens[num_accept] == draft[num_accept]:
+                num_accept += 1
+            accepted = tokens[: num_accept + 1]
+            index.extend(accepted)
+
+            for i, token in enumerate(accepted):
+                ntoks += 1
+                yield token, logprobs[i], i < num_accept
+                if ntoks == max_tokens:
+                    return
+
+            # Drop the rejected proposals; the last sampled token is fed next step
+            trim_prompt_cache(cache, num_draft - num_accept)
+            num_draft = num_accept = 0
+            y = accepted[-1:]
+    finally:
+        trim_prompt_cache(cache, num_draft - num_accept)
+
+
+def stream_prompt_lookup(
+    model: Any,
+    tokenizer: Any,
+    prompt: List[int],
+    *,
+    context: List[int],
+    max_tokens: int = 256,
+    **kwargs: Any,
+) -> Generator[GenerationResponse, None, None]:
+    """Stream generation responses using prompt-lookup decoding.
+
+    Drop-in counterpart of ``mlx_lm.stream_generate`` for token prompts.
+
+    Args:
+        model: Loaded MLX language model.
+        tokenizer: mlx-lm TokenizerWrapper.
+        prompt: Prompt tokens not yet in the prompt cache.
+        context: Full prompt tokens, searched for proposals.
+        max_tokens: Maximum tokens to generate.
+        **kwargs: Passed to :func:`prompt_lookup_generate_step`.
+
+    Yields:
+        Generation responses, in the format of mlx_lm.stream_generate.
+    """
+    detokenizer = tokenizer.detokenizer
+    token_generator = prompt_lookup_generate_step(
+        prompt, model, context=context, max_tokens=max_tokens, **kwargs
+    )
+    with wired_limit(model, [generation_stream]):
+        tic = time.perf_counter()
+        prompt_tps = 0.0
+        for n, (token, logprobs, from_draft) in enumerate(token_generator):
+            if n == 0:
+                prompt_tps = len(prompt) / (time.perf_counter() - tic)
+                tic = time.perf_counter()
+
+            finish_reason = None
+            if token in tokenizer.eos_token_ids:
+                finish_reason = "stop"
+            else:
+                detokenizer.add_token(token)
+                if n + 1 == max_tokens:
+                    finish_reason = "length"
+            if finish_reason:
+                detokenizer.finalize()
+
+            yield GenerationResponse(
+                text=detokenizer.last_segment,
+                token=token,
+                logprobs=logprobs,
+                from_draft=from_draft,
+                prompt_tokens=len(prompt),
+                prompt_tps=prompt_tps,
+                generation_tokens=n + 1,
+                generation_tps=(n + 1) / max(time.perf_counter() - tic, 1e-9),
+                peak_memory=mx.get_peak_memory() / 1e9,
+                finish_reason=finish_reason,
+            )
+            if finish_reason:
+                break
@@ -0,0 +1,100 @@
+"""Reasoning (``<think>...</think>``) handling for MLX generation.
+
+Reasoning models such as Qwen3 wrap their chain of thought in think tokens.
+The stream splits it from the answer by token id, since the think markers are
+single special tokens, and ``ThinkingBudgetProcessor`` bounds how long a model
+may think: once the budget is spent, every token but the closing think token
+is masked out, so the model has to move on to its answer.
+"""
+
+from typing import Any, List, Optional, Sequence, Tuple
+
+import mlx.core as mx
+
+from strands_mlx.mlx_prompt_cache import common_prefix_length
+
+
+def think_token_ids(tokenizer: Any) -> Optional[Tuple[int, int]]:
+    """Token ids of the opening and closing think tokens, if the tokenizer has them.
+
+    Args:
+        tokenizer: mlx-lm TokenizerWrapper.
+
+    Returns:
+        ``(think_start_id, think_end_id)``, or None for models without think tokens.
+    """
+    if not getattr(tokenizer, "has_thinking", False):
+        return None
+    ids = tokenizer.convert_tokens_to_ids([tokenizer.think_start, tokenizer.think_end])
+    if any(token_id is None for token_id in ids):
+        return None
+    return ids[0], ids[1]
+
+
+def reasoning_open(tokens: Sequence[int], think_ids: Tuple[int, int]) -> bool:
+    """Whether a prompt ends inside a think block, e.g. a template that opens it for the model.
+
+    Args:
+        tokens: Prompt token ids.
+        think_ids: Opening and closing think token ids.
+
+    Returns:
+        True if the last think token in the prompt opens a block.
+    """
+    think_start, think_end = think_ids
+    for token in reversed(tokens):
+        if token == think_start:
+            return True
+        if token == think_end:
+            return False
+    return False
+
+
+class ThinkingBudgetProcessor:
+    """mlx-lm logits processor forcing the closing think token after a reasoning budget.
+
+    Create one per generation. The reasoning state after every generated token
+    is kept, so speculative decoding can roll back rejected draft tokens by
+    passing a shorter token history.
+    """
+
+    def __init__(self, think_ids: Tuple[int, int], budget: int, in_reasoning: bool) -> None:
+        """Initialize logits processor.
+
+        Args:
+            think_ids: Opening and closing think token ids.
+            budget: Reasoning tokens allowed before the think block is closed.
+            in_reasoning: Whether the prompt already opened a think block.
+        """
+        self.think_start, self.think_end = think_ids
+        self.budget = budget
+        self._offset: Optional[int] = None
+        self._tokens: List[int] = []
+        # (inside a think block, reasoning tokens generated) after each generated token
+        self._states: List[Tuple[bool, int]] = [(in_reasoning, 0)]
+
+    def __call__(self, tokens: mx.array, logits: mx.array) -> mx.array:
+        # The first call sees only prompt tokens; later calls append generated ones
+        if self._offset is None:
+            self._offset = tokens.shape[-1]
+        generated = tokens[self._offset :].tolist()
+
+        keep = common_prefix_length(self._tokens, generated)
+        del self._tokens[keep:]
+        del self._states[keep + 1 :]
+        for token in generated[keep:]:
+            in_reasoning, spent = self._states[-1]
+            if token == self.think_start:
+                in_reasoning = True
+            elif token == self.think_end:
+                in_reasoning = False
+            elif in_reasoning:
+                spent += 1
+            self._tokens.append(token)
+            self._states.append((in_reasoning, spent))
+
+        in_reasoning, spent = self._states[-1]
+        if not in_reasoning or spent < self.budget:
+            return logits
+        forced = mx.arange(logits.shape[-1]) == self.think_end
+        return mx.where(forced, logits, -mx.inf)
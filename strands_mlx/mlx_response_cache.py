@@ -0,0 +1,249 @@
+"""Exact-match response cache for MLX models.
+
+Evaluation and regression jobs send the same deterministic prompts over and
+over. ``MLXResponseCache`` records the stream events of every completed
+generation under a key of the model, adapter, prompt tokens and sampling
+settings. When the same request comes in again, it replays those events,
+tool-use blocks and usage metadata included, so agents see the same response
+without running the model.
+
+Entries are kept in an in-memory LRU tier and, optionally, in an SQLite file
+that later processes reuse. Concurrent identical requests are coalesced: the
+first one generates, and the others wait for its events and replay them.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+Event = Dict[str, Any]
+
+
+def response_cache_key(
+    model_key: str, adapter_key: str, prompt_tokens: List[int], settings: Dict[str, Any]
+) -> str:
+    """Hash identifying a request's response.
+
+    Args:
+        model_key: Identity of the model weights and tokenizer.
+        adapter_key: Identity of the LoRA adapter ("" for the base model).
+        prompt_tokens: Token ids of the rendered prompt.
+        settings: Sampling parameters and other options that change the output.
+
+    Returns:
+        Hex digest of the request.
+    """
+    digest = hashlib.sha256()
+    for part in (
+        model_key,
+        adapter_key,
+        json.dumps(prompt_tokens),
+        json.dumps(settings, sort_keys=True, default=str),
+    ):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class MLXResponseCache:
+    """Recorded stream events of completed generations, by request key.
+
+    Events are stored as JSON, so every replay hands out fresh event objects.
+    Only generations that ran to their final metadata event are recorded;
+    failed, cancelled or abandoned streams are not.
+
+    Example:
+        >>> cache = MLXResponseCache(max_entries=256, path="~/.cache/strands-mlx/responses.db")
+        >>> async for event in cache.stream(key, lambda: model_stream(request)):
+        ...     ...
+    """
+
+    def __init__(self, max_entries: int = 128, path: Optional[str] = None) -> None:
+        """Initialize response cache.
+
+        Args:
+            max_entries: Responses kept in memory, least recently used evicted first.
+            path: SQLite file persisting responses across processes (None disables).
+        """
+        self.max_entries = max_entries
+        self.path = path
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._pending: Dict[str, "Future[Optional[str]]"] = {}
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses"
+                " (key TEXT PRIMARY KEY, events TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[List[Event]]:
+        """Recorded events of a request, from memory or the SQLite file.
+
+        Args:
+            key: Request key (see ``response_cache_key``).
+
+        Returns:
+            Stream events, or None on a miss.
+        """
+        data = self._get(key)
+        return json.loads(data) if data is not None else None
+
+    def put(self, key: str, events: List[Event]) -> None:
+        """Record the events of a completed generation.
+
+        Args:
+            key: Request key (see ``response_cache_key``).
+            events: Stream events, in order.
+        """
+        self._put(key, json.dumps(events))
+
+    def _get(self, key: str) -> Optional[str]:
+        """Serialized events of a request."""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                return data
+            if self._db is None:
+                return None
+            try:
+                row = self._db.execute(
+                    "SELECT events FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning("path=<%s> | failed to read response cache: %s", self.path, e)
+                return None
+            if row is None:
+                return None
+            self._remember(key, row[0])
+            return row[0]
+
+    def _put(self, key: str, data: str) -> None:
+        """Store serialized events in both tiers."""
+        with self._lock:
+            self._remember(key, data)
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, events, created) VALUES (?, ?, ?)",
+                    (key, data, time.time()),
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning("path=<%s> | failed to write response cache: %s", self.path, e)
+
+    def _remember(self, key: str, data: str) -> None:
+        """Put serialized events in the memory tier. Called with the lock held."""
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = data
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def stream(
+        self,
+        key: str,
+        generate: Callable[[], AsyncGenerator[Event, None]],
+        check_cancelled: Optional[Callable[[], None]] = None,
+    ) -> AsyncGenerator[Event, None]:
+        """Replay a request's recorded events, or generate and record them.
+
+        While an identical request is generating, this one waits for it and replays
+        its events. If that request does not complete, the next waiter generates.
+
+        Args:
+            key: Request key (see ``response_cache_key``).
+            generate: Starts the generation on a miss.
+            check_cancelled: Raises once the request is cancelled; checked while waiting
+                for an identical request.
+
+        Yields:
+            Stream events.
+        """
+        start_time = time.perf_counter()
+        while True:
+            # Reads go through a thread, since the SQLite tier may wait on another process
+            data = await asyncio.to_thread(self._get, key)
+            if data is not None:
+                logger.debug("key=<%s> | response cache hit", key[:16])
+                for event in _replayed(data, start_time):
+                    yield event
+                return
+
+            with self._lock:
+                pending = self._pending.get(key)
+                if pending is None:
+                    pending = self._pending[key] = Future()
+                    break
+
+            logger.debug("key=<%s> | waiting for identical request", key[:16])
+            waiter = asyncio.wrap_future(pending)
+            while not waiter.done():
+                if check_cancelled is not None:
+                    check_cancelled()
+                await asyncio.wait([waiter], timeout=0.1)
+            data = waiter.result()
+            if data is not None:
+                for event in _replayed(data, start_time):
+                    yield event
+                return
+
+        recorded: List[str] = []
+        data = None
+        events = generate()
+        try:
+            async for event in events:
+                # Progress of this request's prefill does not belong to the response
+                if "prefillProgress" not in event:
+                    recorded.append(json.dumps(event))
+                yield event
+            data = f"[{','.join(recorded)}]"
+            await asyncio.to_thread(self._put, key, data)
+            logger.debug("key=<%s>, events=<%d> | response cached", key[:16], len(recorded))
+        finally:
+            await events.aclose()
+            with self._lock:
+                del self._pending[key]
+            pending.set_result(data)
+
+    def clear(self) -> None:
+        """Drop all recorded responses, in memory and on disk."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def close(self) -> None:
+        """Close the SQLite file."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def _replayed(data: str, start_time: float) -> List[Event]:
+    """Recorded events, with the metadata latency of the replay."""
+    events = json.loads(data)
+    for event in events:
+        metrics = event.get("metadata", {}).get("metrics")
+        if metrics is not None:
+            metrics["latencyMs"] = int((time.perf_counter() - start_time) * 1000)
+    return events
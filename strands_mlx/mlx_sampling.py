@@ -0,0 +1,272 @@
+"""N-best sampling and candidate scoring from a shared prefill.
+
+Self-consistency voting and best-of-n planning draw several completions of
+the same prompt. Running the request n times prefills the prompt n times;
+here it is prefilled once, its KV cache is copied into a batch of n rows, and
+all samples are decoded together, one forward pass per step. Decode is
+memory-bandwidth bound, so n samples cost little more per step than one.
+
+Models whose caches cannot be batched (rotating or quantized KV caches)
+decode the samples one after another from copies of the prefilled cache,
+which still saves n - 1 prefills.
+
+Scoring candidate continuations works the same way: the prompt is prefilled
+once and the candidates, right-padded to a common length, are run through
+one batched forward pass on copies of its KV cache. Padding sits after every
+real token, so causal attention keeps it from changing any score.
+"""
+
+import logging
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import mlx.core as mx
+from mlx_lm.generate import generate_step, generation_stream
+from mlx_lm.models.cache import KVCache
+
+from strands_mlx.mlx_batch_engine import batch_rows
+from strands_mlx.mlx_prompt_cache import copy_cache, prefill_steps
+
+logger = logging.getLogger(__name__)
+
+# Token ids, summed log-probabilities and finish reason of one sample
+_Sample = Tuple[List[int], float, str]
+
+
+class Completion(NamedTuple):
+    """One sampled completion."""
+
+    text: str
+    tokens: List[int]
+    # Sum of the model's log-probabilities of the generated tokens, end of sequence included
+    logprob: float
+    finish_reason: str
+
+
+class CandidateScore(NamedTuple):
+    """Log-probability of a candidate continuation."""
+
+    text: str
+    tokens: List[int]
+    token_logprobs: List[float]
+    logprob: float
+
+
+def sample_n(
+    model: Any,
+    tokenizer: Any,
+    prompt_cache: List[Any],
+    prompt_suffix: List[int],
+    n: int,
+    max_tokens: int,
+    sampler: Callable[[mx.array], mx.array],
+    prefill_step_size: int = 2048,
+    check_cancelled: Optional[Callable[[], None]] = None,
+    kv_options: Optional[Dict[str, Any]] = None,
+) -> List[Completion]:
+    """Prefill a prompt once and sample ``n`` completions of it.
+
+    Args:
+        model: Loaded MLX language model.
+        tokenizer: mlx-lm TokenizerWrapper.
+        prompt_cache: Cache holding the prompt tokens before ``prompt_suffix``. Afterwards
+            it holds every prompt token but the last, and is not modified by decoding.
+        prompt_suffix: Prompt tokens still to be processed (at least one).
+        n: Number of completions.
+        max_tokens: Maximum tokens per completion.
+        sampler: Token sampler, applied to a batch of log-probabilities.
+        prefill_step_size: Maximum prompt tokens per prefill forward pass.
+        check_cancelled: Raises once the request is cancelled; checked after every
+            prefill chunk and decode step.
+        kv_options: KV cache quantization options (``kv_bits`` etc.).
+
+    Returns:
+        Completions in sampling order.
+    """
+    check_cancelled = check_cancelled or (lambda: None)
+    kv_options = kv_options or {}
+    with mx.stream(generation_stream):
+        for _ in prefill_steps(model, prompt_cache, prompt_suffix[:-1], prefill_step_size):
+            check_cancelled()
+
+    if kv_options.get("kv_bits") is None and all(type(c) is KVCache for c in prompt_cache):
+        samples = _decode_batch(
+            model,
+            tokenizer,
+            prompt_cache,
+            prompt_suffix[-1],
+            n,
+            max_tokens,
+            sampler,
+            check_cancelled,
+        )
+    else:
+        logger.debug("cache cannot be batched, decoding %d samples sequentially", n)
+        samples = [
+            _decode_one(
+                model,
+                tokenizer,
+                copy_cache(prompt_cache),
+                prompt_suffix[-1],
+                max_tokens,
+                sampler,
+                check_cancelled,
+                kv_options,
+            )
+            for _ in range(n)
+        ]
+
+    return [
+        Completion(
+            text=tokenizer.decode(tokens[:-1] if reason == "stop" else tokens),
+            tokens=tokens,
+            logprob=logprob,
+            finish_reason=reason,
+        )
+        for tokens, logprob, reason in samples
+    ]
+
+
+def _decode_batch(
+    model: Any,
+    tokenizer: Any,
+    prompt_cache: List[Any],
+    last_token: int,
+    n: int,
+    max_tokens: int,
+    sampler: Callable[[mx.array], mx.array],
+    check_cancelled: Callable[[], None],
+) -> List[_Sample]:
+    """Decode ``n`` samples as rows of one batch, dropping rows as they finish."""
+    cache = [batch_rows(c, n) for c in prompt_cache]
+    tokens: List[List[int]] = [[] for _ in range(n)]
+    logprob_sums = [0.0] * n
+    reasons: List[Optional[str]] = [None] * n
+    active = list(range(n))
+    inputs = mx.array([[last_token]] * n)
+
+    with mx.stream(generation_stream):
+        while active:
+            logits = model(inputs, cache=cache)[:, -1, :].astype(mx.float32)
+            logprobs = logits - mx.logsumexp(logits, axis=-1, keepdims=True)
+            sampled = sampler(logprobs)
+            picked = mx.take_along_axis(logprobs, sampled[:, None], axis=-1)[:, 0]
+            mx.eval(sampled, picked)
+            check_cancelled()
+
+            for index, token, logprob in zip(active, sampled.tolist(), picked.tolist()):
+                tokens[index].append(token)
+                logprob_sums[index] += logprob
+                if token in tokenizer.eos_token_ids:
+                    reasons[index] = "stop"
+                elif len(tokens[index]) >= max_tokens:
+                    reasons[index] = "length"
+
+            keep = [row for row, index in enumerate(active) if reasons[index] is None]
+            if len(keep) < len(active):
+                if keep:
+                    keep_rows = mx.array(keep, mx.int32)
+                    for batch_cache in cache:
+                        batch_cache.filter(keep_rows)
+                active = [active[row] for row in keep]
+            inputs = mx.array([[tokens[index][-1]] for index in active])
+
+    del cache
+    mx.clear_cache()
+    return [(tokens[i], logprob_sums[i], reasons[i] or "length") for i in range(n)]
+
+
+def _decode_one(
+    model: Any,
+    tokenizer: Any,
+    cache: List[Any],
+    last_token: int,
+    max_tokens: int,
+    sampler: Callable[[mx.array], mx.array],
+    check_cancelled: Callable[[], None],
+    kv_options: Dict[str, Any],
+) -> _Sample:
+    """Decode one sample from its own copy of the prefilled cache."""
+    tokens: List[int] = []
+    logprob_sum = 0.0
+    reason = "length"
+    for token, logprobs in generate_step(
+        mx.array([last_token]),
+        model,
+        max_tokens=max_tokens,
+        sampler=sampler,
+        prompt_cache=cache,
+        **kv_options,
+    ):
+        check_cancelled()
+        token = token if isinstance(token, int) else token.item()
+        tokens.append(token)
+        logprob_sum += logprobs[token].item()
+        if token in tokenizer.eos_token_ids:
+            reason = "stop"
+            break
+    return tokens, logprob_sum, reason
+
+
+def score_continuations(
+    model: Any,
+    prompt_cache: List[Any],
+    prompt_suffix: List[int],
+    continuations: List[List[int]],
+    prefill_step_size: int = 2048,
+    check_cancelled: Optional[Callable[[], None]] = None,
+) -> List[List[float]]:
+    """Prefill a prompt once and score token continuations of it in one forward pass.
+
+    Args:
+        model: Loaded MLX language model.
+        prompt_cache: Cache holding the prompt tokens before ``prompt_suffix``. Afterwards
+            it holds every prompt token but the last, and is not modified by scoring.
+        prompt_suffix: Prompt tokens still to be processed (at least one).
+        continuations: Token ids of each continuation.
+        prefill_step_size: Maximum prompt tokens per prefill forward pass.
+        check_cancelled: Raises once the request is cancelled; checked after every
+            prefill chunk.
+
+    Returns:
+        Log-probability of every token of each continuation, given the prompt and
+        the tokens before it.
+    """
+    check_cancelled = check_cancelled or (lambda: None)
+    with mx.stream(generation_stream):
+        for _ in prefill_steps(model, prompt_cache, prompt_suffix[:-1], prefill_step_size):
+            check_cancelled()
+
+    scored = [index for index, tokens in enumerate(continuations) if tokens]
+    scores: List[List[float]] = [[] for _ in continuations]
+    if not scored:
+        return scores
+
+    # Each row feeds the last prompt token and all but the last continuation token, and
+    # is right-padded; the logits at each position predict the next continuation token
+    length = max(len(continuations[index]) for index in scored)
+    rows = [[prompt_suffix[-1]] + continuations[index][:-1] for index in scored]
+    inputs = mx.array([row + [0] * (length - len(row)) for row in rows])
+    targets = mx.array(
+        [continuations[index] + [0] * (length - len(continuations[index])) for index in scored]
+    )
+
+    with mx.stream(generation_stream):
+        if all(type(c) is KVCache for c in prompt_cache):
+            logits = model(inputs, cache=[batch_rows(c, len(scored)) for c in prompt_cache])
+        else:
+            # Caches the batch cache cannot hold are scored one row at a time
+            logits = mx.concatenate(
+                [model(inputs[i : i + 1], cache=copy_cache(prompt_cache)) for i in range(len(rows))]
+            )
+        # Scores are compared across candidates, so they are computed in full precision
+        logits = logits.astype(mx.float32)
+        logprobs = logits - mx.logsumexp(logits, axis=-1, keepdims=True)
+        picked = mx.take_along_axis(logprobs, targets[..., None], axis=-1)[..., 0]
+        mx.eval(picked)
+    check_cancelled()
+
+    for index, values in zip(scored, picked.tolist()):
+        scores[index] = values[: len(continuations[index])]
+    del logits, logprobs
+    mx.clear_cache()
+    return scores
@@ -0,0 +1,152 @@
+"""Stop sequences for streamed MLX generation.
+
+Stop strings are matched against the detokenized text and token-id sequences
+against the generated token ids, both incrementally with Aho-Corasick
+automata: each new token costs time proportional to its own length, however
+many stop sequences there are. Text that could be the beginning of a stop
+string is held back until it either completes the match (and is dropped) or
+can no longer match (and is released), so a stop string never leaks into
+the stream.
+
+- Aho-Corasick: https://dl.acm.org/doi/10.1145/360825.360855
+"""
+
+from collections import deque
+from typing import Hashable, List, Sequence, Tuple, Union
+
+StopSequence = Union[str, Sequence[int]]
+
+
+class AhoCorasick:
+    """Multi-pattern matcher over a stream of symbols (characters or token ids)."""
+
+    def __init__(self, patterns: Sequence[Sequence[Hashable]]) -> None:
+        """Initialize automaton.
+
+        Args:
+            patterns: Non-empty symbol sequences to look for.
+        """
+        self._next: List[dict] = [{}]
+        self._fail: List[int] = [0]
+        self._depth: List[int] = [0]
+        self._match: List[int] = [0]
+
+        for pattern in patterns:
+            state = 0
+            for symbol in pattern:
+                if symbol not in self._next[state]:
+                    self._next.append({})
+                    self._fail.append(0)
+                    self._depth.append(self._depth[state] + 1)
+                    self._match.append(0)
+                    self._next[state][symbol] = len(self._next) - 1
+                state = self._next[state][symbol]
+            self._match[state] = len(pattern)
+
+        # Breadth-first so failure links always point at already finished states
+        queue = deque(self._next[0].values())
+        while queue:
+            state = queue.popleft()
+            for symbol, child in self._next[state].items():
+                fail = self._fail[state]
+                while fail and symbol not in self._next[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._next[fail].get(symbol, 0)
+                self._match[child] = max(self._match[child], self._match[self._fail[child]])
+                queue.append(child)
+
+        self.max_length = max((len(p) for p in patterns), default=0)
+
+    def step(self, state: int, symbol: Hashable) -> int:
+        """State after reading one symbol."""
+        while state and symbol not in self._next[state]:
+            state = self._fail[state]
+        return self._next[state].get(symbol, 0)
+
+    def match_length(self, state: int) -> int:
+        """Length of the longest pattern ending at this state (0 if none)."""
+        return self._match[state]
+
+    def depth(self, state: int) -> int:
+        """Length of the longest stream suffix that is a prefix of some pattern."""
+        return self._depth[state]
+
+
+class StopSequenceMatcher:
+    """Finds stop sequences in streamed generation output.
+
+    Example:
+        >>> matcher = StopSequenceMatcher(["\\nObservation:", [151645]])
+        >>> text, stopped = matcher.feed(token, token_text)
+        >>> # ... stream ``text``; when ``stopped``, end the generation ...
+        >>> tail = matcher.flush()  # held-back text when generation ends otherwise
+    """
+
+    def __init__(self, stop: Union[StopSequence, Sequence[StopSequence]]) -> None:
+        """Initialize stop sequence matcher.
+
+        Args:
+            stop: A stop string, or a list of stop strings and/or token-id sequences.
+        """
+        if isinstance(stop, str):
+            stop = [stop]
+        strings = [s for s in stop if isinstance(s, str) and s]
+        token_sequences = [list(s) for s in stop if not isinstance(s, str) and len(s)]
+        for sequence in token_sequences:
+            if not all(isinstance(token, int) for token in sequence):
+                raise TypeError(f"stop=<{sequence}> | stop sequences must be strings or token ids")
+
+        self._text = AhoCorasick(strings)
+        self._tokens = AhoCorasick(token_sequences)
+        self._text_state = 0
+        self._token_state = 0
+        self._held = ""
+        self._recent_lengths: deque = deque(maxlen=max(self._tokens.max_length, 1))
+
+    def feed(self, token: int, text: str) -> Tuple[str, bool]:
+        """Process one generated token.
+
+        Args:
+            token: Generated token id.
+            text: Text the token added to the output.
+
+        Returns:
+            Tuple of (text safe to stream, whether a stop sequence matched).
+            On a match the returned text ends right before the stop sequence.
+        """
+        self._held += text
+        self._recent_lengths.append(len(text))
+
+        self._token_state = self._tokens.step(self._token_state, token)
+        matched = self._tokens.match_length(self._token_state)
+        if matched:
+            return self._release(len(self._held) - self._tail_length(matched)), True
+
+        offset = len(self._held) - len(text)
+        for i, char in enumerate(text):
+            self._text_state = self._text.step(self._text_state, char)
+            matched = self._text.match_length(self._text_state)
+            if matched:
+                return self._release(offset + i + 1 - matched), True
+
+        hold = max(
+            self._text.depth(self._text_state),
+            self._tail_length(self._tokens.depth(self._token_state)),
+        )
+        return self._release(len(self._held) - hold), False
+
+    def flush(self) -> str:
+        """Release held-back text once generation ended without a stop sequence."""
+        return self._release(len(self._held))
+
+    def _tail_length(self, num_tokens: int) -> int:
+        """Characters added by the last ``num_tokens`` tokens."""
+        if num_tokens <= 0:
+            return 0
+        return sum(list(self._recent_lengths)[-num_tokens:])
+
+    def _release(self, end: int) -> str:
+        """Return held text up to ``end`` and keep the rest."""
+        end = min(max(end, 0), len(self._held))
+        released, self._held = self._held[:end], self._held[end:]
+        return released
@@ -0,0 +1,146 @@
+"""Dedicated MLX worker thread.
+
+All MLX computation in the process (prefill, decode, prompt cache building)
+runs on a single worker thread. The asyncio event loop stays responsive while
+a model is generating, and Metal command streams are never driven from two
+threads at once.
+
+Results are handed back to the event loop through an asyncio queue with a
+bounded number of in-flight items: when the consumer falls behind, the worker
+blocks instead of buffering an unbounded amount of output.
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncGenerator, Callable, Iterator, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_MAX_BUFFERED = 64
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mlx-worker")
+_worker_thread: list[threading.Thread] = []
+
+_ITEM, _DONE, _ERROR = range(3)
+
+
+def _mark_worker_thread() -> None:
+    """Remember the worker thread so nested calls can run inline."""
+    if not _worker_thread:
+        _worker_thread.append(threading.current_thread())
+
+
+def in_worker() -> bool:
+    """Whether the caller is running on the MLX worker thread."""
+    return bool(_worker_thread) and threading.current_thread() is _worker_thread[0]
+
+
+def submit_to_worker(fn: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+    """Schedule a function on the MLX worker thread.
+
+    Args:
+        fn: Function to run.
+        *args: Positional arguments.
+        **kwargs: Keyword arguments.
+
+    Returns:
+        Future with the function result.
+    """
+
+    def _run() -> T:
+        _mark_worker_thread()
+        return fn(*args, **kwargs)
+
+    return _executor.submit(_run)
+
+
+def call_in_worker(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a function on the MLX worker thread and wait for the result.
+
+    Runs inline when already on the worker thread, so worker code can call
+    other worker-bound helpers without deadlocking.
+
+    Args:
+        fn: Function to run.
+        *args: Positional arguments.
+        **kwargs: Keyword arguments.
+
+    Returns:
+        Function result.
+    """
+    if in_worker():
+        return fn(*args, **kwargs)
+    return submit_to_worker(fn, *args, **kwargs).result()
+
+
+async def iterate_in_worker(
+    make_iterator: Callable[[], Iterator[T]],
+    max_buffered: int = DEFAULT_MAX_BUFFERED,
+    check_cancelled: Optional[Callable[[], None]] = None,
+) -> AsyncGenerator[T, None]:
+    """Drive a synchronous iterator on the worker thread and yield its items.
+
+    The iterator is created and advanced on the worker thread. At most
+    ``max_buffered`` items are queued for the consumer; beyond that the worker
+    waits (backpressure). If the consumer stops early, the iterator is closed
+    on the worker thread before its next item is produced.
+
+    Args:
+        make_iterator: Factory returning the iterator to drive.
+        max_buffered: Maximum items produced but not yet consumed.
+        check_cancelled: Raises once the request is cancelled. Also checked while
+            the worker waits for the consumer, so a stalled consumer cannot pin it.
+
+    Yields:
+        Items produced by the iterator.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    slots = threading.Semaphore(max(1, max_buffered))
+    stopped = threading.Event()
+
+    def _put(kind: int, value: Any) -> None:
+        loop.call_soon_threadsafe(queue.put_nowait, (kind, value))
+
+    def _produce() -> None:
+        try:
+            iterator = make_iterator()
+            try:
+                for item in iterator:
+                    while not slots.acquire(timeout=0.1):
+                        if stopped.is_set():
+                            return
+                        if check_cancelled is not None:
+                            check_cancelled()
+                    if stopped.is_set():
+                        return
+                    _put(_ITEM, item)
+            finally:
+                close = getattr(iterator, "close", None)
+                if close is not None:
+                    close()
+            _put(_DONE, None)
+        except BaseException as e:
+            try:
+                _put(_ERROR, e)
+            except RuntimeError:
+                # Event loop already closed, nobody is listening
+                logger.debug("worker error after consumer left: %s", e)
+
+    submit_to_worker(_produce)
+
+    try:
+        while True:
+            kind, value = await queue.get()
+            if kind == _DONE:
+                break
+            if kind == _ERROR:
+                raise value
+            slots.release()
+            yield value
+    finally:
+        stopped.set()
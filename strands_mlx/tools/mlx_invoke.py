@@ -23,6 +23,7 @@ def mlx_invoke(
     adapter_path: Optional[str] = None,
     tools: Optional[List[str]] = None,
     params: Optional[Dict[str, Any]] = None,
+    prompt_cache_dir: Optional[str] = None,
     agent: Optional[Any] = None,
 ) -> Dict[str, Any]:
     """Invoke MLX model with custom configuration and parent agent's tools.
@@ -65,6 +66,9 @@ def mlx_invoke(
             - max_tokens (int): Maximum tokens to generate (default: 3000)
             - top_p (float): Nucleus sampling parameter (default: 1.0)
             Example: {"temperature": 0.7, "max_tokens": 2000}
+        prompt_cache_dir: Optional directory of persisted prompt caches.
+            The KV state of the system prompt + tool schemas is saved there on
+            first use and loaded by later invocations instead of re-prefilling.
         agent: Parent agent (automatically provided by Strands framework).
 
     Returns:
@@ -121,7 +125,9 @@ def mlx_invoke(
         - Streaming uses parent agent's callback handler
         - Tools must exist in parent agent's tool registry
         - Adapter training can be done with mlx_trainer tool
-        - Model and adapter are loaded fresh for each invocation
+        - Loaded models are shared through the process-wide model registry, so
+          repeated invocations with the same model skip reloading; adapters are
+          attached to the loaded base model in place
     """
     try:
         # Get tools and trace attributes from parent agent
@@ -153,6 +159,8 @@ def mlx_invoke(
             model_config["adapter_path"] = adapter_path
         if params:
             model_config["params"] = params
+        if prompt_cache_dir:
+            model_config["prompt_cache_dir"] = prompt_cache_dir
 
         logger.debug(f"🔄 Creating MLX model: {model_id}")
         mlx_model = MLXModel(model_id=model_id, **model_config)
@@ -0,0 +1,121 @@
+"""Adapter hot-swap tests for strands-mlx"""
+
+import asyncio
+import json
+
+import mlx.core as mx
+import pytest
+from mlx.utils import tree_flatten
+from mlx_lm import load
+from mlx_lm.tuner.utils import linear_to_lora_layers
+
+from strands_mlx import MLXModel
+
+MODEL_ID = "mlx-community/Qwen3-1.7B-4bit"
+
+
+def _make_adapter(path, seed, fine_tune_type="lora"):
+    """Write a random adapter in the format produced by mlx_trainer."""
+    model, _ = load(MODEL_ID)
+    lora_parameters = {"rank": 4, "scale": 20.0, "dropout": 0.0}
+    linear_to_lora_layers(model, 2, lora_parameters, use_dora=fine_tune_type == "dora")
+
+    mx.random.seed(seed)
+    weights = {
+        name: mx.random.normal(value.shape) * 0.5
+        for name, value in tree_flatten(model.trainable_parameters())
+        if "lora_" in name
+    }
+    path.mkdir()
+    mx.save_safetensors(str(path / "adapters.safetensors"), weights)
+    config = {"fine_tune_type": fine_tune_type, "num_layers": 2, "lora_parameters": lora_parameters}
+    (path / "adapter_config.json").write_text(json.dumps(config))
+    return str(path)
+
+
+def _events_text(events):
+    return "".join(
+        event["contentBlockDelta"]["delta"].get("text", "")
+        for event in events
+        if "contentBlockDelta" in event
+    )
+
+
+async def _collect(model, messages, **kwargs):
+    return [event async for event in model.stream(messages, **kwargs)]
+
+
+def _text(model, **kwargs):
+    messages = [{"role": "user", "content": [{"text": "Say hello."}]}]
+    return _events_text(asyncio.run(_collect(model, messages, **kwargs)))
+
+
+def test_adapters_swap_without_reloading_base(tmp_path):
+    """Switching adapters reproduces each adapter's output on the same base weights"""
+    lora = _make_adapter(tmp_path / "lora", seed=1)
+    dora = _make_adapter(tmp_path / "dora", seed=2, fine_tune_type="dora")
+
+    model = MLXModel(model_id=MODEL_ID, params={"temperature": 0, "max_tokens": 16})
+    base_weights = model.model
+    base = _text(model)
+
+    model.update_config(adapter_path=lora)
+    with_lora = _text(model)
+    model.update_config(adapter_path=dora)
+    with_dora = _text(model)
+    assert len({base, with_lora, with_dora}) == 3
+
+    model.update_config(adapter_path=lora)
+    assert _text(model) == with_lora
+    model.update_config(adapter_path=None)
+    assert _text(model) == base
+    assert model.model is base_weights
+
+
+def test_instances_with_different_adapters_share_base(tmp_path):
+    """Instances on one base model each generate with their own adapter"""
+    adapter = _make_adapter(tmp_path / "lora", seed=3)
+    params = {"temperature": 0, "max_tokens": 16}
+
+    plain = MLXModel(model_id=MODEL_ID, params=params)
+    tuned = MLXModel(model_id=MODEL_ID, adapter_path=adapter, params=params)
+    assert plain.model is tuned.model
+
+    expected_plain, expected_tuned = _text(plain), _text(tuned)
+    assert expected_plain != expected_tuned
+    assert _text(plain) == expected_plain
+    assert _text(tuned) == expected_tuned
+
+
+def test_batched_rows_use_their_own_adapters(tmp_path):
+    """Concurrent streams naming different adapters match one-at-a-time decoding"""
+    first = _make_adapter(tmp_path / "first", seed=4)
+    second = _make_adapter(tmp_path / "second", seed=5)
+    params = {"temperature": 0, "max_tokens": 16}
+    adapters = [first, second, None, first]
+    conversations = [
+        [{"role": "user", "content": [{"text": prompt}]}]
+        for prompt in ["Say hello.", "Name a planet.", "What is 2 + 2?", "Name a color."]
+    ]
+
+    sequential = MLXModel(model_id=MODEL_ID, params=params)
+    expected = [
+        _events_text(asyncio.run(_collect(sequential, messages, adapter_path=adapter)))
+        for messages, adapter in zip(conversations, adapters)
+    ]
+
+    batched = MLXModel(model_id=MODEL_ID, params=params, max_batch_size=4)
+
+    async def _run():
+        return await asyncio.gather(
+            *[
+                _collect(batched, messages, adapter_path=adapter)
+                for messages, adapter in zip(conversations, adapters)
+            ]
+        )
+
+    assert [_events_text(events) for events in asyncio.run(_run())] == expected
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
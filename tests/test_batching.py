@@ -0,0 +1,98 @@
+"""Continuous batching tests for strands-mlx"""
+
+import asyncio
+
+import pytest
+
+from strands_mlx import CancellationToken, GenerationCancelledError, MLXModel
+
+MODEL_ID = "mlx-community/Qwen3-1.7B-4bit"
+
+
+def _text(events):
+    return "".join(
+        event["contentBlockDelta"]["delta"].get("text", "")
+        for event in events
+        if "contentBlockDelta" in event
+    )
+
+
+async def _collect(model, messages):
+    return [event async for event in model.stream(messages)]
+
+
+def test_concurrent_streams_match_sequential():
+    """Batched greedy decoding produces the same text as one-at-a-time decoding"""
+    params = {"temperature": 0, "max_tokens": 48}
+    sequential = MLXModel(model_id=MODEL_ID, params=params)
+    batched = MLXModel(model_id=MODEL_ID, params=params, max_batch_size=4)
+
+    prompts = ["What is 2 + 2?", "Name a planet.", "Say hello in French.", "What color is the sky?"]
+    conversations = [[{"role": "user", "content": [{"text": prompt}]}] for prompt in prompts]
+
+    async def _run():
+        reference = [await _collect(sequential, messages) for messages in conversations]
+        results = await asyncio.gather(*[_collect(batched, m) for m in conversations])
+        return reference, results
+
+    reference, results = asyncio.run(_run())
+    for expected, actual in zip(reference, results):
+        assert _text(actual) == _text(expected)
+        assert actual[-1]["metadata"]["usage"]["outputTokens"] > 0
+
+
+def test_cancelled_sequence_leaves_batch():
+    """Cancelling one request stops it mid-decode without disturbing the others"""
+    params = {"temperature": 0, "max_tokens": 64}
+    model = MLXModel(model_id=MODEL_ID, params=params, max_batch_size=4)
+    messages = [{"role": "user", "content": [{"text": "Count from 1 to 100."}]}]
+    token = CancellationToken()
+
+    async def _cancelled():
+        deltas = 0
+        async for event in model.stream(messages, cancellation_token=token):
+            if "contentBlockDelta" in event:
+                deltas += 1
+                if deltas == 4:
+                    token.cancel()
+        return deltas
+
+    async def _run():
+        return await asyncio.gather(_cancelled(), _collect(model, messages), return_exceptions=True)
+
+    cancelled, events = asyncio.run(_run())
+    assert isinstance(cancelled, GenerationCancelledError)
+    assert events[-1]["metadata"]["usage"]["outputTokens"] > 4
+
+
+def test_batch_yields_worker_to_other_jobs():
+    """Jobs queued on the worker run between batch steps rather than after the batch"""
+    params = {"temperature": 0, "max_tokens": 256}
+    model = MLXModel(model_id=MODEL_ID, params=params, max_batch_size=4)
+    messages = [{"role": "user", "content": [{"text": "Count from 1 to 1000."}]}]
+
+    async def _run():
+        stream = model.stream(messages)
+        deltas = 0
+        async for event in stream:
+            if "contentBlockDelta" in event:
+                deltas += 1
+                if deltas == 2:
+                    break
+        # The batch keeps decoding while the other request runs on the worker
+        other = asyncio.create_task(model.embed(["worker job"]))
+        async for event in stream:
+            if "contentBlockDelta" in event:
+                deltas += 1
+            if other.done():
+                break
+        await stream.aclose()
+        return other.done(), deltas
+
+    done, deltas = asyncio.run(_run())
+    assert done
+    assert deltas < params["max_tokens"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,130 @@
+"""Chat template rendering tests for strands-mlx"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from strands_mlx import MLXModel
+
+MODEL_ID = "mlx-community/Qwen3-1.7B-4bit"
+
+TOOL_SPECS = [
+    {
+        "name": "lookup",
+        "description": "Look up an order by id.",
+        "inputSchema": {
+            "json": {
+                "type": "object",
+                "properties": {"order_id": {"type": "string"}},
+                "required": ["order_id"],
+            }
+        },
+    }
+]
+
+
+def _turn(index):
+    tool_use_id = f"call-{index}"
+    return [
+        {"role": "user", "content": [{"text": f"Where is order {index}?"}]},
+        {
+            "role": "assistant",
+            "content": [
+                {
+                    "toolUse": {
+                        "toolUseId": tool_use_id,
+                        "name": "lookup",
+                        "input": {"order_id": str(index)},
+                    }
+                }
+            ],
+        },
+        {
+            "role": "user",
+            "content": [
+                {
+                    "toolResult": {
+                        "toolUseId": tool_use_id,
+                        "status": "success",
+                        "content": [{"text": f"Order {index} shipped."}],
+                    }
+                }
+            ],
+        },
+        {"role": "assistant", "content": [{"text": f"Order {index} has shipped."}]},
+    ]
+
+
+@pytest.mark.parametrize("system_prompt", [None, "You track orders."])
+def test_incremental_render_matches_full_render(system_prompt):
+    """Rendering only the messages after the cached prefix gives the full prompt"""
+    model = MLXModel(model_id=MODEL_ID)
+    renderer = model._chat_template
+
+    calls = []
+    render = renderer._render
+    renderer._render = lambda messages, *args: calls.append(len(messages)) or render(
+        messages, *args
+    )
+
+    messages = []
+    for index in range(12):
+        messages += _turn(index)
+        request = model.format_request(messages, TOOL_SPECS, system_prompt)
+        prompt = renderer.render(request["messages"], request["tools"])
+        assert prompt == model._apply_chat_template(request["messages"], request["tools"])
+
+    assert renderer.enabled
+    assert model._template_supports_tools
+    # Once verified, each turn renders only the newest messages
+    assert max(calls[-4:]) <= 8
+
+
+def test_template_without_tools_support_is_detected_once(monkeypatch):
+    """A template rejecting tools= is not retried on every render"""
+    model = MLXModel(model_id=MODEL_ID)
+    attempts = []
+    apply_chat_template = model.tokenizer.apply_chat_template
+
+    def _no_tools(messages, tools=None, **kwargs):
+        if tools is not None:
+            attempts.append(messages)
+            raise TypeError("tools are not supported")
+        return apply_chat_template(messages, **kwargs)
+
+    monkeypatch.setattr(model, "tokenizer", SimpleNamespace(apply_chat_template=_no_tools))
+    request = model.format_request(_turn(0), TOOL_SPECS, "You track orders.")
+    first = model._apply_chat_template(request["messages"], request["tools"])
+    second = model._apply_chat_template(request["messages"], request["tools"])
+
+    assert len(attempts) == 1
+    assert first == second
+    assert "# Available Tools:" in first
+
+
+def test_incremental_encode_matches_full_encode():
+    """Only the text after the previous prompt's prefix is tokenized each turn"""
+    model = MLXModel(model_id=MODEL_ID)
+    encoder = model._prompt_encoder
+    assert encoder.enabled
+
+    encoded = []
+    hf_tokenizer = encoder._hf_tokenizer
+    encoder._hf_tokenizer = lambda text, **kwargs: encoded.append(len(text)) or hf_tokenizer(
+        text, **kwargs
+    )
+
+    messages = []
+    for index in range(12):
+        messages += _turn(index)
+        request = model.format_request(messages, TOOL_SPECS, "You track orders.")
+        prompt = model._chat_template.render(request["messages"], request["tools"])
+        tokens = model._encode_prompt(prompt, incremental=True)
+        assert tokens == model._encode_prompt(prompt)
+
+    assert encoder.enabled
+    assert max(encoded[1:]) < len(prompt) / 4
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,85 @@
+"""Token-budget conversation manager tests for strands-mlx"""
+
+import asyncio
+
+import pytest
+from strands import Agent
+from strands.types.exceptions import ContextWindowOverflowException
+
+from strands_mlx import MLXConversationManager, MLXModel
+
+MODEL_ID = "mlx-community/Qwen3-1.7B-4bit"
+
+FILLER = "The nightly backup finished and every checksum matched the manifest. " * 4
+
+
+def _history(turns):
+    messages = []
+    for turn in range(turns):
+        messages += [
+            {"role": "user", "content": [{"text": f"Report #{turn}: {FILLER}"}]},
+            {"role": "assistant", "content": [{"text": f"Noted report #{turn}."}]},
+        ]
+    return messages
+
+
+def test_trims_in_one_block_and_memoizes_counts():
+    """Over budget, the oldest messages go in one block down to target_ratio"""
+    model = MLXModel(model_id=MODEL_ID, params={"temperature": 0, "max_tokens": 8})
+    history = _history(20)
+    full_tokens = model.count_tokens(history)
+
+    manager = MLXConversationManager(
+        max_context_tokens=full_tokens, trigger_ratio=1.0, target_ratio=0.5
+    )
+    agent = Agent(model=model, messages=history, conversation_manager=manager)
+
+    calls = []
+    count_tokens = model.count_tokens
+    model.count_tokens = lambda *args: calls.append(args) or count_tokens(*args)
+
+    manager.apply_management(agent)
+    assert len(agent.messages) == 40
+    counted = len(calls)
+
+    agent.messages.append({"role": "user", "content": [{"text": FILLER * 10}]})
+    manager.apply_management(agent)
+    # Only the new message is tokenized; the history was counted before
+    assert len(calls) == counted + 1
+    assert manager.removed_message_count > 10
+    assert len(agent.messages) == 41 - manager.removed_message_count
+    assert count_tokens(agent.messages) <= full_tokens * 0.5
+    assert agent.messages[0]["role"] == "user"
+
+
+def test_model_raises_context_window_overflow():
+    """A prompt longer than context_window fails before prefill"""
+    model = MLXModel(model_id=MODEL_ID, context_window=64)
+
+    async def _collect():
+        return [event async for event in model.stream(_history(4))]
+
+    with pytest.raises(ContextWindowOverflowException):
+        asyncio.run(_collect())
+
+
+def test_agent_stays_within_context_window():
+    """As a hook the manager trims before the model call would overflow"""
+    model = MLXModel(
+        model_id=MODEL_ID, context_window=512, params={"temperature": 0, "max_tokens": 16}
+    )
+    manager = MLXConversationManager(max_context_tokens=400)
+    agent = Agent(
+        model=model,
+        messages=_history(8),
+        conversation_manager=manager,
+        hooks=[manager],
+        callback_handler=None,
+    )
+    agent("Any failures?")
+    assert manager.removed_message_count > 0
+    assert model.count_tokens(agent.messages) <= 512
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,75 @@
+"""Embedding tests for strands-mlx"""
+
+import asyncio
+
+import mlx.core as mx
+import pytest
+
+import strands_mlx.mlx_model as mlx_model
+from strands_mlx import MLXModel
+
+MODEL_ID = "mlx-community/Qwen3-1.7B-4bit"
+
+TEXTS = [
+    "The cat sat on the mat.",
+    "Quarterly revenue grew by twelve percent, driven by strong subscription sales.",
+    "Hi",
+]
+
+
+@pytest.mark.parametrize("pooling", ["mean", "last"])
+def test_batched_embeddings_match_single_texts(pooling):
+    """Padding texts of different lengths into one batch does not change their embeddings"""
+    model = MLXModel(model_id=MODEL_ID, embedding_cache_size=0)
+    batched = asyncio.run(model.embed(TEXTS, pooling=pooling))
+
+    assert batched.shape == (len(TEXTS), model.model.args.hidden_size)
+    assert batched.dtype == mx.float32
+    assert mx.allclose(mx.linalg.norm(batched, axis=-1), mx.ones(len(TEXTS)), atol=1e-4)
+    for row, text in enumerate(TEXTS):
+        (single,) = asyncio.run(model.embed([text], pooling=pooling))
+        assert mx.allclose(batched[row], single, atol=1e-3)
+
+
+def test_embeddings_cached_by_text(monkeypatch):
+    """Texts embedded before are served from the cache, per pooling mode"""
+    model = MLXModel(model_id=MODEL_ID)
+    embedded = []
+    embed_tokens = mlx_model.embed_tokens
+
+    def _counted(model, token_lists, *args):
+        embedded.extend(token_lists)
+        return embed_tokens(model, token_lists, *args)
+
+    monkeypatch.setattr(mlx_model, "embed_tokens", _counted)
+
+    first = asyncio.run(model.embed(TEXTS[:2]))
+    second = asyncio.run(model.embed([TEXTS[1], TEXTS[1], TEXTS[2]]))
+    assert len(embedded) == 3
+    assert mx.array_equal(second[0], first[1]) and mx.array_equal(second[1], first[1])
+
+    asyncio.run(model.embed(TEXTS[:1], pooling="last"))
+    assert len(embedded) == 4
+    assert asyncio.run(model.embed([])).shape == (0, model.model.args.hidden_size)
+    with pytest.raises(ValueError):
+        asyncio.run(model.embed(TEXTS, pooling="max"))
+
+
+def test_similar_texts_embed_closer():
+    """Related texts are more similar than unrelated ones"""
+    model = MLXModel(model_id=MODEL_ID)
+    embeddings = asyncio.run(
+        model.embed(
+            [
+                "How do I reset my password?",
+                "I forgot my password and cannot log in.",
+                "The recipe needs two cups of flour.",
+            ]
+        )
+    )
+    similarity = embeddings @ embeddings.T
+    assert similarity[0, 1].item() > similarity[0, 2].item()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,91 @@
+"""KV cache memory tests for strands-mlx"""
+
+import asyncio
+
+import pytest
+from mlx_lm.models.cache import QuantizedKVCache, RotatingKVCache
+
+from strands_mlx import MLXModel
+
+MODEL_ID = "mlx-community/Qwen3-1.7B-4bit"
+
+LONG_TEXT = "The deployment finished without errors and all checks passed. " * 40
+
+
+def _stream(model, messages):
+    async def _collect():
+        return [event async for event in model.stream(messages)]
+
+    return asyncio.run(_collect())
+
+
+def _text(events):
+    return "".join(
+        event["contentBlockDelta"]["delta"].get("text", "")
+        for event in events
+        if "contentBlockDelta" in event
+    )
+
+
+def test_quantized_kv_cache_is_smaller_and_reused():
+    """kv_bits stores the conversation cache quantized and still reuses it next turn"""
+    messages = [{"role": "user", "content": [{"text": LONG_TEXT + "Summarize."}]}]
+    params = {"temperature": 0, "max_tokens": 16}
+
+    model = MLXModel(model_id=MODEL_ID, params=params)
+    _stream(model, messages)
+    full_bytes = model._prompt_cache.nbytes
+
+    model.update_config(kv_bits=4, prompt_cache_size=1)
+    first = _stream(model, messages)
+    cache = model._prompt_cache._entries[0].cache
+    assert all(isinstance(layer_cache, QuantizedKVCache) for layer_cache in cache)
+    assert model._prompt_cache.nbytes < full_bytes / 2
+
+    follow_up = messages + [
+        {"role": "assistant", "content": [{"text": _text(first)}]},
+        {"role": "user", "content": [{"text": "Shorter."}]},
+    ]
+    usage = _stream(model, follow_up)[-1]["metadata"]["usage"]
+    assert usage["cacheReadInputTokens"] > 0
+
+
+def test_quantized_kv_start_keeps_short_contexts_unquantized():
+    """Caches shorter than quantized_kv_start stay in full precision"""
+    model = MLXModel(
+        model_id=MODEL_ID,
+        params={"temperature": 0, "max_tokens": 8},
+        kv_bits=8,
+        quantized_kv_start=100_000,
+    )
+    _stream(model, [{"role": "user", "content": [{"text": "Hi"}]}])
+    cache = model._prompt_cache._entries[0].cache
+    assert not any(isinstance(layer_cache, QuantizedKVCache) for layer_cache in cache)
+
+
+def test_max_kv_size_bounds_cache_and_keeps_reuse():
+    """max_kv_size keeps a rotating cache within bounds and still reuses it next turn"""
+    model = MLXModel(
+        model_id=MODEL_ID,
+        params={"temperature": 0, "max_tokens": 16},
+        max_kv_size=128,
+        kv_sink_tokens=8,
+    )
+    messages = [{"role": "user", "content": [{"text": LONG_TEXT + "Summarize."}]}]
+    first = _stream(model, messages)
+    assert _text(first)
+
+    cache = model._prompt_cache._entries[0].cache
+    assert all(isinstance(layer_cache, RotatingKVCache) for layer_cache in cache)
+    assert all(layer_cache.keys.shape[2] <= 128 for layer_cache in cache)
+
+    follow_up = messages + [
+        {"role": "assistant", "content": [{"text": _text(first)}]},
+        {"role": "user", "content": [{"text": "Shorter."}]},
+    ]
+    usage = _stream(model, follow_up)[-1]["metadata"]["usage"]
+    assert usage["cacheReadInputTokens"] > 128
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
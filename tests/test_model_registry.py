@@ -0,0 +1,85 @@
+"""Model registry tests for strands-mlx"""
+
+import gc
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import strands_mlx.mlx_model_registry as mlx_model_registry
+from strands_mlx import MLXModel
+from strands_mlx.mlx_model_registry import MLXModelRegistry, model_registry
+
+MODEL_ID = "mlx-community/Qwen3-1.7B-4bit"
+
+
+def test_instances_share_loaded_weights():
+    """A second instance with the same configuration reuses the loaded model"""
+    first = MLXModel(model_id=MODEL_ID)
+
+    tic = time.perf_counter()
+    second = MLXModel(model_id=MODEL_ID, params={"temperature": 0})
+    assert time.perf_counter() - tic < 1.0
+
+    assert second.model is first.model
+    assert second.tokenizer is first.tokenizer
+
+
+def test_unreferenced_models_evicted_over_budget():
+    """Models nobody holds are evicted once the memory budget is exceeded"""
+    registry = MLXModelRegistry(max_memory_bytes=None)
+    handle = registry.acquire(MODEL_ID)
+    key = handle.key
+    assert registry.memory_bytes > 0
+
+    registry.max_memory_bytes = 0
+    registry._evict()
+    assert key in registry
+
+    handle.release()
+    handle.release()
+    assert key not in registry
+    assert registry.memory_bytes == 0
+
+
+def test_released_when_instance_collected():
+    """Dropping an MLXModel releases its registry reference"""
+    key = MLXModelRegistry.make_key(MODEL_ID, tokenizer_config={"trust_remote_code": True})
+    model = MLXModel(model_id=MODEL_ID)
+    assert model_registry._entries[key].refcount >= 1
+    gc.collect()  # instances left behind by other tests must not count below
+    refcount = model_registry._entries[key].refcount
+
+    del model
+    gc.collect()
+    assert model_registry._entries[key].refcount == refcount - 1
+
+
+def test_loading_does_not_block_resident_models(monkeypatch):
+    """A slow load runs outside the lock and concurrent acquires of it load once"""
+    registry = MLXModelRegistry(max_memory_bytes=None)
+    resident = registry.acquire(MODEL_ID)
+    loads = []
+    load = mlx_model_registry.load
+
+    def _slow_load(model_id, **kwargs):
+        loads.append(model_id)
+        time.sleep(1.0)
+        return load(MODEL_ID, **kwargs)
+
+    monkeypatch.setattr(mlx_model_registry, "load", _slow_load)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        pending = [pool.submit(registry.acquire, "slow-model") for _ in range(2)]
+        time.sleep(0.2)
+        tic = time.perf_counter()
+        registry.acquire(MODEL_ID).release()
+        resident.release()
+        assert time.perf_counter() - tic < 0.5
+        handles = [future.result() for future in pending]
+
+    assert loads == ["slow-model"]
+    assert handles[0].model is handles[1].model
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
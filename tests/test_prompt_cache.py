@@ -0,0 +1,67 @@
+"""Prompt cache tests for strands-mlx"""
+
+import asyncio
+
+import pytest
+
+from strands_mlx import MLXModel
+
+MODEL_ID = "mlx-community/Qwen3-1.7B-4bit"
+
+
+def _stream(model, messages, **kwargs):
+    async def _collect():
+        return [event async for event in model.stream(messages, **kwargs)]
+
+    return asyncio.run(_collect())
+
+
+def _text(events):
+    return "".join(
+        event["contentBlockDelta"]["delta"].get("text", "")
+        for event in events
+        if "contentBlockDelta" in event
+    )
+
+
+def test_prompt_cache_reused_across_turns():
+    """Second turn only prefills the new suffix and matches uncached output"""
+    params = {"temperature": 0, "max_tokens": 32}
+    cached = MLXModel(model_id=MODEL_ID, params=params)
+    uncached = MLXModel(model_id=MODEL_ID, params=params, prompt_cache_size=0)
+
+    messages = [{"role": "user", "content": [{"text": "Name a color."}]}]
+    first = _stream(cached, messages, system_prompt="Be brief.")
+    assert "cacheReadInputTokens" not in first[-1]["metadata"]["usage"]
+
+    messages += [
+        {"role": "assistant", "content": [{"text": _text(first)}]},
+        {"role": "user", "content": [{"text": "Name another one."}]},
+    ]
+    second = _stream(cached, messages, system_prompt="Be brief.")
+    reference = _stream(uncached, messages, system_prompt="Be brief.")
+
+    usage = second[-1]["metadata"]["usage"]
+    assert 0 < usage["cacheReadInputTokens"] < usage["inputTokens"]
+    assert _text(second) == _text(reference)
+
+
+def test_prompt_cache_dir_shared_between_instances(tmp_path):
+    """A second model instance loads the system prompt prefix from disk"""
+    params = {"temperature": 0, "max_tokens": 16}
+    messages = [{"role": "user", "content": [{"text": "Say hi."}]}]
+    system_prompt = "You are a concise assistant. " * 20
+
+    writer = MLXModel(model_id=MODEL_ID, params=params, prompt_cache_dir=str(tmp_path))
+    first = _stream(writer, messages, system_prompt=system_prompt)
+    assert first[-1]["metadata"]["usage"]["cacheWriteInputTokens"] > 0
+    assert list(tmp_path.glob("*.safetensors"))
+
+    reader = MLXModel(model_id=MODEL_ID, params=params, prompt_cache_dir=str(tmp_path))
+    second = _stream(reader, messages, system_prompt=system_prompt)
+    assert second[-1]["metadata"]["usage"]["cacheReadInputTokens"] > 0
+    assert _text(second) == _text(first)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,63 @@
+"""Prompt-lookup decoding tests for strands-mlx"""
+
+import asyncio
+
+import pytest
+
+from strands_mlx import MLXModel
+from strands_mlx.mlx_prompt_lookup import NGramIndex
+
+MODEL_ID = "mlx-community/Qwen3-1.7B-4bit"
+
+
+def _stream(model, messages):
+    async def _collect():
+        return [event async for event in model.stream(messages)]
+
+    return asyncio.run(_collect())
+
+
+def _text(events):
+    return "".join(
+        event["contentBlockDelta"]["delta"].get("text", "")
+        for event in events
+        if "contentBlockDelta" in event
+    )
+
+
+def test_ngram_index_proposes_longest_most_recent_match():
+    """Longest n-gram wins, and the most recent occurrence is used"""
+    index = NGramIndex([5, 2, 6, 9, 2, 3, 5, 7, 2, 8], max_ngram_size=3)
+    index.extend([9, 2])
+    assert index.propose(3) == [3, 5, 7]
+
+    index = NGramIndex([1, 2, 3, 4, 1, 2, 5])
+    index.extend([1, 2])
+    assert index.propose(2) == [5, 1]
+    assert index.propose(0) == []
+
+
+def test_ngram_index_never_matches_its_own_tail():
+    """An n-gram seen only at the tail has no continuation to propose"""
+    index = NGramIndex([1, 2, 3])
+    assert index.propose(4) == []
+
+
+def test_prompt_lookup_matches_greedy_output():
+    """Greedy output is unchanged by prompt lookup and proposals are reported"""
+    params = {"temperature": 0, "max_tokens": 64}
+    text = "The config lives at /etc/strands/agents/default.yaml and sets retries to 3."
+    messages = [{"role": "user", "content": [{"text": f"Repeat exactly: {text}"}]}]
+
+    reference = _stream(MLXModel(model_id=MODEL_ID, params=params), messages)
+    lookup = _stream(
+        MLXModel(model_id=MODEL_ID, params=params, prompt_lookup_num_tokens=8), messages
+    )
+
+    assert _text(lookup) == _text(reference)
+    metrics = lookup[-1]["metadata"]["metrics"]
+    assert metrics["draftTokensAccepted"] <= metrics["draftTokensProposed"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
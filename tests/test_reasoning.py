@@ -0,0 +1,75 @@
+"""Reasoning stream and thinking budget tests for strands-mlx"""
+
+import asyncio
+
+import mlx.core as mx
+import pytest
+
+from strands_mlx import MLXModel
+from strands_mlx.mlx_reasoning import ThinkingBudgetProcessor, reasoning_open
+
+MODEL_ID = "mlx-community/Qwen3-1.7B-4bit"
+
+THINK_START, THINK_END = 3, 4
+
+
+def _stream(model, messages, **kwargs):
+    async def _collect():
+        return [event async for event in model.stream(messages, **kwargs)]
+
+    return asyncio.run(_collect())
+
+
+def _deltas(events, key):
+    return "".join(
+        (
+            event["contentBlockDelta"]["delta"][key].get("text", "")
+            if key == "reasoningContent"
+            else event["contentBlockDelta"]["delta"][key]
+        )
+        for event in events
+        if key in event.get("contentBlockDelta", {}).get("delta", {})
+    )
+
+
+def test_budget_processor_forces_think_end_and_rolls_back():
+    """After the budget only the closing think token can be sampled"""
+    processor = ThinkingBudgetProcessor((THINK_START, THINK_END), budget=2, in_reasoning=False)
+    logits = mx.zeros((1, 8))
+
+    def _allowed(tokens):
+        out = processor(mx.array(tokens), logits)
+        return [i for i, value in enumerate(out[0].tolist()) if value > -float("inf")]
+
+    assert len(_allowed([7])) == 8
+    assert len(_allowed([7, THINK_START, 5])) == 8
+    assert _allowed([7, THINK_START, 5, 6]) == [THINK_END]
+    # A shorter history (rejected draft tokens) restores the earlier state
+    assert len(_allowed([7, THINK_START, 5])) == 8
+    assert len(_allowed([7, THINK_START, 5, 6, THINK_END, 5, 6])) == 8
+
+
+def test_reasoning_open_detects_template_opened_think_block():
+    """A prompt ending inside a think block starts the stream in reasoning"""
+    assert reasoning_open([1, 2, THINK_START, 9], (THINK_START, THINK_END))
+    assert not reasoning_open([THINK_START, 9, THINK_END, 9], (THINK_START, THINK_END))
+    assert not reasoning_open([1, 2], (THINK_START, THINK_END))
+
+
+def test_thinking_streams_as_reasoning_content_within_budget():
+    """Think tokens never reach the answer and the budget closes the think block"""
+    model = MLXModel(
+        model_id=MODEL_ID, params={"temperature": 0, "max_tokens": 256, "thinking_budget": 32}
+    )
+    messages = [{"role": "user", "content": [{"text": "What is 17 * 23?"}]}]
+    events = _stream(model, messages)
+
+    reasoning, answer = _deltas(events, "reasoningContent"), _deltas(events, "text")
+    assert reasoning.strip()
+    assert answer.strip()
+    assert "<think>" not in answer and "</think>" not in answer
+    assert 0 < events[-1]["metadata"]["metrics"]["reasoningTokens"] <= 32
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
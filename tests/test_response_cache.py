@@ -0,0 +1,129 @@
+"""Response cache tests for strands-mlx"""
+
+import asyncio
+
+import pytest
+
+from strands_mlx import MLXModel
+from strands_mlx.mlx_response_cache import MLXResponseCache
+
+MODEL_ID = "mlx-community/Qwen3-1.7B-4bit"
+
+MESSAGES = [{"role": "user", "content": [{"text": "/no_think Name a color."}]}]
+
+
+def _count_generations(model):
+    calls = []
+    stream_request = model._stream_request
+
+    def _counted(*args):
+        calls.append(args)
+        return stream_request(*args)
+
+    model._stream_request = _counted
+    return calls
+
+
+def _stream(model, messages, **kwargs):
+    async def _collect():
+        return [event async for event in model.stream(messages, **kwargs)]
+
+    return asyncio.run(_collect())
+
+
+def _without_latency(events):
+    for event in events:
+        event.get("metadata", {}).get("metrics", {}).pop("latencyMs", None)
+    return events
+
+
+def test_identical_request_replays_recorded_events():
+    """A repeated request replays the same events without generating"""
+    model = MLXModel(
+        model_id=MODEL_ID, params={"temperature": 0, "max_tokens": 16}, response_cache_size=8
+    )
+    calls = _count_generations(model)
+
+    first = _stream(model, MESSAGES)
+    second = _stream(model, MESSAGES)
+    assert len(calls) == 1
+    assert _without_latency(second) == _without_latency(first)
+    assert "metadata" in second[-1]
+
+    # Other sampling params make another request
+    model.update_config(params={"temperature": 0, "max_tokens": 8})
+    _stream(model, MESSAGES)
+    assert len(calls) == 2
+
+
+def test_sqlite_tier_shared_between_instances(tmp_path):
+    """A new model instance replays responses recorded by another one"""
+    config = {"params": {"temperature": 0, "max_tokens": 16}}
+    path = str(tmp_path / "responses.db")
+
+    writer = MLXModel(model_id=MODEL_ID, response_cache_path=path, **config)
+    first = _stream(writer, MESSAGES)
+
+    reader = MLXModel(model_id=MODEL_ID, response_cache_path=path, **config)
+    calls = _count_generations(reader)
+    assert _without_latency(_stream(reader, MESSAGES)) == _without_latency(first)
+    assert calls == []
+
+
+def test_concurrent_identical_requests_generate_once():
+    """Identical requests in flight together share one generation"""
+    model = MLXModel(
+        model_id=MODEL_ID, params={"temperature": 0, "max_tokens": 16}, response_cache_size=8
+    )
+    calls = _count_generations(model)
+
+    async def _collect():
+        return [event async for event in model.stream(MESSAGES)]
+
+    async def _gather():
+        return await asyncio.gather(*[_collect() for _ in range(3)])
+
+    results = [_without_latency(events) for events in asyncio.run(_gather())]
+    assert len(calls) == 1
+    assert results[0] == results[1] == results[2]
+
+
+def test_tool_use_replayed_and_abandoned_streams_not_recorded():
+    """Tool-use blocks replay as recorded; streams stopped early are not cached"""
+    events = [
+        {"messageStart": {"role": "assistant"}},
+        {"contentBlockStart": {"start": {"toolUse": {"name": "lookup", "toolUseId": "lookup_3"}}}},
+        {"contentBlockDelta": {"delta": {"toolUse": {"input": '{"id": 3}'}}}},
+        {"contentBlockStop": {}},
+        {"messageStop": {"stopReason": "tool_use"}},
+        {"metadata": {"usage": {"inputTokens": 9}, "metrics": {"latencyMs": 500}}},
+    ]
+    generations = []
+
+    async def _generate():
+        generations.append(1)
+        for event in events:
+            yield event
+
+    async def _consume(cache, key, limit=None):
+        replayed = []
+        async for event in cache.stream(key, _generate):
+            replayed.append(event)
+            if len(replayed) == limit:
+                break
+        return replayed
+
+    cache = MLXResponseCache(max_entries=2)
+    asyncio.run(_consume(cache, "abandoned", limit=2))
+    assert cache.get("abandoned") is None
+
+    asyncio.run(_consume(cache, "tool"))
+    replayed = asyncio.run(_consume(cache, "tool"))
+    assert len(generations) == 2
+    assert replayed[:-1] == events[:-1]
+    assert replayed[-1]["metadata"]["usage"] == {"inputTokens": 9}
+    assert replayed[-1]["metadata"]["metrics"]["latencyMs"] < 500
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
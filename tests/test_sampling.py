@@ -0,0 +1,80 @@
+"""N-best sampling tests for strands-mlx"""
+
+import asyncio
+
+import pytest
+
+from strands_mlx import MLXModel
+
+MODEL_ID = "mlx-community/Qwen3-1.7B-4bit"
+
+MESSAGES = [{"role": "user", "content": [{"text": "/no_think Name three prime numbers."}]}]
+
+
+def _text(model, messages):
+    async def _collect():
+        return [event async for event in model.stream(messages)]
+
+    return "".join(
+        event["contentBlockDelta"]["delta"].get("text", "")
+        for event in asyncio.run(_collect())
+        if "contentBlockDelta" in event
+    )
+
+
+def test_greedy_samples_match_stream():
+    """Every greedy sample equals the streamed completion and has the same logprob"""
+    model = MLXModel(model_id=MODEL_ID, params={"temperature": 0, "max_tokens": 32})
+    samples = asyncio.run(model.sample(MESSAGES, n=3))
+
+    assert len(samples) == 3
+    assert len({sample.text for sample in samples}) == 1
+    assert len({round(sample.logprob, 3) for sample in samples}) == 1
+    assert samples[0].logprob < 0
+    assert samples[0].finish_reason in ("stop", "length")
+    # Samples are raw completions, think block included
+    assert _text(model, MESSAGES).strip() in samples[0].text
+
+
+def test_samples_decode_together_from_one_prefill():
+    """Sampled completions are independent rows that may finish at different times"""
+    model = MLXModel(model_id=MODEL_ID, params={"temperature": 1.0, "max_tokens": 24})
+    samples = asyncio.run(model.sample(MESSAGES, n=5))
+
+    assert len(samples) == 5
+    assert all(0 < len(sample.tokens) <= 24 for sample in samples)
+    assert all(sample.logprob < 0 for sample in samples)
+    assert len({tuple(sample.tokens) for sample in samples}) > 1
+
+    with pytest.raises(ValueError):
+        asyncio.run(model.sample(MESSAGES, n=0))
+
+
+def test_score_matches_sampled_logprob():
+    """Scoring a greedy completion gives the log-probability it was sampled with"""
+    model = MLXModel(model_id=MODEL_ID, params={"temperature": 0, "max_tokens": 16})
+    (sample,) = asyncio.run(model.sample(MESSAGES, n=1))
+    assert sample.finish_reason == "length"
+
+    (score,) = asyncio.run(model.score(MESSAGES, [sample.text]))
+    assert score.tokens == sample.tokens
+    assert len(score.token_logprobs) == len(score.tokens)
+    assert score.logprob == pytest.approx(sample.logprob, abs=0.05)
+
+
+def test_score_ranks_multiple_choice_candidates():
+    """Candidates of different lengths are scored in one batch"""
+    model = MLXModel(model_id=MODEL_ID)
+    messages = [{"role": "user", "content": [{"text": "/no_think What is the capital of France?"}]}]
+    prefix = "<think>\n\n</think>\n\n"
+    candidates = [prefix + "The capital of France is Paris.", prefix + "Banana", ""]
+    scores = asyncio.run(model.score(messages, candidates))
+
+    assert [score.text for score in scores] == candidates
+    assert scores[2].tokens == [] and scores[2].logprob == 0
+    per_token = [score.logprob / len(score.tokens) for score in scores[:2]]
+    assert per_token[0] > per_token[1]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
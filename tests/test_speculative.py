@@ -0,0 +1,46 @@
+"""Speculative decoding tests for strands-mlx"""
+
+import asyncio
+
+import pytest
+
+from strands_mlx import MLXModel
+
+MODEL_ID = "mlx-community/Qwen3-1.7B-4bit"
+DRAFT_MODEL_ID = "mlx-community/Qwen3-0.6B-4bit"
+
+
+def _stream(model, messages):
+    async def _collect():
+        return [event async for event in model.stream(messages)]
+
+    return asyncio.run(_collect())
+
+
+def _text(events):
+    return "".join(
+        event["contentBlockDelta"]["delta"].get("text", "")
+        for event in events
+        if "contentBlockDelta" in event
+    )
+
+
+def test_speculative_decoding_matches_greedy_output():
+    """Greedy output is unchanged by the draft model and acceptance stats are reported"""
+    params = {"temperature": 0, "max_tokens": 48}
+    messages = [{"role": "user", "content": [{"text": "Count from 1 to 10."}]}]
+
+    reference = _stream(MLXModel(model_id=MODEL_ID, params=params), messages)
+    speculative = _stream(
+        MLXModel(model_id=MODEL_ID, params=params, draft_model_id=DRAFT_MODEL_ID),
+        messages,
+    )
+
+    assert _text(speculative) == _text(reference)
+    metrics = speculative[-1]["metadata"]["metrics"]
+    assert metrics["draftTokensProposed"] > 0
+    assert 0 <= metrics["draftAcceptanceRate"] <= 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,81 @@
+"""Stop sequence tests for strands-mlx"""
+
+import asyncio
+
+import pytest
+
+from strands_mlx import MLXModel
+from strands_mlx.mlx_stop import StopSequenceMatcher
+
+MODEL_ID = "mlx-community/Qwen3-1.7B-4bit"
+
+
+def _feed(stop, pieces):
+    """Stream (token, text) pieces through a matcher, returning (streamed text, stopped)."""
+    matcher = StopSequenceMatcher(stop)
+    streamed = ""
+    for token, text in pieces:
+        released, stopped = matcher.feed(token, text)
+        streamed += released
+        if stopped:
+            return streamed, True
+    return streamed + matcher.flush(), False
+
+
+def test_stop_string_split_across_tokens():
+    """A stop string spanning tokens is matched and never streamed"""
+    pieces = [(1, "Thought: look"), (2, "\nObs"), (3, "ervation: 42")]
+    assert _feed(["\nObservation:"], pieces) == ("Thought: look", True)
+
+
+def test_partial_match_is_released():
+    """Held-back text is streamed once it can no longer start a stop string"""
+    matcher = StopSequenceMatcher(["</answer>"])
+    assert matcher.feed(1, "42</an") == ("42", False)
+    assert matcher.feed(2, "chor>") == ("</anchor>", False)
+    assert _feed("</answer>", [(1, "a</"), (2, "b")]) == ("a</b", False)
+
+
+def test_overlapping_stop_strings():
+    """The earliest-ending stop string wins, cutting at its start"""
+    assert _feed(["abcd", "bc"], [(1, "xab"), (2, "cz")]) == ("xa", True)
+
+
+def test_stop_token_sequence():
+    """Token-id sequences stop generation and drop the matched tokens' text"""
+    pieces = [(1, "a"), (7, "b"), (8, "c"), (9, "d")]
+    assert _feed([[7, 8]], pieces) == ("a", True)
+    assert _feed([[7, 8]], [(1, "a"), (7, "b"), (9, "c")]) == ("abc", False)
+
+
+def test_stream_ends_at_stop_string():
+    """Generation stops at the stop string with stopReason end_turn"""
+    model = MLXModel(model_id=MODEL_ID, params={"temperature": 0, "max_tokens": 256})
+    messages = [
+        {"role": "user", "content": [{"text": "/no_think Count from 1 to 20, comma separated."}]}
+    ]
+
+    async def _collect():
+        return [event async for event in model.stream(messages)]
+
+    full = "".join(
+        event["contentBlockDelta"]["delta"].get("text", "")
+        for event in asyncio.run(_collect())
+        if "contentBlockDelta" in event
+    )
+    stop = full[len(full) // 2 : len(full) // 2 + 4]
+
+    model.update_config(params={"temperature": 0, "max_tokens": 256, "stop": [stop]})
+    events = asyncio.run(_collect())
+    text = "".join(
+        event["contentBlockDelta"]["delta"].get("text", "")
+        for event in events
+        if "contentBlockDelta" in event
+    )
+    assert text == full[: full.index(stop)]
+    assert events[-2] == {"messageStop": {"stopReason": "end_turn"}}
+    assert events[-1]["metadata"]["usage"]["outputTokens"] < 256
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
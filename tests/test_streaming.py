@@ -0,0 +1,176 @@
+"""Streaming tests for strands-mlx"""
+
+import asyncio
+
+import mlx.core as mx
+import pytest
+
+from strands_mlx import CancellationToken, GenerationCancelledError, MLXModel
+from strands_mlx.mlx_worker import call_in_worker
+
+MODEL_ID = "mlx-community/Qwen3-1.7B-4bit"
+
+
+def test_stream_does_not_block_event_loop():
+    """Other coroutines keep running while the model generates"""
+    model = MLXModel(model_id=MODEL_ID, params={"temperature": 0, "max_tokens": 64})
+    messages = [{"role": "user", "content": [{"text": "Count from 1 to 20."}]}]
+
+    async def _run():
+        done = asyncio.Event()
+        ticks = 0
+
+        async def _ticker():
+            nonlocal ticks
+            while not done.is_set():
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(_ticker())
+        events = [event async for event in model.stream(messages)]
+        done.set()
+        await ticker
+        return events, ticks
+
+    events, ticks = asyncio.run(_run())
+    assert "metadata" in events[-1]
+    assert ticks > 1
+
+
+def test_metadata_reports_latency_and_throughput():
+    """Metadata carries real timings and exact token counts from generation"""
+    model = MLXModel(model_id=MODEL_ID, params={"temperature": 0, "max_tokens": 16})
+    messages = [{"role": "user", "content": [{"text": "Count from 1 to 20."}]}]
+
+    async def _collect():
+        return [event async for event in model.stream(messages)]
+
+    metadata = asyncio.run(_collect())[-1]["metadata"]
+    usage, metrics = metadata["usage"], metadata["metrics"]
+    assert metrics["timeToFirstByteMs"] <= metrics["latencyMs"]
+    assert metrics["promptTokens"] == usage["inputTokens"]
+    assert metrics["generationTokens"] == usage["outputTokens"] <= 16
+    assert metrics["promptTokensPerSecond"] > 0
+    assert metrics["generationTokensPerSecond"] > 0
+    assert metrics["peakMemoryGb"] > 0
+
+
+def test_metadata_reports_max_tokens_stop_and_request_peak_memory():
+    """A reply cut off by max_tokens stops with max_tokens; peak memory is per request"""
+    model = MLXModel(model_id=MODEL_ID, params={"temperature": 0, "max_tokens": 4})
+    messages = [{"role": "user", "content": [{"text": "Count from 1 to 20."}]}]
+
+    def _allocate():
+        mx.eval(mx.zeros((512, 1024, 1024)))
+        return mx.get_peak_memory() / 1e9
+
+    earlier_peak = call_in_worker(_allocate)
+
+    async def _collect():
+        return [event async for event in model.stream(messages)]
+
+    events = asyncio.run(_collect())
+    metrics = events[-1]["metadata"]["metrics"]
+    stop_reason = "max_tokens" if metrics["generationTokens"] == 4 else "end_turn"
+    assert events[-2] == {"messageStop": {"stopReason": stop_reason}}
+    assert 0 < metrics["peakMemoryGb"] < earlier_peak
+
+
+def test_chunked_prefill_reports_progress_and_stops_between_chunks():
+    """prefill_progress emits an event per chunk and a consumer can stop mid-prefill"""
+    model = MLXModel(
+        model_id=MODEL_ID,
+        prefill_step_size=128,
+        prefill_progress=True,
+        params={"temperature": 0, "max_tokens": 8},
+    )
+    messages = [
+        {"role": "user", "content": [{"text": "Summarize: " + "all systems nominal. " * 200}]}
+    ]
+
+    async def _collect():
+        return [event async for event in model.stream(messages)]
+
+    events = asyncio.run(_collect())
+    progress = [event["prefillProgress"] for event in events if "prefillProgress" in event]
+    total = events[-1]["metadata"]["usage"]["inputTokens"]
+    assert len(progress) == -(-(total - 1) // 128)
+    assert all(p["totalTokens"] == total for p in progress)
+    assert progress[-1]["processedTokens"] == total - 1
+    assert events[-1]["metadata"]["metrics"]["promptTokens"] == total
+
+    async def _stop_after_first_chunk():
+        stream = model.stream(messages + [{"role": "user", "content": [{"text": "Again."}]}])
+        async for event in stream:
+            if "prefillProgress" in event:
+                break
+        await stream.aclose()
+
+    model.update_config(prompt_cache_size=1)
+    asyncio.run(_stop_after_first_chunk())
+    call_in_worker(lambda: None)  # wait for the worker to close the generation
+    # Prefill stopped early; the chunks processed so far are kept for reuse
+    assert len(model._prompt_cache._entries[0].tokens) < total - 1
+
+
+def test_cancellation_and_timeout_stop_generation():
+    """A cancelled or timed-out request raises promptly and drops its KV cache"""
+    model = MLXModel(model_id=MODEL_ID, params={"temperature": 0, "max_tokens": 512})
+    messages = [{"role": "user", "content": [{"text": "Count from 1 to 500."}]}]
+    token = CancellationToken()
+
+    async def _consume(**kwargs):
+        deltas = 0
+        async for event in model.stream(messages, **kwargs):
+            if "contentBlockDelta" in event:
+                deltas += 1
+                if deltas == 4:
+                    token.cancel()
+        return deltas
+
+    with pytest.raises(GenerationCancelledError):
+        asyncio.run(_consume(cancellation_token=token))
+    with pytest.raises(TimeoutError):
+        asyncio.run(_consume(timeout=0.05))
+    call_in_worker(lambda: None)  # wait for the worker to finish the requests
+    assert not model._prompt_cache._entries
+
+
+def test_tool_calls_end_generation():
+    """Tool calls are emitted as they close and nothing is decoded after them"""
+    model = MLXModel(model_id=MODEL_ID, params={"temperature": 0, "max_tokens": 512})
+    tool_specs = [
+        {
+            "name": "get_weather",
+            "description": "Get the current weather for a city.",
+            "inputSchema": {
+                "json": {
+                    "type": "object",
+                    "properties": {"city": {"type": "string"}},
+                    "required": ["city"],
+                }
+            },
+        }
+    ]
+    messages = [
+        {"role": "user", "content": [{"text": "What's the weather in Paris? Use the tool."}]}
+    ]
+
+    async def _collect():
+        return [event async for event in model.stream(messages, tool_specs)]
+
+    events = asyncio.run(_collect())
+    tool_starts = [
+        i
+        for i, event in enumerate(events)
+        if "toolUse" in event.get("contentBlockStart", {}).get("start", {})
+    ]
+    assert tool_starts
+    assert events[-2] == {"messageStop": {"stopReason": "tool_use"}}
+    # Only the tool block's delta and stop follow the last tool call
+    assert len(events) - tool_starts[-1] == 5
+    assert events[-1]["metadata"]["usage"]["outputTokens"] < 512
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,108 @@
+"""Schema-constrained structured output tests for strands-mlx"""
+
+import asyncio
+import json
+from typing import Dict, List, Literal, Optional
+
+import pytest
+from pydantic import BaseModel, Field
+
+from strands_mlx import MLXModel
+from strands_mlx.mlx_json_schema import JSONSchemaAutomaton
+
+MODEL_ID = "mlx-community/Qwen3-1.7B-4bit"
+
+
+class Address(BaseModel):
+    city: str
+    zip_code: Optional[str] = None
+
+
+class Person(BaseModel):
+    name: str
+    age: int
+    score: float
+    tags: List[str]
+    role: Literal["admin", "user"]
+    active: bool
+    address: Address
+    extra: Dict[str, int] = {}
+
+
+def _accepts(automaton, text):
+    state = automaton.advance(automaton.initial, text)
+    return bool(state) and automaton.is_complete(state)
+
+
+def test_automaton_accepts_schema_instances():
+    """Compact and single-spaced JSON of a valid instance is accepted"""
+    automaton = JSONSchemaAutomaton(Person.model_json_schema())
+    person = Person(
+        name='Ada "the first" Lovelace',
+        age=-36,
+        score=1.5e3,
+        tags=["math", "poetry"],
+        role="admin",
+        active=True,
+        address=Address(city="London"),
+        extra={"papers": 1},
+    )
+    data = person.model_dump(exclude_none=True)
+    for separators in ((",", ":"), (", ", ": ")):
+        assert _accepts(automaton, json.dumps(data, separators=separators, ensure_ascii=False))
+
+
+def test_automaton_rejects_schema_violations():
+    """Wrong types, unknown enum values, missing required keys and prose are rejected"""
+    automaton = JSONSchemaAutomaton(Person.model_json_schema())
+    assert not automaton.advance(automaton.initial, '{"age":1')
+    assert not automaton.advance(automaton.initial, '{"name":"a","age":1.5')
+    assert not automaton.advance(
+        automaton.initial, '{"name":"a","age":1,"score":1,"tags":[],"role":"x'
+    )
+    assert not automaton.advance(automaton.initial, "Sure! Here is the JSON:")
+    assert not automaton.is_complete(automaton.advance(automaton.initial, '{"name":"a"'))
+
+
+def test_automaton_enforces_array_bounds():
+    """minItems/maxItems limit where an array can close or continue"""
+
+    class Pair(BaseModel):
+        values: List[bool] = Field(min_length=1, max_length=2)
+
+    automaton = JSONSchemaAutomaton(Pair.model_json_schema())
+    assert not automaton.advance(automaton.initial, '{"values":[]')
+    assert not automaton.advance(automaton.initial, '{"values":[true,false,')
+    assert _accepts(automaton, '{"values":[true,false]}')
+
+
+def test_structured_output_always_parses():
+    """Constrained decoding yields the schema's JSON even at high temperature"""
+
+    class Pet(BaseModel):
+        kind: Literal["cat", "dog"]
+        vaccinated: bool
+
+    model = MLXModel(model_id=MODEL_ID, params={"temperature": 1.0, "max_tokens": 128})
+    messages = [{"role": "user", "content": [{"text": "Describe a pet."}]}]
+
+    async def _run():
+        texts, outputs = [], []
+        for _ in range(3):
+            text = ""
+            async for event in model.structured_output(Pet, messages):
+                if "output" in event:
+                    outputs.append(event["output"])
+                elif "contentBlockDelta" in event:
+                    text += event["contentBlockDelta"]["delta"].get("text", "")
+            texts.append(text)
+        return texts, outputs
+
+    texts, outputs = asyncio.run(_run())
+    assert len(outputs) == 3
+    assert all(isinstance(output, Pet) for output in outputs)
+    assert all(text.startswith("{") and text.endswith("}") for text in texts)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])